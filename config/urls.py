@@ -1,7 +1,12 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+from salas.estaticos import servir_estatico
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('salas.urls')),
 ]
+
+if settings.SERVIR_ESTATICOS:
+    urlpatterns.insert(0, re_path(rf'^{settings.STATIC_URL.lstrip("/")}(?P<ruta>.+)$', servir_estatico))
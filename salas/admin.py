@@ -1,16 +1,121 @@
-from django.contrib import admin
-from .models import Sala, Reserva
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import AutocompleteSelect
+from .models import Sede, Sala, Reserva
+from .busqueda import buscar_reservas
+from .paginacion import PaginadorEstimado
+from .sedes import sedes_por_codigo
+
+
+class FiltroSalaAutocompletar(admin.FieldListFilter):
+    """
+    Filtro por sala con un campo de autocompletado en lugar de un enlace por
+    cada sala (RelatedFieldListFilter carga todas las salas en cada página)
+    """
+    template = 'admin/filtro_sala.html'
+    
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.lookup_val = self.used_parameters.get(self.lookup_kwarg, [None])[-1]
+        # El campo del formulario entrega al widget la sala seleccionada (una sola consulta)
+        self.campo = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(field, model_admin.admin_site, attrs={'style': 'width: 100%'}),
+        )
+    
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+    
+    def selector(self):
+        return self.campo.widget.render(f'filtro_{self.field_path}', self.lookup_val)
+    
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': 'Todas',
+        }
+
+
+@admin.register(Sede)
+class SedeAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'codigo', 'base_datos')
+    prepopulated_fields = {'codigo': ('nombre',)}
+
 
 @admin.register(Sala)
 class SalaAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'capacidad', 'habilitada', 'fecha_creacion')
-    list_filter = ('habilitada',)
+    list_display = ('nombre', 'nombre_sede', 'capacidad', 'por_puestos', 'puestos_ocupados', 'habilitada', 'fecha_creacion')
+    list_filter = ('sede', 'habilitada', 'por_puestos')
+    # También los usa el autocompletado de sala en ReservaAdmin
     search_fields = ('nombre', 'descripcion')
     list_editable = ('habilitada',)
+    ordering = ('nombre',)
+    show_full_result_count = False
+    paginator = PaginadorEstimado
+    
+    @admin.display(description='Sede', ordering='sede')
+    def nombre_sede(self, obj):
+        # Sin JOIN ni consulta por fila: la sede puede estar en otra base de
+        # datos que la sala, y el catálogo de sedes está en cache
+        sedes = {sede.pk: sede for sede in sedes_por_codigo().values()}
+        return sedes.get(obj.sede_id, obj.sede_id)
+    
+    def delete_model(self, request, obj):
+        """
+        Igual que en el panel personalizado: soft-delete, el historial se
+        borra en segundo plano con manage.py purgar_salas
+        """
+        obj.eliminar()
+    
+    def delete_queryset(self, request, queryset):
+        for sala in queryset:
+            sala.eliminar()
 
 @admin.register(Reserva)
 class ReservaAdmin(admin.ModelAdmin):
-    list_display = ('sala', 'nombre_reservante', 'rut', 'fecha_hora_inicio', 'fecha_hora_fin')
-    list_filter = ('sala', 'fecha_hora_inicio')
+    list_display = ('sala', 'nombre_reservante', 'rut', 'fecha_hora_inicio', 'fecha_hora_fin', 'estado')
+    # Sin date_hierarchy: calcula los años/meses con un SELECT DISTINCT sobre toda la tabla
+    list_filter = (('sala', FiltroSalaAutocompletar), 'estado', 'fecha_hora_inicio')
+    list_select_related = ('sala',)
     search_fields = ('rut', 'nombre_reservante')
-    date_hierarchy = 'fecha_hora_inicio'
+    autocomplete_fields = ('sala',)
+    # Evita el COUNT(*) de toda la tabla junto al conteo filtrado,
+    # y sobre UMBRAL_ESTIMACION filas la paginación usa un conteo estimado
+    show_full_result_count = False
+    paginator = PaginadorEstimado
+    actions = ['finalizar_seleccionadas', 'cancelar_seleccionadas']
+    
+    @property
+    def media(self):
+        # Scripts del autocompletado para el filtro por sala en la lista
+        selector = AutocompleteSelect(Reserva._meta.get_field('sala'), self.admin_site)
+        return super().media + selector.media
+    
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Usa la búsqueda indexada (prefijo de RUT o trigram por nombre)
+        en lugar del ILIKE '%...%' sobre cada campo de search_fields
+        """
+        if not search_term.strip():
+            return queryset, False
+        return buscar_reservas(queryset, search_term), False
+    
+    @admin.action(description='Finalizar reservas seleccionadas')
+    def finalizar_seleccionadas(self, request, queryset):
+        cantidad = queryset.finalizar()
+        self.message_user(request, f'{cantidad} reserva(s) finalizada(s).', messages.SUCCESS)
+    
+    @admin.action(description='Cancelar reservas seleccionadas')
+    def cancelar_seleccionadas(self, request, queryset):
+        cantidad = queryset.cancelar()
+        self.message_user(request, f'{cantidad} reserva(s) cancelada(s).', messages.SUCCESS)
+    
+    def delete_queryset(self, request, queryset):
+        """
+        La acción "eliminar seleccionadas" usa el DELETE masivo del queryset
+        (que además invalida el historial cacheado de los RUT afectados)
+        """
+        queryset.eliminar()
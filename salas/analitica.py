@@ -0,0 +1,210 @@
+"""
+Analítica de ocupación de salas para el panel de administración.
+
+Calcula la utilización de cada sala por hora de la semana (lunes 00:00 a
+domingo 23:59, 168 casillas) en un período. El cálculo es vectorizado con
+NumPy: en vez de recorrer cada reserva hora por hora se usa la función
+acumulada de tiempo ocupado
+
+    F(t) = suma_i [ (t - inicio_i)+ - (t - fin_i)+ ]
+
+evaluada en los límites de cada hora del período. La ocupación de la hora k
+es F(k + 1) - F(k), y cada término se obtiene con np.bincount + np.cumsum,
+por lo que el costo es O(reservas + salas × horas) sin bucles en Python.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .cache import obtener_o_calcular
+from .models import Sala, Reserva
+
+HORAS_SEMANA = 168
+SEGUNDOS_HORA = 3600
+
+# Las reservas duran 2 horas; este margen permite acotar la consulta por
+# fecha_hora_inicio (índice BRIN) sin perder reservas que empezaron antes del período
+DURACION_MAXIMA = timedelta(days=1)
+
+# Con 'avance' (trabajos en segundo plano) las reservas se leen por tramos de
+# este largo, informando el avance entre uno y otro
+TRAMO_LECTURA = timedelta(days=7)
+
+# Tiempo de vida (en segundos) del mapa de ocupación cacheado por período
+TIEMPO_CACHE_OCUPACION = 600
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+def _ocupacion_acumulada(salas_idx, limites, num_salas, num_horas):
+    """
+    Evalúa G(k) = suma_i (k - limite_i)+ para k = 0..num_horas en cada sala.
+    'limites' está en horas desde el inicio del período, acotado a [0, num_horas].
+    """
+    # Para k entero, limite_i < k  <=>  k >= floor(limite_i) + 1
+    casilla = np.floor(limites).astype(np.int64) + 1
+    ancho = num_horas + 2
+    posicion = salas_idx * ancho + casilla
+
+    cantidad = np.bincount(posicion, minlength=num_salas * ancho).reshape(num_salas, ancho)
+    suma = np.bincount(posicion, weights=limites, minlength=num_salas * ancho).reshape(num_salas, ancho)
+
+    # N(k) y S(k): cantidad y suma de límites menores que k
+    cantidad = np.cumsum(cantidad, axis=1)[:, :num_horas + 1]
+    suma = np.cumsum(suma, axis=1)[:, :num_horas + 1]
+
+    k = np.arange(num_horas + 1, dtype=np.float64)
+    return k * cantidad - suma
+
+
+def ocupacion_por_hora(salas_idx, inicios, fines, num_salas, desde, hasta):
+    """
+    Retorna una matriz (num_salas, num_horas) con la fracción ocupada de cada
+    hora absoluta del período [desde, hasta). 'inicios' y 'fines' son arreglos
+    de timestamps (segundos); 'desde' y 'hasta' también.
+    """
+    num_horas = int(np.ceil((hasta - desde) / SEGUNDOS_HORA))
+    salas_idx = np.asarray(salas_idx, dtype=np.int64)
+
+    inicio_h = np.clip((np.asarray(inicios, dtype=np.float64) - desde) / SEGUNDOS_HORA, 0, num_horas)
+    fin_h = np.clip((np.asarray(fines, dtype=np.float64) - desde) / SEGUNDOS_HORA, 0, num_horas)
+
+    acumulada = (
+        _ocupacion_acumulada(salas_idx, inicio_h, num_salas, num_horas)
+        - _ocupacion_acumulada(salas_idx, fin_h, num_salas, num_horas)
+    )
+    return np.diff(acumulada, axis=1)
+
+
+def ocupacion_por_hora_ingenua(salas_idx, inicios, fines, num_salas, desde, hasta):
+    """
+    Implementación de referencia con bucles en Python (una iteración por
+    reserva y por hora). Se usa en los tests y en el benchmark.
+    """
+    num_horas = int(np.ceil((hasta - desde) / SEGUNDOS_HORA))
+    resultado = np.zeros((num_salas, num_horas))
+
+    for sala, inicio, fin in zip(salas_idx, inicios, fines):
+        inicio = max(inicio, desde)
+        fin = min(fin, desde + num_horas * SEGUNDOS_HORA)
+        hora = int((inicio - desde) // SEGUNDOS_HORA)
+        while inicio < fin:
+            limite = min(desde + (hora + 1) * SEGUNDOS_HORA, fin)
+            resultado[sala, hora] += (limite - inicio) / SEGUNDOS_HORA
+            inicio = limite
+            hora += 1
+
+    return resultado
+
+
+def horas_de_la_semana(desde, num_horas):
+    """
+    Retorna, para cada hora absoluta del período, su casilla de hora de la
+    semana en hora local (0 = lunes 00:00). Se calcula por hora del período y
+    no por reserva, así los cambios de horario de verano quedan bien ubicados.
+    """
+    casillas = np.empty(num_horas, dtype=np.int64)
+    for k in range(num_horas):
+        local = timezone.localtime(desde + timedelta(hours=k))
+        casillas[k] = local.weekday() * 24 + local.hour
+    return casillas
+
+
+def agrupar_por_hora_semana(ocupacion, casillas):
+    """
+    Suma la ocupación de cada hora absoluta en su casilla de hora de la semana
+    y la divide por la cantidad de veces que esa casilla aparece en el período.
+    Retorna una matriz (num_salas, 168) con la utilización entre 0 y 1.
+    """
+    indicadora = np.zeros((len(casillas), HORAS_SEMANA))
+    indicadora[np.arange(len(casillas)), casillas] = 1
+
+    horas_ocupadas = ocupacion @ indicadora
+    horas_totales = indicadora.sum(axis=0)
+    return np.divide(horas_ocupadas, horas_totales, out=np.zeros_like(horas_ocupadas), where=horas_totales > 0)
+
+
+def calcular_mapa_ocupacion(desde, hasta, sede=None, avance=None):
+    """
+    Calcula la utilización por sala y hora de la semana entre 'desde' y
+    'hasta' (datetimes con zona horaria), en las salas de la sede indicada o
+    en todas. Las reservas canceladas no cuentan. 'avance(hechos, total)' se
+    llama después de cada tramo de reservas leído (ver TRAMO_LECTURA).
+    """
+    reservas = Reserva.objects.all()
+    salas = Sala.objects.all()
+    if sede is not None:
+        reservas = reservas.de_sede(sede)
+        salas = salas.filter(sede=sede)
+
+    primero = desde - DURACION_MAXIMA
+    total = hasta - primero
+    tramo = TRAMO_LECTURA if avance else total
+    filas = []
+    inicio = primero
+    while inicio < hasta:
+        fin = min(inicio + tramo, hasta)
+        filas += reservas.filter(
+            fecha_hora_inicio__gte=inicio,
+            fecha_hora_inicio__lt=fin,
+        ).values_list('sala_id', 'fecha_hora_inicio', 'fecha_hora_fin', 'estado')
+        if avance:
+            avance(int((fin - primero).total_seconds()), int(total.total_seconds()))
+        inicio = fin
+    salas = list(salas.order_by('nombre').values_list('id', 'nombre'))
+
+    inicio_periodo = desde.timestamp()
+    fin_periodo = hasta.timestamp()
+    num_horas = int(np.ceil((fin_periodo - inicio_periodo) / SEGUNDOS_HORA))
+
+    if filas and salas:
+        salas_ids, inicios, fines, estados = zip(*filas)
+
+        # Posición de cada reserva en la lista de salas (búsqueda binaria vectorizada)
+        ids = np.array([sala_id for sala_id, _ in salas])
+        orden = np.argsort(ids)
+        consulta = np.array(salas_ids)
+        posicion = np.minimum(np.searchsorted(ids[orden], consulta), len(ids) - 1)
+        salas_idx = np.where(ids[orden][posicion] == consulta, orden[posicion], -1)
+
+        inicios = np.fromiter((f.timestamp() for f in inicios), dtype=np.float64, count=len(filas))
+        fines = np.fromiter((f.timestamp() for f in fines), dtype=np.float64, count=len(filas))
+
+        # Descartar canceladas y reservas de salas que ya no existen
+        validas = (np.array(estados) != 'cancelada') & (salas_idx >= 0)
+        ocupacion = ocupacion_por_hora(
+            salas_idx[validas], inicios[validas], fines[validas],
+            len(salas), inicio_periodo, fin_periodo
+        )
+    else:
+        ocupacion = np.zeros((len(salas), num_horas))
+
+    utilizacion = agrupar_por_hora_semana(ocupacion, horas_de_la_semana(desde, num_horas))
+    return salas, utilizacion
+
+
+def mapa_ocupacion(desde, hasta, sede=None, avance=None):
+    """
+    Retorna el mapa de ocupación listo para la plantilla, cacheado por
+    período y sede ('avance' como en calcular_mapa_ocupacion)
+    """
+    def calcular():
+        salas, utilizacion = calcular_mapa_ocupacion(desde, hasta, sede, avance)
+        porcentajes = np.rint(utilizacion * 100).astype(int)
+        return [
+            {
+                'id': sala_id,
+                'nombre': nombre,
+                'promedio': round(float(utilizacion[i].mean()) * 100, 1),
+                'dias': [
+                    (DIAS_SEMANA[dia], porcentajes[i, dia * 24:(dia + 1) * 24].tolist())
+                    for dia in range(7)
+                ],
+            }
+            for i, (sala_id, nombre) in enumerate(salas)
+        ]
+
+    periodo = f'{desde:%Y%m%d%H%M}-{hasta:%Y%m%d%H%M}'
+    sufijo = f'mapa:{sede.pk if sede else "*"}'
+    return obtener_o_calcular('ocupacion', periodo, sufijo, calcular, timeout=TIEMPO_CACHE_OCUPACION)
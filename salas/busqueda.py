@@ -0,0 +1,75 @@
+"""
+Búsqueda de reservas para el personal de la biblioteca.
+
+Se usa desde el panel personalizado (admin_reservas) y desde el admin de
+Django (ReservaAdmin). Las consultas están pensadas para aprovechar los
+índices creados en la migración 0004:
+
+- RUT: búsqueda por prefijo del RUT canónico (índice varchar_pattern_ops).
+- Nombre: ILIKE '%texto%' acelerado con un índice trigram (GIN) en PostgreSQL.
+  En SQLite no existe ese índice y la búsqueda se resuelve con LIKE normal.
+- Fechas: rango sobre fecha_hora_inicio (índice BRIN en PostgreSQL).
+"""
+import re
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import normalizar_rut
+
+# Un término de búsqueda "parece RUT" si solo tiene dígitos, puntos, espacios
+# y opcionalmente un guión seguido del dígito verificador
+PATRON_RUT = re.compile(r'^[\d.\s]+-?[\dkK]?$')
+
+
+def es_busqueda_por_rut(termino):
+    """
+    Indica si el término ingresado debe buscarse como RUT o como nombre
+    """
+    return bool(PATRON_RUT.match(termino))
+
+
+def filtro_rut(termino):
+    """
+    Construye el filtro por prefijo del RUT canónico.
+    Ej: '12.345' -> rut LIKE '12345%'
+    """
+    limpio = termino.upper().replace('.', '').replace(' ', '')
+    filtro = Q(rut__startswith=limpio)
+
+    # Sin guión no sabemos si el usuario escribió un prefijo o el RUT
+    # completo sin guión (123456785), así que también buscamos la forma canónica
+    if '-' not in limpio and len(limpio) > 1:
+        filtro |= Q(rut=normalizar_rut(limpio))
+
+    return filtro
+
+
+def inicio_del_dia(fecha):
+    """
+    Convierte una fecha en el datetime (con zona horaria) de las 00:00 de ese día
+    """
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def buscar_reservas(queryset, termino='', desde=None, hasta=None):
+    """
+    Filtra un queryset de reservas por RUT o nombre y por rango de fechas de inicio.
+    Las fechas 'desde' y 'hasta' son inclusivas (objetos date).
+    """
+    termino = (termino or '').strip()
+
+    if termino:
+        if es_busqueda_por_rut(termino):
+            queryset = queryset.filter(filtro_rut(termino))
+        else:
+            queryset = queryset.filter(nombre_reservante__icontains=termino)
+
+    if desde:
+        queryset = queryset.filter(fecha_hora_inicio__gte=inicio_del_dia(desde))
+
+    if hasta:
+        queryset = queryset.filter(fecha_hora_inicio__lt=inicio_del_dia(hasta + timedelta(days=1)))
+
+    return queryset
@@ -0,0 +1,109 @@
+"""
+Búsqueda de salas libres ("encuéntrame una sala").
+
+En vez de revisar sala por sala, se hace una sola consulta de intervalos a
+Reserva para todas las salas candidatas (ordenada por sala e inicio) y se
+recorren en memoria: para cada sala se avanza un cursor desde el inicio de
+la ventana, saltando las reservas, hasta encontrar un hueco del largo pedido.
+Son dos consultas en total sin importar cuántas salas haya.
+
+filtrar_salas() arma el catálogo de salas (lista_salas, admin_salas): filtra
+por nombre, capacidad y disponibilidad actual y ordena en la base de datos,
+así cada página del listado es una consulta acotada más el conteo.
+"""
+from itertools import groupby
+
+from .models import Sala, Reserva
+
+
+def primer_hueco(reservas, desde, hasta, duracion):
+    """
+    Retorna el primer inicio t en [desde, hasta] tal que [t, t + duracion)
+    no se traslapa con ninguna reserva, o None si no existe.
+    'reservas' son pares (inicio, fin) ordenados por inicio.
+    """
+    cursor = desde
+    for inicio, fin in reservas:
+        if cursor > hasta:
+            return None
+        if inicio - cursor >= duracion:
+            return cursor
+        cursor = max(cursor, fin)
+    return cursor if cursor <= hasta else None
+
+
+def buscar_salas_libres(personas, desde, hasta, duracion, sede=None):
+    """
+    Salas habilitadas con capacidad para 'personas' (de la sede indicada, o
+    de todas) que se pueden reservar durante 'duracion' comenzando entre
+    'desde' y 'hasta'. Las salas por puestos no se ofrecen: no se reservan
+    completas para un grupo.
+    Se ordenan por ajuste: primero la sala más chica que sirve, y entre
+    salas iguales la que se libera antes.
+    """
+    salas = Sala.objects.filter(habilitada=True, por_puestos=False, capacidad__gte=personas)
+    if sede is not None:
+        salas = salas.filter(sede=sede)
+    candidatas = list(salas.values_list('id', 'nombre', 'capacidad'))
+    if not candidatas:
+        return []
+
+    ocupadas = (
+        Reserva.objects.filter(
+            sala_id__in=[sala_id for sala_id, _, _ in candidatas],
+            estado='activa',
+            fecha_hora_inicio__lt=hasta + duracion,
+            fecha_hora_fin__gt=desde,
+        )
+        .order_by('sala_id', 'fecha_hora_inicio')
+        .values_list('sala_id', 'fecha_hora_inicio', 'fecha_hora_fin')
+    )
+    reservas_por_sala = {
+        sala_id: [(inicio, fin) for _, inicio, fin in filas]
+        for sala_id, filas in groupby(ocupadas, key=lambda fila: fila[0])
+    }
+
+    resultados = []
+    for sala_id, nombre, capacidad in candidatas:
+        inicio = primer_hueco(reservas_por_sala.get(sala_id, []), desde, hasta, duracion)
+        if inicio is None:
+            continue
+        resultados.append({
+            'id': sala_id,
+            'nombre': nombre,
+            'capacidad': capacidad,
+            'inicio': inicio,
+            'fin': inicio + duracion,
+            'holgura': capacidad - personas,
+        })
+
+    resultados.sort(key=lambda sala: (sala['holgura'], sala['inicio'], sala['nombre']))
+    return resultados
+
+
+# Orden del catálogo de salas: valor del formulario -> order_by (el nombre
+# desempata para que la paginación sea estable)
+ORDENES_SALAS = {
+    'nombre': ('nombre', 'pk'),
+    '-nombre': ('-nombre', '-pk'),
+    'capacidad': ('capacidad', 'nombre', 'pk'),
+    '-capacidad': ('-capacidad', 'nombre', 'pk'),
+    'disponible': ('-disponible', 'nombre', 'pk'),
+}
+
+
+def filtrar_salas(salas, nombre='', capacidad_min=None, capacidad_max=None, disponibles=False, orden='nombre'):
+    """
+    Filtra y ordena el queryset de salas. La disponibilidad se anota en la
+    misma consulta (ver SalaQuerySet.con_disponibilidad).
+    """
+    salas = salas.con_disponibilidad()
+    if nombre:
+        salas = salas.filter(nombre__icontains=nombre)
+    if capacidad_min is not None:
+        salas = salas.filter(capacidad__gte=capacidad_min)
+    if capacidad_max is not None:
+        salas = salas.filter(capacidad__lte=capacidad_max)
+    if disponibles:
+        salas = salas.filter(disponible=True)
+    return salas.order_by(*ORDENES_SALAS.get(orden, ORDENES_SALAS['nombre']))
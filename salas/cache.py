@@ -0,0 +1,77 @@
+"""
+Cache de lectura (read-through) para consultas frecuentes del sistema.
+
+Cada identificador (por ejemplo un RUT) tiene una "generación" guardada en
+cache. Los valores se guardan bajo la generación vigente, por lo que para
+invalidar todas las páginas cacheadas de un RUT basta con crear una nueva
+generación: las entradas antiguas quedan huérfanas y expiran solas.
+"""
+import time
+
+from django.core.cache import cache
+
+# Tiempo de vida (en segundos) de los valores cacheados
+TIEMPO_CACHE = 300
+
+
+def _clave_generacion(espacio, identificador):
+    return f'salas:{espacio}:{identificador}:generacion'
+
+
+def obtener_generacion(espacio, identificador):
+    """
+    Retorna la generación vigente del identificador, creándola si no existe
+    (o si fue desalojada de la cache)
+    """
+    clave = _clave_generacion(espacio, identificador)
+    generacion = cache.get(clave)
+    if generacion is None:
+        generacion = time.time_ns()
+        # add() no pisa una generación creada en paralelo por otro proceso
+        if not cache.add(clave, generacion, None):
+            generacion = cache.get(clave, generacion)
+    return generacion
+
+
+def invalidar(espacio, identificador):
+    """
+    Deja obsoletos todos los valores cacheados del identificador
+    """
+    cache.set(_clave_generacion(espacio, identificador), time.time_ns(), None)
+
+
+def obtener_o_calcular(espacio, identificador, sufijo, calcular, timeout=TIEMPO_CACHE):
+    """
+    Retorna el valor cacheado para (espacio, identificador, sufijo) o lo calcula
+    con la función 'calcular' y lo guarda bajo la generación vigente
+    """
+    generacion = obtener_generacion(espacio, identificador)
+    clave = f'salas:{espacio}:{identificador}:{generacion}:{sufijo}'
+    return cache.get_or_set(clave, calcular, timeout)
+
+
+def invalidar_ruts(*ruts):
+    """
+    Invalida el historial cacheado de los RUT indicados
+    (se llama al reservar, cancelar, finalizar o eliminar reservas)
+    """
+    for rut in set(ruts):
+        invalidar('rut', rut)
+
+
+def invalidar_salas(*salas_ids):
+    """
+    Invalida los valores cacheados de las salas indicadas (calendario .ics)
+    """
+    for sala_id in set(salas_ids):
+        invalidar('sala', sala_id)
+
+
+def invalidar_reservas(filas):
+    """
+    Invalida todo lo cacheado que depende de un grupo de reservas.
+    'filas' son pares (rut, sala_id), ej: values_list('rut', 'sala_id').
+    """
+    filas = list(filas)
+    invalidar_ruts(*(rut for rut, _ in filas))
+    invalidar_salas(*(sala_id for _, sala_id in filas))
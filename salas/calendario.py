@@ -0,0 +1,164 @@
+"""
+Calendarios iCalendar (.ics) de reservas para suscribirse desde Google
+Calendar, Outlook, etc.
+
+Las aplicaciones de calendario consultan el feed cada pocos minutos, así que
+cada feed se cachea bajo la generación de su sala o RUT (ver cache.py) junto
+con su ETag y fecha de modificación. Una consulta condicional
+(If-None-Match / If-Modified-Since) de un feed que no cambió se responde con
+304 leyendo solo la cache, sin consultar la base de datos.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .cache import obtener_generacion, obtener_o_calcular
+from .models import Sala, Reserva
+
+# Tiempo de vida (en segundos) de un feed cacheado
+TIEMPO_CACHE_ICS = 900
+
+# Reservas pasadas que se siguen incluyendo en los feeds
+DIAS_HISTORIAL_ICS = 30
+
+PRODID = '-//Biblioteca//Sistema de Reserva de Salas//ES'
+
+
+def _escapar(texto):
+    """
+    Escapa un texto según RFC 5545 (sección 3.3.11)
+    """
+    return (
+        str(texto).replace('\\', '\\\\').replace(';', '\\;')
+        .replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def _plegar(linea):
+    """
+    Divide las líneas de más de 75 octetos (RFC 5545, sección 3.1)
+    """
+    datos = linea.encode('utf-8')
+    if len(datos) <= 75:
+        return linea
+
+    partes = []
+    while datos:
+        limite = 75 if not partes else 74
+        # No cortar un carácter UTF-8 de varios bytes por la mitad
+        while limite < len(datos) and (datos[limite] & 0xC0) == 0x80:
+            limite -= 1
+        partes.append(datos[:limite].decode('utf-8'))
+        datos = datos[limite:]
+    return '\r\n '.join(partes)
+
+
+def _fecha_utc(fecha):
+    return fecha.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def generar_ics(nombre, eventos, dominio):
+    """
+    Arma el texto del calendario. 'eventos' son tuplas
+    (id, inicio, fin, estado, resumen, descripcion).
+    """
+    ahora = _fecha_utc(timezone.now())
+    lineas = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escapar(nombre)}',
+    ]
+    for reserva_id, inicio, fin, estado, resumen, descripcion in eventos:
+        lineas += [
+            'BEGIN:VEVENT',
+            f'UID:reserva-{reserva_id}@{dominio}',
+            f'DTSTAMP:{ahora}',
+            f'DTSTART:{_fecha_utc(inicio)}',
+            f'DTEND:{_fecha_utc(fin)}',
+            f'SUMMARY:{_escapar(resumen)}',
+            f'DESCRIPTION:{_escapar(descripcion)}',
+            f'STATUS:{"CANCELLED" if estado == "cancelada" else "CONFIRMED"}',
+            'END:VEVENT',
+        ]
+    lineas.append('END:VCALENDAR')
+    return '\r\n'.join(_plegar(linea) for linea in lineas) + '\r\n'
+
+
+def _feed(espacio, identificador, dominio, sede, calcular_ics):
+    """
+    Retorna el feed cacheado como diccionario con 'ics', 'etag' y
+    'modificado', o None si el calendario no existe
+    """
+    def calcular():
+        ics = calcular_ics()
+        if ics is None:
+            return None
+        return {
+            'ics': ics,
+            'etag': hashlib.md5(ics.encode('utf-8'), usedforsecurity=False).hexdigest(),
+            # La generación cambia con cada modificación de la sala o RUT
+            'modificado': datetime.fromtimestamp(
+                obtener_generacion(espacio, identificador) / 1e9, tz=dt_timezone.utc
+            ),
+        }
+
+    # Los ids de sala se repiten entre sedes con bases de datos distintas
+    sufijo = f'ics:{sede.pk if sede else "*"}:{dominio}'
+    return obtener_o_calcular(espacio, identificador, sufijo, calcular, timeout=TIEMPO_CACHE_ICS)
+
+
+def _desde():
+    return timezone.now() - timedelta(days=DIAS_HISTORIAL_ICS)
+
+
+def feed_sala(sala_id, dominio, sede=None):
+    """
+    Calendario con las reservas recientes y próximas de una sala
+    (None si la sala no existe o no es de la sede indicada)
+    """
+    def calcular():
+        salas = Sala.objects.filter(pk=sala_id)
+        if sede is not None:
+            salas = salas.filter(sede=sede)
+        nombre = salas.values_list('nombre', flat=True).first()
+        if nombre is None:
+            return None
+        filas = (
+            Reserva.objects.filter(sala_id=sala_id, fecha_hora_fin__gte=_desde())
+            .exclude(estado='cancelada')
+            .order_by('fecha_hora_inicio')
+            .values_list('id', 'fecha_hora_inicio', 'fecha_hora_fin', 'estado', 'nombre_reservante')
+        )
+        eventos = (
+            (reserva_id, inicio, fin, estado, f'Reservada: {reservante}', nombre)
+            for reserva_id, inicio, fin, estado, reservante in filas
+        )
+        return generar_ics(f'Reservas {nombre}', eventos, dominio)
+
+    return _feed('sala', sala_id, dominio, sede, calcular)
+
+
+def feed_rut(rut, dominio, sede=None):
+    """
+    Calendario con las reservas recientes y próximas de un RUT, en la sede
+    indicada o en todas (las canceladas se publican como STATUS:CANCELLED
+    para que se borren)
+    """
+    def calcular():
+        reservas = Reserva.objects.all() if sede is None else Reserva.objects.de_sede(sede)
+        filas = (
+            reservas.filter(rut=rut, fecha_hora_fin__gte=_desde())
+            .order_by('fecha_hora_inicio')
+            .values_list('id', 'fecha_hora_inicio', 'fecha_hora_fin', 'estado', 'sala__nombre')
+        )
+        eventos = (
+            (reserva_id, inicio, fin, estado, f'Sala {sala}', f'Reserva de sala de estudio: {sala}')
+            for reserva_id, inicio, fin, estado, sala in filas
+        )
+        return generar_ics(f'Mis reservas ({rut})', eventos, dominio)
+
+    return _feed('rut', rut, dominio, sede, calcular)
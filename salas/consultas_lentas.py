@@ -0,0 +1,192 @@
+"""
+Registro de consultas lentas con su plan de ejecución.
+
+ConsultasLentasMiddleware (ver middleware.py) instala un execute_wrapper en
+cada conexión mientras se atiende la petición. Toda consulta que tarda más
+de CONSULTAS_LENTAS_MS milisegundos se registra con:
+
+- su huella: el SQL normalizado (literales y listas IN colapsadas), para
+  agrupar las ejecuciones de la misma consulta con distintos parámetros,
+- la vista que la originó y los últimos frames de código de 'salas' en la
+  pila (ej. tiene_reservas_entre ← libre_entre ← esta_disponible),
+- los parámetros y el EXPLAIN de la ejecución más lenta
+  (EXPLAIN (FORMAT JSON) en PostgreSQL, EXPLAIN QUERY PLAN en SQLite).
+
+Los agregados por huella se guardan en la cache (con un backend compartido
+se juntan los de todos los workers) y se ven en panel-admin/consultas-lentas/.
+Cada consulta lenta también se escribe en el logger 'salas.consultas_lentas'.
+"""
+import hashlib
+import logging
+import re
+import time
+import traceback
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_CLAVE_CACHE = 'salas:consultas_lentas'
+
+# Huellas distintas que se conservan (se descartan las de menor tiempo total)
+HUELLAS_MAXIMO = 200
+
+# Frames de 'salas' que se guardan como origen de la consulta
+FRAMES_ORIGEN = 3
+
+# Sentencias a las que se les pide el plan (EXPLAIN sin ANALYZE no las ejecuta)
+SENTENCIAS_EXPLICABLES = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+_DIRECTORIO_SALAS = str(Path(__file__).resolve().parent)
+
+# Evita registrar las consultas del propio registro (EXPLAIN, cache en base de datos)
+_registrando = ContextVar('registrando_consulta_lenta', default=False)
+
+_NORMALIZACIONES = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),  # Literales de texto
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),  # Números
+    (re.compile(r'%s'), '?'),  # Parámetros
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),  # Listas IN de cualquier largo
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalizar(sql):
+    for patron, reemplazo in _NORMALIZACIONES:
+        sql = patron.sub(reemplazo, sql)
+    return sql.strip()
+
+
+def huella(sql_normalizado):
+    return hashlib.sha1(sql_normalizado.encode()).hexdigest()[:12]
+
+
+def origen_en_salas():
+    """
+    Retorna los frames más internos de la pila que pertenecen a 'salas'
+    (sin contar este módulo, los middleware ni los tests), ej:
+    'models.py:222 tiene_reservas_entre ← models.py:232 libre_entre'
+    """
+    frames = []
+    for frame in reversed(traceback.extract_stack()):
+        if not frame.filename.startswith(_DIRECTORIO_SALAS) or frame.filename == __file__:
+            continue
+        if Path(frame.filename).name in ('middleware.py', 'tests.py'):
+            continue
+        frames.append(f'{Path(frame.filename).relative_to(_DIRECTORIO_SALAS)}:{frame.lineno} {frame.name}')
+        if len(frames) == FRAMES_ORIGEN:
+            break
+    return ' ← '.join(frames)
+
+
+def explicar(connection, sql, params):
+    """
+    Retorna el plan de ejecución de la consulta como texto, o '' si la base
+    de datos no lo entrega
+    """
+    if not sql.lstrip().upper().startswith(SENTENCIAS_EXPLICABLES):
+        return ''
+    opciones = {'format': 'json'} if 'JSON' in connection.features.supported_explain_formats else {}
+    prefijo = connection.ops.explain_query_prefix(**opciones)
+    try:
+        # El savepoint evita que un EXPLAIN fallido aborte la transacción en curso
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'{prefijo} {sql}', params)
+            filas = cursor.fetchall()
+    except DatabaseError:
+        return ''
+    return '\n'.join(' '.join(str(valor) for valor in fila) for fila in filas)
+
+
+class RegistradorConsultas:
+    """
+    execute_wrapper que mide cada consulta y registra las que superan el umbral
+    """
+
+    def __init__(self, umbral_ms, vista=''):
+        self.umbral_ms = umbral_ms
+        self.vista = vista
+
+    def __call__(self, execute, sql, params, many, context):
+        if _registrando.get():
+            return execute(sql, params, many, context)
+
+        inicio = time.perf_counter()
+        resultado = execute(sql, params, many, context)
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        if milisegundos >= self.umbral_ms:
+            token = _registrando.set(True)
+            try:
+                self.registrar(context['connection'], sql, params, many, milisegundos)
+            finally:
+                _registrando.reset(token)
+        return resultado
+
+    def registrar(self, connection, sql, params, many, milisegundos):
+        vista = self.vista() if callable(self.vista) else self.vista
+        origen = origen_en_salas()
+        normalizado = normalizar(sql)
+        clave = huella(normalizado)
+        logger.warning('Consulta lenta (%.1f ms) en %s [%s]: %s', milisegundos, vista, origen, normalizado)
+
+        consultas = cache.get(_CLAVE_CACHE) or {}
+        consulta = consultas.get(clave)
+        if consulta is None:
+            consulta = consultas[clave] = {
+                'huella': clave,
+                'sql': normalizado,
+                'base_datos': connection.alias,
+                'veces': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'vistas': [],
+                'origenes': [],
+            }
+        consulta['veces'] += 1
+        consulta['total_ms'] += milisegundos
+        consulta['ultima'] = timezone.now()
+        for campo, valor in (('vistas', vista), ('origenes', origen)):
+            if valor and valor not in consulta[campo]:
+                consulta[campo] = (consulta[campo] + [valor])[-5:]
+        if milisegundos > consulta['max_ms']:
+            # Parámetros y plan de la ejecución más lenta
+            consulta['max_ms'] = milisegundos
+            consulta['parametros'] = repr(params)[:1000]
+            consulta['plan'] = '' if many else explicar(connection, sql, params)
+
+        if len(consultas) > HUELLAS_MAXIMO:
+            menor = min(consultas.values(), key=lambda datos: datos['total_ms'])
+            del consultas[menor['huella']]
+        cache.set(_CLAVE_CACHE, consultas, None)
+
+
+@contextmanager
+def registrando_consultas(umbral_ms, vista=''):
+    """
+    Registra las consultas lentas de todas las bases de datos dentro del
+    bloque. 'vista' puede ser un texto o una función que lo retorna.
+    """
+    registrador = RegistradorConsultas(umbral_ms, vista)
+    with ExitStack() as pila:
+        for alias in connections:
+            pila.enter_context(connections[alias].execute_wrapper(registrador))
+        yield registrador
+
+
+def listar_consultas():
+    """
+    Consultas lentas agregadas por huella, de mayor a menor tiempo total
+    """
+    consultas = list((cache.get(_CLAVE_CACHE) or {}).values())
+    for consulta in consultas:
+        consulta['promedio_ms'] = consulta['total_ms'] / consulta['veces']
+    return sorted(consultas, key=lambda consulta: consulta['total_ms'], reverse=True)
+
+
+def vaciar_consultas():
+    cache.delete(_CLAVE_CACHE)
@@ -0,0 +1,95 @@
+"""
+Mapas de bits de disponibilidad por sala y día.
+
+Cada día (en hora local) se divide en 96 casillas de 15 minutos. La casilla
+k vale 1 si alguna reserva activa ocupa parte del intervalo
+[k * 15 min, (k + 1) * 15 min). Los 96 bits se guardan en dos enteros de 48
+bits (mañana y tarde) en DisponibilidadDiaria, así se pueden marcar con un
+UPDATE ... SET manana = manana | mascara atómico en cualquier motor.
+
+Preguntar si una sala está libre entre T1 y T2 es un AND entre la máscara
+del intervalo y el mapa del día:
+
+- Resultado 0: ninguna reserva activa toca el intervalo (libre seguro).
+- Resultado distinto de 0: hay una reserva en alguna casilla del intervalo,
+  pero como las casillas son de 15 minutos puede que no se traslape
+  exactamente; en ese caso se confirma con la consulta a Reserva.
+
+Un bit marcado de más solo provoca esa consulta extra; un bit faltante daría
+una respuesta incorrecta. Por eso al crear reservas se marcan bits (OR) y al
+liberar (cancelar, finalizar, eliminar) se reconstruye el día desde Reserva.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+MINUTOS_CASILLA = 15
+CASILLAS_POR_DIA = 24 * 60 // MINUTOS_CASILLA
+CASILLAS_POR_MITAD = CASILLAS_POR_DIA // 2
+MASCARA_MITAD = (1 << CASILLAS_POR_MITAD) - 1
+DIA_COMPLETO = (1 << CASILLAS_POR_DIA) - 1
+
+
+def casilla(fecha_hora):
+    """
+    Número de casilla (0-95) de un datetime en hora local
+    """
+    return (fecha_hora.hour * 60 + fecha_hora.minute) // MINUTOS_CASILLA
+
+
+def rango(desde, hasta):
+    """
+    Máscara con las casillas desde..hasta (ambas inclusive)
+    """
+    return ((1 << (hasta - desde + 1)) - 1) << desde
+
+
+def dividir(mascara):
+    """
+    Separa una máscara de 96 bits en (manana, tarde)
+    """
+    return mascara & MASCARA_MITAD, mascara >> CASILLAS_POR_MITAD
+
+
+def unir(manana, tarde):
+    return (tarde << CASILLAS_POR_MITAD) | manana
+
+
+def inicio_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def mascaras_por_dia(inicio, fin):
+    """
+    Retorna {fecha: máscara} con las casillas que toca el intervalo [inicio, fin)
+    en cada día local. Un intervalo de largo cero marca su casilla.
+    """
+    inicio_local = timezone.localtime(inicio)
+    # El último instante ocupado (fin es exclusivo)
+    fin_local = timezone.localtime(max(fin - timedelta(microseconds=1), inicio))
+
+    mascaras = {}
+    fecha = inicio_local.date()
+    while fecha <= fin_local.date():
+        primera = casilla(inicio_local) if fecha == inicio_local.date() else 0
+        ultima = casilla(fin_local) if fecha == fin_local.date() else CASILLAS_POR_DIA - 1
+
+        if inicio_local.utcoffset() != fin_local.utcoffset():
+            # Cambio de horario dentro del intervalo: la hora local se repite o
+            # se salta, así que se marca el día completo (marcar de más es seguro)
+            primera, ultima = 0, CASILLAS_POR_DIA - 1
+
+        mascaras[fecha] = rango(primera, ultima)
+        fecha += timedelta(days=1)
+    return mascaras
+
+
+def acumular(mapas, sala_id, inicio, fin, fechas=None):
+    """
+    Agrega una reserva a un diccionario {(sala_id, fecha): máscara}.
+    Si se indica 'fechas' solo se consideran esos días.
+    """
+    for fecha, mascara in mascaras_por_dia(inicio, fin).items():
+        if fechas is None or fecha in fechas:
+            mapas[(sala_id, fecha)] = mapas.get((sala_id, fecha), 0) | mascara
+    return mapas
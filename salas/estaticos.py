@@ -0,0 +1,132 @@
+"""
+Archivos estáticos con hash en el nombre y versiones precomprimidas.
+
+- ManifestComprimido (STORAGES['staticfiles']): collectstatic copia cada
+  archivo con el hash de su contenido en el nombre (styles.3f2a9c.css) y
+  además genera styles.3f2a9c.css.gz y .br. Como el nombre cambia cuando
+  cambia el contenido, el navegador puede guardarlo para siempre.
+- servir_estatico: sirve STATIC_ROOT desde la aplicación (SERVIR_ESTATICOS),
+  eligiendo la variante comprimida según Accept-Encoding. Los archivos con
+  hash se marcan como immutable por un año, así una visita repetida no
+  vuelve a descargar ni a revalidar el CSS.
+
+Con un servidor web delante (nginx: gzip_static / brotli_static) basta con
+ManifestComprimido; las variantes ya quedan generadas en STATIC_ROOT.
+"""
+import gzip
+import mimetypes
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin el paquete Brotli solo se generan .gz
+    brotli = None
+
+# Extensiones que vale la pena comprimir (imágenes y fuentes ya vienen comprimidas)
+EXTENSIONES_COMPRIMIBLES = {'.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico'}
+
+# Variantes en orden de preferencia: (codificación, extensión)
+VARIANTES = [('br', '.br'), ('gzip', '.gz')]
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+
+# Archivos sin hash en el nombre (ej. pedidos con la URL original): revalidar pronto
+CACHE_SIN_HASH = 'public, max-age=300'
+
+
+def comprimir(contenido):
+    """
+    Retorna {extensión: bytes} con las variantes comprimidas de 'contenido'
+    que resultan más chicas que el original
+    """
+    variantes = {'.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes['.br'] = brotli.compress(contenido, quality=11)
+    return {extension: datos for extension, datos in variantes.items() if len(datos) < len(contenido)}
+
+
+class ManifestComprimido(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage que además escribe versiones .gz y .br de
+    cada archivo de texto procesado por collectstatic
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        for original, procesado in self.hashed_files.items():
+            for nombre in {original, procesado}:
+                if Path(nombre).suffix.lower() not in EXTENSIONES_COMPRIMIBLES or not self.exists(nombre):
+                    continue
+                with self.open(nombre) as archivo:
+                    contenido = archivo.read()
+                for extension, datos in comprimir(contenido).items():
+                    destino = self.path(nombre + extension)
+                    with open(destino, 'wb') as salida:
+                        salida.write(datos)
+
+    def stored_name(self, name):
+        # Sin manifiesto (no se ha ejecutado collectstatic, ej. en desarrollo
+        # o en los tests) se usan los nombres originales en vez de fallar
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+def es_inmutable(ruta):
+    """
+    Indica si 'ruta' es un nombre con hash generado por collectstatic
+    """
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return ruta in set(hashed_files.values())
+
+
+def elegir_variante(ruta_completa, accept_encoding):
+    """
+    Retorna (ruta del archivo a enviar, Content-Encoding o None) según las
+    codificaciones que acepta el cliente y las variantes que existen
+    """
+    aceptadas = {valor.split(';')[0].strip().lower() for valor in accept_encoding.split(',')}
+    for codificacion, extension in VARIANTES:
+        if codificacion in aceptadas and os.path.exists(ruta_completa + extension):
+            return ruta_completa + extension, codificacion
+    return ruta_completa, None
+
+
+def servir_estatico(request, ruta):
+    """
+    Sirve un archivo de STATIC_ROOT con su variante precomprimida y
+    encabezados de cache de larga duración
+    """
+    try:
+        ruta_completa = safe_join(settings.STATIC_ROOT, ruta)
+    except SuspiciousFileOperation:
+        raise Http404('Archivo no encontrado.')
+    if not os.path.isfile(ruta_completa):
+        raise Http404('Archivo no encontrado.')
+
+    archivo, codificacion = elegir_variante(ruta_completa, request.headers.get('Accept-Encoding', ''))
+    estado = os.stat(archivo)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), estado.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        tipo, _ = mimetypes.guess_type(ruta_completa)
+        response = FileResponse(open(archivo, 'rb'), content_type=tipo or 'application/octet-stream')
+        if codificacion:
+            response['Content-Encoding'] = codificacion
+
+    response['Last-Modified'] = http_date(estado.st_mtime)
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = CACHE_INMUTABLE if es_inmutable(ruta) else CACHE_SIN_HASH
+    return response
@@ -0,0 +1,99 @@
+"""
+Lectura del outbox de cambios (EventoCambio) para sistemas externos.
+
+Cada consumidor guarda el id del último evento que procesó (su cursor) y
+pide los siguientes en lotes, así lee solo lo que cambió
+desde la última vez: GET /api/eventos/?desde=<cursor> o el comando
+manage.py seguir_eventos.
+
+Los ids salen de una secuencia común: una transacción que obtuvo un id menor
+puede confirmarse después que otra con un id mayor, y un consumidor que ya
+avanzó su cursor perdería ese evento. Por eso los eventos no se entregan
+por id sino en un orden en el que lo que se confirma después siempre queda
+después del cursor:
+
+- En PostgreSQL cada evento guarda el id de su transacción (ver
+  EventoCambioManager.registrar) y se ordenan por (transaccion, id). Solo se
+  entregan los de transacciones anteriores al horizonte,
+  pg_snapshot_xmin(pg_current_snapshot()): todas ellas ya se confirmaron o
+  revirtieron, y cualquier transacción en curso o futura queda después. El
+  cursor sigue siendo el id del último evento entregado; su transacción
+  indica desde dónde seguir.
+- SQLite serializa las transacciones que escriben, así que los ids ya están
+  en orden de confirmación (transaccion vale 0 en todos los eventos).
+
+Las escrituras no se esperan entre sí; un evento de una transacción larga
+solo se atrasa, nunca se salta.
+"""
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import EventoCambio
+
+# Cantidad máxima de eventos por lectura
+LOTE_MAXIMO = 1000
+
+
+def horizonte(alias):
+    """
+    Transacción más antigua que todavía puede estar en curso en 'alias' (las
+    anteriores ya terminaron). None fuera de PostgreSQL.
+    """
+    conexion = connections[alias]
+    if conexion.vendor != 'postgresql':
+        return None
+    with conexion.cursor() as cursor:
+        cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        return cursor.fetchone()[0]
+
+
+def leer_eventos(desde=0, limite=100, sede=None):
+    """
+    Retorna (eventos, hay_mas) con hasta 'limite' eventos confirmados después
+    del evento 'desde', de la sede indicada o de todas las de la base de datos
+    """
+    limite = max(1, min(limite, LOTE_MAXIMO))
+    alias = router.db_for_read(EventoCambio)
+    eventos = EventoCambio.objects.using(alias)
+    if sede is not None:
+        eventos = eventos.filter(sede=sede)
+    tope = horizonte(alias)
+    if tope is not None:
+        eventos = eventos.filter(transaccion__lt=tope)
+    if desde:
+        transaccion = EventoCambio.objects.using(alias).filter(pk=desde).values_list('transaccion', flat=True).first()
+        if transaccion is None:
+            # Cursor desconocido: se sigue por id
+            eventos = eventos.filter(id__gt=desde)
+        else:
+            eventos = eventos.filter(Q(transaccion__gt=transaccion) | Q(transaccion=transaccion, id__gt=desde))
+
+    filas = list(eventos.order_by('transaccion', 'id')[:limite + 1])
+    return filas[:limite], len(filas) > limite
+
+
+def ultimo_evento(sede=None):
+    """
+    Id del último evento que ya se puede entregar (0 si no hay): un cursor
+    desde el que leer_eventos() entrega solo lo que ocurra después
+    """
+    alias = router.db_for_read(EventoCambio)
+    eventos = EventoCambio.objects.using(alias)
+    if sede is not None:
+        eventos = eventos.filter(sede=sede)
+    tope = horizonte(alias)
+    if tope is not None:
+        eventos = eventos.filter(transaccion__lt=tope)
+    return eventos.order_by('-transaccion', '-id').values_list('id', flat=True).first() or 0
+
+
+def serializar(evento):
+    return {
+        'id': evento.pk,
+        'fecha': evento.fecha.isoformat(),
+        'sede': evento.sede_id,
+        'modelo': evento.modelo,
+        'objeto_id': evento.objeto_id,
+        'accion': evento.accion,
+        'datos': evento.datos,
+    }
@@ -1,7 +1,8 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from .models import Reserva, Sala
+from datetime import datetime, timedelta
+from .models import Reserva, Sala, normalizar_rut, validar_rut
 
 class ReservaForm(forms.ModelForm):
     """
@@ -9,7 +10,7 @@ class ReservaForm(forms.ModelForm):
     """
     class Meta:
         model = Reserva
-        fields = ['sala', 'rut', 'nombre_reservante']
+        fields = ['sala', 'rut', 'nombre_reservante', 'email']
         widgets = {
             'sala': forms.Select(attrs={
                 'class': 'form-control',
@@ -23,17 +24,28 @@ class ReservaForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': 'Ingrese su nombre completo',
             }),
+            'email': forms.EmailInput(attrs={
+                'class': 'form-control',
+                'placeholder': 'Ej: nombre@correo.cl',
+            }),
         }
         labels = {
             'sala': 'Seleccione una sala',
             'rut': 'RUT (con guión)',
             'nombre_reservante': 'Nombre completo',
+            'email': 'Correo electrónico (opcional)',
+        }
+        help_texts = {
+            'email': 'Le avisaremos 15 minutos antes de que termine su reserva.',
         }
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, sede=None, **kwargs):
         super().__init__(*args, **kwargs)
-        # Mostrar solo salas habilitadas y disponibles
-        self.fields['sala'].queryset = Sala.objects.filter(habilitada=True)
+        # Mostrar solo salas habilitadas y disponibles (de la sede, si se indica)
+        salas = Sala.objects.filter(habilitada=True)
+        if sede is not None:
+            salas = salas.filter(sede=sede)
+        self.fields['sala'].queryset = salas
     
     def clean_rut(self):
         """
@@ -41,11 +53,8 @@ class ReservaForm(forms.ModelForm):
         """
         rut = self.cleaned_data.get('rut')
         if rut:
-            # Eliminar puntos y espacios
-            rut = rut.replace('.', '').replace(' ', '').upper()
-            # Agregar guión si no lo tiene
-            if '-' not in rut and len(rut) >= 2:
-                rut = rut[:-1] + '-' + rut[-1]
+            # Eliminar puntos y espacios y agregar guión si no lo tiene
+            rut = normalizar_rut(rut)
         return rut
     
     def clean_sala(self):
@@ -56,3 +65,260 @@ class ReservaForm(forms.ModelForm):
         if sala and not sala.esta_disponible():
             raise ValidationError('Esta sala no está disponible en este momento.')
         return sala
+
+
+class BusquedaReservaForm(forms.Form):
+    """
+    Formulario de búsqueda de reservas para el panel de administración.
+    """
+    q = forms.CharField(
+        required=False,
+        max_length=200,
+        label='RUT o nombre',
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Ej: 12345678 o Juan Pérez',
+        }),
+    )
+    desde = forms.DateField(
+        required=False,
+        label='Desde',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    hasta = forms.DateField(
+        required=False,
+        label='Hasta',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    
+    def clean(self):
+        """
+        Se valida que el rango de fechas sea coherente
+        """
+        cleaned_data = super().clean()
+        desde = cleaned_data.get('desde')
+        hasta = cleaned_data.get('hasta')
+        if desde and hasta and hasta < desde:
+            raise ValidationError('La fecha "hasta" debe ser igual o posterior a la fecha "desde".')
+        return cleaned_data
+
+
+class PeriodoOcupacionForm(forms.Form):
+    """
+    Formulario para elegir el período del mapa de ocupación de salas.
+    """
+    # Límite del período para mantener acotado el cálculo (un año académico y algo más)
+    MAXIMO_DIAS = 400
+    
+    desde = forms.DateField(
+        label='Desde',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    hasta = forms.DateField(
+        label='Hasta',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    
+    def clean(self):
+        """
+        Se valida que el período sea coherente y no demasiado largo
+        """
+        cleaned_data = super().clean()
+        desde = cleaned_data.get('desde')
+        hasta = cleaned_data.get('hasta')
+        if desde and hasta:
+            if hasta < desde:
+                raise ValidationError('La fecha "hasta" debe ser igual o posterior a la fecha "desde".')
+            if (hasta - desde).days > self.MAXIMO_DIAS:
+                raise ValidationError(f'El período no puede superar los {self.MAXIMO_DIAS} días.')
+        return cleaned_data
+
+
+class BuscarSalaForm(forms.Form):
+    """
+    Formulario para buscar una sala libre según tamaño del grupo, horario y duración.
+    """
+    DURACION_CHOICES = [
+        (30, '30 minutos'),
+        (60, '1 hora'),
+        (90, '1 hora 30 minutos'),
+        (120, '2 horas'),
+    ]
+    
+    personas = forms.IntegerField(
+        min_value=1,
+        initial=1,
+        label='Personas',
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+    fecha = forms.DateField(
+        label='Fecha',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    desde = forms.TimeField(
+        label='Comenzar desde',
+        widget=forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
+    )
+    hasta = forms.TimeField(
+        label='Comenzar a más tardar',
+        widget=forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
+    )
+    duracion = forms.TypedChoiceField(
+        choices=DURACION_CHOICES,
+        coerce=int,
+        initial=120,
+        label='Duración',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    
+    def clean(self):
+        """
+        Se valida que la ventana de inicio sea coherente y no esté en el pasado
+        """
+        cleaned_data = super().clean()
+        fecha = cleaned_data.get('fecha')
+        desde = cleaned_data.get('desde')
+        hasta = cleaned_data.get('hasta')
+        if fecha and desde and hasta:
+            if hasta < desde:
+                raise ValidationError('La hora "a más tardar" debe ser igual o posterior a la hora "desde".')
+            inicio_ventana = timezone.make_aware(datetime.combine(fecha, desde))
+            fin_ventana = timezone.make_aware(datetime.combine(fecha, hasta))
+            if fin_ventana < timezone.now():
+                raise ValidationError('La ventana de inicio ya pasó.')
+            # Las búsquedas para hoy parten desde ahora
+            cleaned_data['inicio_ventana'] = max(inicio_ventana, timezone.now())
+            cleaned_data['fin_ventana'] = fin_ventana
+        return cleaned_data
+
+
+class FiltroSalasForm(forms.Form):
+    """
+    Formulario de filtros del catálogo de salas (listado público y panel).
+    """
+    ORDEN_CHOICES = [
+        ('nombre', 'Nombre (A-Z)'),
+        ('-nombre', 'Nombre (Z-A)'),
+        ('capacidad', 'Menor capacidad'),
+        ('-capacidad', 'Mayor capacidad'),
+        ('disponible', 'Disponibles primero'),
+    ]
+    
+    nombre = forms.CharField(
+        required=False,
+        max_length=100,
+        label='Nombre',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Buscar por nombre'}),
+    )
+    capacidad_min = forms.IntegerField(
+        required=False,
+        min_value=1,
+        label='Capacidad mínima',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Mín.'}),
+    )
+    capacidad_max = forms.IntegerField(
+        required=False,
+        min_value=1,
+        label='Capacidad máxima',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Máx.'}),
+    )
+    disponibles = forms.BooleanField(
+        required=False,
+        label='Solo disponibles ahora',
+    )
+    orden = forms.ChoiceField(
+        required=False,
+        choices=ORDEN_CHOICES,
+        label='Ordenar por',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    
+    def clean(self):
+        """
+        Se valida que el rango de capacidad sea coherente
+        """
+        cleaned_data = super().clean()
+        capacidad_min = cleaned_data.get('capacidad_min')
+        capacidad_max = cleaned_data.get('capacidad_max')
+        if capacidad_min and capacidad_max and capacidad_max < capacidad_min:
+            raise ValidationError('La capacidad máxima debe ser igual o mayor que la mínima.')
+        return cleaned_data
+
+
+class ReservaGrupoForm(forms.Form):
+    """
+    Formulario para reservar varias salas a la vez para el mismo horario.
+    """
+    MINIMO_SALAS = 2
+    MAXIMO_SALAS = 4
+    
+    salas = forms.ModelMultipleChoiceField(
+        queryset=Sala.objects.none(),
+        label='Salas',
+        widget=forms.CheckboxSelectMultiple,
+    )
+    rut = forms.CharField(
+        max_length=12,
+        validators=[validar_rut],
+        label='RUT (con guión)',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: 12345678-9', 'maxlength': '12'}),
+    )
+    nombre_reservante = forms.CharField(
+        max_length=200,
+        label='Nombre completo',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ingrese su nombre completo'}),
+    )
+    email = forms.EmailField(
+        required=False,
+        label='Correo electrónico (opcional)',
+        widget=forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'Ej: nombre@correo.cl'}),
+    )
+    fecha = forms.DateField(
+        label='Fecha',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    hora = forms.TimeField(
+        label='Hora de inicio',
+        widget=forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
+    )
+    duracion = forms.TypedChoiceField(
+        choices=BuscarSalaForm.DURACION_CHOICES,
+        coerce=int,
+        initial=120,
+        label='Duración',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    
+    def __init__(self, *args, sede=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Las salas por puestos no se reservan completas
+        salas = Sala.objects.filter(habilitada=True, por_puestos=False).order_by('nombre')
+        if sede is not None:
+            salas = salas.filter(sede=sede)
+        self.fields['salas'].queryset = salas
+    
+    def clean_rut(self):
+        return normalizar_rut(self.cleaned_data['rut'])
+    
+    def clean_salas(self):
+        salas = self.cleaned_data['salas']
+        if not self.MINIMO_SALAS <= len(salas) <= self.MAXIMO_SALAS:
+            raise ValidationError(f'Seleccione entre {self.MINIMO_SALAS} y {self.MAXIMO_SALAS} salas.')
+        return salas
+    
+    def clean(self):
+        """
+        Se calcula el horario de la reserva y se valida que no esté en el pasado
+        """
+        cleaned_data = super().clean()
+        fecha = cleaned_data.get('fecha')
+        hora = cleaned_data.get('hora')
+        duracion = cleaned_data.get('duracion')
+        if fecha and hora and duracion:
+            inicio = timezone.make_aware(datetime.combine(fecha, hora))
+            # Margen para quien reserva "ahora" con la hora actual del formulario
+            if inicio < timezone.now() - timedelta(minutes=5):
+                raise ValidationError('La hora de inicio ya pasó.')
+            cleaned_data['inicio'] = inicio
+            cleaned_data['fin'] = inicio + timedelta(minutes=duracion)
+        return cleaned_data
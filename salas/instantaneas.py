@@ -0,0 +1,191 @@
+"""
+Instantáneas de reservas para analítica fuera de la base de datos principal.
+
+manage.py instantanea_reservas escribe las reservas (con los datos de su
+sala) en un archivo NDJSON comprimido con gzip por mes de inicio:
+
+    destino/
+        indice.json                   meses, filas, tamaño y cursor del outbox
+        reservas-2025-09.ndjson.gz
+        reservas-2025-10.ndjson.gz
+
+La primera vez se escriben todos los meses. Las siguientes se leen los
+eventos de cambio (ver eventos.py) posteriores al cursor guardado en el
+índice y solo se reescriben los meses afectados: el mes de cada reserva
+cambiada (y los meses que tuvo antes, por si se movió de fecha) y todos los
+meses con reservas de una sala editada o eliminada. Las filas se leen con
+.iterator(), sin cargar el mes completo en memoria, y cada archivo se
+escribe en uno temporal que luego reemplaza al anterior.
+
+No se exportan el nombre ni el correo del reservante.
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .eventos import LOTE_MAXIMO, leer_eventos, ultimo_evento
+from .models import EventoCambio, Reserva
+
+NOMBRE_INDICE = 'indice.json'
+
+# Campo del archivo: lookup en Reserva
+CAMPOS_INSTANTANEA = {
+    'id': 'pk',
+    'sala_id': 'sala_id',
+    'sala': 'sala__nombre',
+    'capacidad': 'sala__capacidad',
+    'rut': 'rut',
+    'inicio': 'fecha_hora_inicio',
+    'fin': 'fecha_hora_fin',
+    'creada': 'fecha_creacion',
+    'estado': 'estado',
+}
+
+
+def mes_de(fecha):
+    return f'{timezone.localtime(fecha):%Y-%m}'
+
+
+def rango_mes(mes):
+    """
+    Retorna (inicio, fin) del mes 'AAAA-MM' en la zona horaria local
+    """
+    anio, numero = map(int, mes.split('-'))
+    siguiente = (anio + 1, 1) if numero == 12 else (anio, numero + 1)
+    return (
+        timezone.make_aware(datetime(anio, numero, 1)),
+        timezone.make_aware(datetime(*siguiente, 1)),
+    )
+
+
+def reservas_exportables(sede=None):
+    reservas = Reserva.objects.filter(sala__eliminada=False)
+    if sede is not None:
+        reservas = reservas.de_sede(sede)
+    return reservas
+
+
+def meses_con_reservas(reservas):
+    return {f'{mes:%Y-%m}' for mes in reservas.datetimes('fecha_hora_inicio', 'month')}
+
+
+def meses_modificados(eventos):
+    """
+    Meses cuyas reservas cambiaron según los eventos
+    """
+    meses = set()
+    ids_reservas, ids_salas = set(), set()
+    for evento in eventos:
+        if evento.modelo == 'reserva':
+            ids_reservas.add(evento.objeto_id)
+        else:
+            ids_salas.add(evento.objeto_id)
+
+    # Todas las fechas que tuvo cada reserva, según su historial en el outbox
+    if ids_reservas:
+        historial = EventoCambio.objects.filter(modelo='reserva', objeto_id__in=ids_reservas)
+        for datos in historial.values_list('datos', flat=True).iterator():
+            inicio = parse_datetime(datos.get('fecha_hora_inicio') or '')
+            if inicio:
+                meses.add(mes_de(inicio))
+
+    # Una sala editada o eliminada cambia las filas de todos sus meses; se
+    # incluyen las eliminadas para quitar sus reservas de los archivos
+    if ids_salas:
+        meses |= meses_con_reservas(Reserva.objects.filter(sala_id__in=ids_salas))
+    return meses
+
+
+def escribir_mes(directorio, mes, reservas):
+    """
+    Escribe las reservas del mes en su archivo y retorna sus datos para el
+    índice, o None (y borra el archivo) si el mes quedó sin reservas
+    """
+    inicio, fin = rango_mes(mes)
+    filas = (
+        reservas.filter(fecha_hora_inicio__gte=inicio, fecha_hora_inicio__lt=fin)
+        .order_by('pk')
+        .values_list(*CAMPOS_INSTANTANEA.values())
+    )
+    archivo = directorio / f'reservas-{mes}.ndjson.gz'
+    temporal = archivo.with_name(archivo.name + '.tmp')
+
+    total = 0
+    with gzip.open(temporal, 'wt', encoding='utf-8') as salida:
+        for fila in filas.iterator(chunk_size=2000):
+            fila = dict(zip(CAMPOS_INSTANTANEA, fila))
+            salida.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+            total += 1
+
+    if not total:
+        temporal.unlink()
+        archivo.unlink(missing_ok=True)
+        return None
+
+    os.replace(temporal, archivo)
+    return {
+        'archivo': archivo.name,
+        'filas': total,
+        'bytes': archivo.stat().st_size,
+        'generado': timezone.now().isoformat(),
+    }
+
+
+def leer_indice(directorio):
+    ruta = Path(directorio) / NOMBRE_INDICE
+    if not ruta.exists():
+        return None
+    return json.loads(ruta.read_text())
+
+
+def actualizar(directorio, sede=None, completo=False):
+    """
+    Actualiza la instantánea en 'directorio'. Retorna (meses reescritos,
+    índice). Con 'completo' (o sin índice previo) se reescriben todos.
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    indice = None if completo else leer_indice(directorio)
+    reservas = reservas_exportables(sede)
+
+    # El outbox se lee antes que las reservas: un cambio posterior queda
+    # después del cursor y se toma en la próxima ejecución
+    if indice is None:
+        cursor = ultimo_evento(sede)
+        indice = {'meses': {}}
+        meses = meses_con_reservas(reservas)
+    else:
+        cursor = indice['cursor']
+        meses = set()
+        while True:
+            lote, hay_mas = leer_eventos(cursor, LOTE_MAXIMO, sede)
+            if lote:
+                cursor = lote[-1].pk
+                meses |= meses_modificados(lote)
+            if not hay_mas:
+                break
+
+    for mes in sorted(meses):
+        datos = escribir_mes(directorio, mes, reservas)
+        if datos:
+            indice['meses'][mes] = datos
+        else:
+            indice['meses'].pop(mes, None)
+
+    indice.update({
+        'sede': sede.codigo if sede else None,
+        'cursor': cursor,
+        'campos': list(CAMPOS_INSTANTANEA),
+        'actualizado': timezone.now().isoformat(),
+    })
+    indice['meses'] = dict(sorted(indice['meses'].items()))
+    temporal = directorio / (NOMBRE_INDICE + '.tmp')
+    temporal.write_text(json.dumps(indice, ensure_ascii=False, indent=2))
+    os.replace(temporal, directorio / NOMBRE_INDICE)
+    return sorted(meses), indice
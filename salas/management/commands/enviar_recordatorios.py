@@ -0,0 +1,50 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from salas.recordatorios import procesar
+from salas.sedes import sede_de_opcion, usar_sede
+
+
+class Command(BaseCommand):
+    help = (
+        'Envía recordatorios por correo de las reservas que empiezan o terminan '
+        'dentro de la ventana. Pensado para correr con --seguir como proceso '
+        'aparte (o cada minuto con cron), fuera de los workers web.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventana', type=int, default=15, help='Minutos de anticipación (por defecto 15)')
+        parser.add_argument('--hilos', type=int, default=4, help='Hilos de envío en paralelo (por defecto 4)')
+        parser.add_argument('--lote', type=int, default=100, help='Correos por conexión SMTP (por defecto 100)')
+        parser.add_argument('--limite', type=int, help='Máximo de recordatorios por ciclo')
+        parser.add_argument('--seguir', action='store_true', help='Repetir el ciclo hasta interrumpir el proceso')
+        parser.add_argument('--intervalo', type=float, default=30, help='Segundos entre ciclos con --seguir')
+        parser.add_argument('--sede', help='Código de la sede (por defecto la base de datos "default")')
+
+    def handle(self, *args, **options):
+        sede = sede_de_opcion(options['sede'])
+
+        ventana = timedelta(minutes=options['ventana'])
+        with usar_sede(sede):
+            while True:
+                inicio = time.perf_counter()
+                enviados, fallidos = procesar(
+                    timezone.now(), ventana, options['hilos'], options['lote'], options['limite']
+                )
+                segundos = time.perf_counter() - inicio
+
+                if enviados or fallidos:
+                    self.stdout.write(f'📧 {enviados} recordatorios enviados en {segundos:.1f} s')
+                if fallidos:
+                    self.stdout.write(self.style.WARNING(
+                        f'⚠️  {fallidos} recordatorios fallaron; se reintentarán en el próximo ciclo.'
+                    ))
+
+                if not options['seguir']:
+                    break
+                time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS('✅ Recordatorios procesados.'))
@@ -0,0 +1,267 @@
+import logging
+import random
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from html import unescape
+
+import numpy as np
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from salas.models import Reserva, Sala, calcular_dv
+from salas.sedes import sede_de_opcion, usar_sede
+
+PREFIJO_SALAS = 'Estrés'
+
+# En SQLite, segundos que una transacción espera el bloqueo de escritura
+# antes de fallar con "database is locked"
+ESPERA_SQLITE = 30
+
+# Primer error de formulario de la respuesta (motivo del rechazo)
+_ERROR_FORMULARIO = re.compile(r'<ul class="errorlist[^"]*">\s*<li>(.*?)</li>', re.S)
+
+
+def clasificar(response):
+    """
+    Retorna el resultado de una petición: 'ok', el motivo del rechazo o el
+    código de error HTTP
+    """
+    if response.status_code >= 500:
+        if response.exc_info:
+            error = response.exc_info[1]
+            return f'error {response.status_code}: {type(error).__name__}: {error}'
+        return f'error {response.status_code}'
+    niveles = {mensaje.level_tag: mensaje.message for mensaje in get_messages(response.wsgi_request)}
+    if response.status_code == 302 and 'success' in niveles:
+        return 'ok'
+    error = _ERROR_FORMULARIO.search(response.content.decode()) if response.status_code == 200 else None
+    if error:
+        return unescape(error.group(1)).strip()
+    return niveles.get('error', f'respuesta {response.status_code}')
+
+
+@contextmanager
+def transacciones_inmediatas(alias):
+    """
+    En SQLite, durante la prueba las transacciones toman el bloqueo de
+    escritura al empezar (BEGIN IMMEDIATE) y lo esperan hasta ESPERA_SQLITE
+    segundos: con transacciones diferidas, dos que leyeron y luego escriben
+    fallan con "database is locked" en vez de esperarse, y la prueba mediría
+    esos errores y no el flujo de reserva. Las conexiones que se abren dentro
+    del bloque (la de cada hilo) usan estas opciones.
+    """
+    conexion = connections[alias]
+    if conexion.vendor != 'sqlite':
+        yield
+        return
+    opciones = conexion.settings_dict.setdefault('OPTIONS', {})
+    anteriores = dict(opciones)
+    opciones.update(transaction_mode='IMMEDIATE', timeout=ESPERA_SQLITE)
+    conexion.close()
+    try:
+        yield
+    finally:
+        opciones.clear()
+        opciones.update(anteriores)
+        conexion.close()
+
+
+def trabajar(sede, salas, ruts, operaciones, proporcion_cancelar, semilla):
+    """
+    Ejecuta 'operaciones' peticiones al azar (crear o cancelar) con su propio
+    Client. Retorna una lista de (operación, resultado, milisegundos).
+    """
+    rng = random.Random(semilla)
+    client = Client(raise_request_exception=False)
+    resultados = []
+    for _ in range(operaciones):
+        if rng.random() < proporcion_cancelar:
+            # La reserva a cancelar se elige fuera de la medición
+            activas = list(
+                Reserva.objects.filter(sala__in=salas, estado='activa').values_list('pk', 'version')
+            )
+            if not activas:
+                continue
+            reserva_id, version = rng.choice(activas)
+            operacion = 'cancelar'
+            url = reverse('cancelar_reserva', args=[reserva_id])
+            datos = {'version': version}
+        else:
+            sala = rng.choice(salas)
+            operacion = 'crear'
+            url = reverse('crear_reserva', args=[sala.pk])
+            datos = {'sala': sala.pk, 'rut': rng.choice(ruts), 'nombre_reservante': 'Prueba de Estrés'}
+
+        inicio = time.perf_counter()
+        response = client.post(f'{url}?sede={sede.codigo}', datos)
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        resultados.append((operacion, clasificar(response), milisegundos))
+    return resultados
+
+
+def trabajar_en_hilo(*args):
+    try:
+        return trabajar(*args)
+    finally:
+        # Cada hilo abre sus propias conexiones
+        connections.close_all()
+
+
+def traslapes(salas):
+    """
+    Salas con reservas activas que se traslapan: {nombre: cantidad de pares}
+    """
+    resultado = Counter()
+    reservas = (
+        Reserva.objects.filter(sala__in=salas, estado='activa')
+        .order_by('sala_id', 'fecha_hora_inicio')
+        .values_list('sala__nombre', 'fecha_hora_inicio', 'fecha_hora_fin')
+    )
+    anterior = None
+    for nombre, inicio, fin in reservas:
+        if anterior and anterior[0] == nombre and inicio < anterior[1]:
+            resultado[nombre] += 1
+        if not anterior or anterior[0] != nombre or fin > anterior[1]:
+            anterior = (nombre, fin)
+    return resultado
+
+
+def ruts_repetidos(salas):
+    """
+    RUT con más de una reserva activa vigente: {rut: cantidad}
+    """
+    activas = Counter(
+        Reserva.objects.filter(sala__in=salas, estado='activa', fecha_hora_fin__gte=timezone.now())
+        .values_list('rut', flat=True)
+    )
+    return {rut: cantidad for rut, cantidad in activas.items() if cantidad > 1}
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de estrés del flujo de reservas: varios hilos crean y cancelan '
+        'reservas de las mismas salas y RUT a través de las vistas, y al final '
+        'se verifican las reglas (sin traslapes por sala, una reserva activa por '
+        'RUT). Escribe en la base de datos: usar solo en una base local.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos en paralelo (por defecto 8)')
+        parser.add_argument('--operaciones', type=int, default=100, help='Peticiones por hilo (por defecto 100)')
+        parser.add_argument('--salas', type=int, default=3, help='Salas en disputa (por defecto 3)')
+        parser.add_argument('--ruts', type=int, default=20, help='RUT distintos (por defecto 20)')
+        parser.add_argument(
+            '--cancelar', type=float, default=0.3, help='Proporción de cancelaciones (por defecto 0.3)'
+        )
+        parser.add_argument('--semilla', type=int, default=2025, help='Semilla para reproducir la prueba')
+        parser.add_argument('--sede', help='Código de la sede (por defecto la principal)')
+        parser.add_argument('--conservar', action='store_true', help='No borrar las salas y reservas de prueba')
+        parser.add_argument('--forzar', action='store_true', help='Ejecutar aunque DEBUG esté desactivado')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['forzar']:
+            raise CommandError('DEBUG está desactivado: use --forzar si de verdad es una base de datos de pruebas.')
+        if options['hilos'] < 1 or options['salas'] < 1 or options['ruts'] < 1:
+            raise CommandError('--hilos, --salas y --ruts deben ser mayores que cero.')
+
+        sede = sede_de_opcion(options['sede'], principal=True)
+
+        with usar_sede(sede):
+            if connection.vendor == 'sqlite':
+                # WAL: las lecturas no esperan a las escrituras de otros hilos
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode=WAL')
+
+            salas = [
+                Sala.objects.create(nombre=f'{PREFIJO_SALAS} {i + 1} #{time.time_ns()}', capacidad=4)
+                for i in range(options['salas'])
+            ]
+            ruts = [f'{cuerpo}-{calcular_dv(cuerpo)}' for cuerpo in range(30000000, 30000000 + options['ruts'])]
+            try:
+                with transacciones_inmediatas(connection.alias):
+                    resultados, segundos = self.ejecutar(sede, salas, ruts, options)
+                self.reportar(resultados, segundos)
+                problemas = self.verificar(salas)
+            finally:
+                if not options['conservar']:
+                    Reserva.objects.filter(sala__in=salas).eliminar()
+                    Sala.todas.filter(pk__in=[sala.pk for sala in salas]).delete()
+
+        if problemas:
+            raise CommandError(f'Se violaron las reglas de reserva ({problemas} problemas).')
+        self.stdout.write(self.style.SUCCESS('✅ Las reglas de reserva se cumplieron bajo concurrencia.'))
+
+    def ejecutar(self, sede, salas, ruts, options):
+        hilos = options['hilos']
+        self.stdout.write(
+            f'🔥 {hilos} hilos × {options["operaciones"]} peticiones sobre {len(salas)} salas '
+            f'y {len(ruts)} RUT ({connection.vendor})...'
+        )
+        argumentos = [
+            (sede, salas, ruts, options['operaciones'], options['cancelar'], options['semilla'] + numero)
+            for numero in range(hilos)
+        ]
+        # Client usa el host 'testserver'. Los errores 500 se resumen en el
+        # reporte en vez de imprimir cada traceback.
+        registro = logging.getLogger('django.request')
+        nivel = registro.level
+        registro.setLevel(logging.CRITICAL)
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                inicio = time.perf_counter()
+                if hilos == 1:
+                    # Sin hilos (útil para depurar)
+                    por_hilo = [trabajar(*argumentos[0])]
+                else:
+                    with ThreadPoolExecutor(max_workers=hilos) as pool:
+                        por_hilo = list(pool.map(trabajar_en_hilo, *zip(*argumentos)))
+                segundos = time.perf_counter() - inicio
+        finally:
+            registro.setLevel(nivel)
+        return [resultado for resultados in por_hilo for resultado in resultados], segundos
+
+    def reportar(self, resultados, segundos):
+        self.stdout.write(
+            f'⏱️  {len(resultados)} peticiones en {segundos:.1f} s ({len(resultados) / segundos:.1f} por segundo)'
+        )
+        for operacion in ('crear', 'cancelar'):
+            tiempos = [ms for op, _, ms in resultados if op == operacion]
+            if not tiempos:
+                continue
+            p50, p95, p99 = np.percentile(tiempos, [50, 95, 99])
+            self.stdout.write(
+                f'\n📊 {operacion}: {len(tiempos)} peticiones · p50 {p50:.1f} ms · p95 {p95:.1f} ms · '
+                f'p99 {p99:.1f} ms · máx {max(tiempos):.1f} ms'
+            )
+            mezcla = Counter(resultado for op, resultado, _ in resultados if op == operacion)
+            for resultado, cantidad in mezcla.most_common():
+                self.stdout.write(f'   • {cantidad:>6}  {resultado}')
+
+    def verificar(self, salas):
+        self.stdout.write('\n🔍 Verificando reglas...')
+        problemas = 0
+
+        salas_traslapadas = traslapes(salas)
+        if salas_traslapadas:
+            for nombre, cantidad in salas_traslapadas.items():
+                self.stdout.write(self.style.ERROR(f'   ❌ {nombre}: {cantidad} reservas activas traslapadas'))
+            problemas += sum(salas_traslapadas.values())
+        else:
+            self.stdout.write('   ✓ Ninguna sala tiene reservas activas traslapadas')
+
+        repetidos = ruts_repetidos(salas)
+        if repetidos:
+            for rut, cantidad in repetidos.items():
+                self.stdout.write(self.style.ERROR(f'   ❌ RUT {rut}: {cantidad} reservas activas'))
+            problemas += len(repetidos)
+        else:
+            self.stdout.write('   ✓ Ningún RUT tiene más de una reserva activa')
+        return problemas
@@ -0,0 +1,235 @@
+import random
+import time as reloj
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.utils import timezone
+
+from salas.mantenimiento import fecha
+from salas.models import Sala, Reserva, DisponibilidadDiaria, EventoCambio, calcular_dv
+from salas.sedes import sede_de_opcion, usar_sede
+
+NOMBRES = [
+    'María', 'José', 'Ana', 'Juan', 'Camila', 'Diego', 'Valentina', 'Matías',
+    'Francisca', 'Benjamín', 'Catalina', 'Tomás', 'Javiera', 'Sebastián',
+    'Constanza', 'Felipe', 'Fernanda', 'Nicolás', 'Daniela', 'Carlos',
+]
+APELLIDOS = [
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva',
+    'Martínez', 'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes',
+    'Hernández', 'Torres', 'Araya', 'Flores', 'Espinoza', 'Valenzuela',
+]
+CAPACIDADES = [2, 4, 4, 6, 6, 8, 8, 12]
+
+# Horario de la biblioteca: las reservas generadas caen dentro de este rango
+HORA_APERTURA = 8
+HORA_CIERRE = 22
+DURACION = timedelta(hours=2)
+VENTANAS_POR_DIA = 6
+MINUTOS_VENTANA = (HORA_CIERRE - HORA_APERTURA) * 60 // VENTANAS_POR_DIA
+HOLGURA = MINUTOS_VENTANA - DURACION.seconds // 60
+
+
+def mezcla_estados(valor):
+    """
+    Convierte 'activa=5,finalizada=80,cancelada=15' en un diccionario de pesos
+    """
+    pesos = {}
+    try:
+        for parte in valor.split(','):
+            estado, peso = parte.split('=')
+            pesos[estado.strip()] = float(peso)
+    except ValueError:
+        raise CommandError(f'Mezcla de estados inválida "{valor}". Ej: activa=5,finalizada=80,cancelada=15')
+
+    validos = {codigo for codigo, _ in Reserva.ESTADO_CHOICES}
+    if not set(pesos) <= validos or not sum(pesos.values()) > 0:
+        raise CommandError(f'Los estados deben ser {", ".join(sorted(validos))} con pesos positivos.')
+    return pesos
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos de salas y reservas para pruebas de capacidad. '
+        'Con la misma semilla y fecha de referencia genera siempre los mismos datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salas', type=int, default=20, help='Cantidad de salas (por defecto 20)')
+        parser.add_argument('--reservas', type=int, default=10000, help='Cantidad de reservas (por defecto 10000)')
+        parser.add_argument('--dias', type=int, default=180, help='Días de historial hacia atrás (por defecto 180)')
+        parser.add_argument('--dias-futuros', type=int, default=7, help='Días de reservas futuras (por defecto 7)')
+        parser.add_argument('--ruts', type=int, default=2000, help='Cantidad de RUT distintos (por defecto 2000)')
+        parser.add_argument(
+            '--estados', type=mezcla_estados, default='activa=90,finalizada=85,cancelada=10',
+            help=(
+                'Pesos de cada estado. Las reservas pasadas se reparten entre finalizada y '
+                'cancelada; las vigentes y futuras entre activa y cancelada '
+                '(por defecto activa=90,finalizada=85,cancelada=10)'
+            ),
+        )
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla del generador (por defecto 42)')
+        parser.add_argument(
+            '--fecha-referencia', type=fecha,
+            help='Fecha que se considera "hoy" (AAAA-MM-DD). Por defecto la fecha actual.',
+        )
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por bulk_create (por defecto 5000)')
+        parser.add_argument('--prefijo', default='Sala', help='Prefijo del nombre de las salas (por defecto "Sala")')
+        parser.add_argument('--sede', help='Código de la sede de las salas (por defecto la sede principal)')
+
+    def handle(self, *args, **options):
+        self.sede = sede_de_opcion(options['sede'], principal=True)
+
+        # Las salas y reservas se guardan en la base de datos de la sede
+        with usar_sede(self.sede):
+            self.generar(options)
+
+    def generar(self, options):
+        self.rng = random.Random(options['semilla'])
+        self.pesos = options['estados']
+
+        if options['salas'] < 1 or options['ruts'] < 1:
+            raise CommandError('Se necesita al menos una sala y un RUT.')
+
+        referencia = options['fecha_referencia'] or timezone.localdate()
+        self.ahora = timezone.make_aware(datetime.combine(referencia, time(HORA_APERTURA)))
+        self.primer_dia = referencia - timedelta(days=options['dias'])
+        self.dias = options['dias'] + options['dias_futuros']
+
+        cupos = self.dias * VENTANAS_POR_DIA * options['salas']
+        if options['reservas'] > cupos:
+            raise CommandError(
+                f'{options["reservas"]} reservas no caben en {options["salas"]} salas y {self.dias} días '
+                f'(máximo {cupos}). Aumente --salas o --dias.'
+            )
+
+        inicio_proceso = reloj.perf_counter()
+        self.stdout.write(f'📦 Generando datos sintéticos en {self.sede.nombre}...')
+
+        salas = self.crear_salas(options['salas'], options['prefijo'])
+        self.stdout.write(f'✓ {len(salas)} salas creadas')
+
+        self.generar_poblacion(options['ruts'])
+
+        total = 0
+        reservas = self.generar_reservas(salas, options['reservas'])
+        while True:
+            lote = list(islice(reservas, options['lote']))
+            if not lote:
+                break
+            alias = router.db_for_write(Reserva)
+            with transaction.atomic(using=alias):
+                Reserva.objects.using(alias).bulk_create(lote, batch_size=options['lote'])
+                # bulk_create no pasa por save(): los eventos se registran aquí
+                EventoCambio.objects.db_manager(alias).registrar(
+                    'reserva', 'creada', [reserva.fila_evento() for reserva in lote]
+                )
+            total += len(lote)
+            self.stdout.write(f'   … {total} reservas insertadas')
+
+        # bulk_create no pasa por Reserva.save(): los mapas y la ocupación
+        # guardada de las salas se calculan al final
+        DisponibilidadDiaria.objects.reconstruir_salas([sala.pk for sala in salas])
+        Sala.objects.actualizar_ocupacion([sala.pk for sala in salas])
+        self.stdout.write('✓ Mapas de disponibilidad y ocupación de las salas calculados')
+
+        segundos = reloj.perf_counter() - inicio_proceso
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total} reservas generadas en {segundos:.1f} s '
+            f'({total / max(segundos, 1e-9) * 60:,.0f} filas por minuto)'
+        ))
+
+    def crear_salas(self, cantidad, prefijo):
+        nombres = [f'{prefijo} {i:03d}' for i in range(1, cantidad + 1)]
+        if Sala.objects.filter(sede=self.sede, nombre__in=nombres).exists():
+            raise CommandError(
+                f'Ya existen salas con el prefijo "{prefijo}". '
+                'Use otro --prefijo o limpie la base con manage.py limpiar_datos.'
+            )
+
+        salas = [
+            Sala(
+                sede=self.sede,
+                nombre=nombre,
+                capacidad=self.rng.choice(CAPACIDADES),
+                descripcion='Sala generada para pruebas de capacidad.',
+                habilitada=True,
+            )
+            for nombre in nombres
+        ]
+        alias = router.db_for_write(Sala)
+        with transaction.atomic(using=alias):
+            Sala.objects.using(alias).bulk_create(salas)
+            # Recuperar los ids (no todos los motores los devuelven en bulk_create)
+            salas = list(Sala.objects.using(alias).filter(sede=self.sede, nombre__in=nombres).order_by('nombre'))
+            EventoCambio.objects.db_manager(alias).registrar('sala', 'creada', [sala.fila_evento() for sala in salas])
+        return salas
+
+    def generar_poblacion(self, cantidad):
+        """
+        Genera RUT válidos (con dígito verificador correcto) y un nombre para cada uno
+        """
+        cuerpos = self.rng.sample(range(5_000_000, 26_000_000), cantidad)
+        self.ruts = [f'{cuerpo}-{calcular_dv(cuerpo)}' for cuerpo in cuerpos]
+        self.nombres = {
+            rut: f'{self.rng.choice(NOMBRES)} {self.rng.choice(APELLIDOS)} {self.rng.choice(APELLIDOS)}'
+            for rut in self.ruts
+        }
+
+        # RUT disponibles para reservas activas: cada RUT tiene como máximo una
+        self.ruts_sin_activa = self.ruts[:]
+        self.rng.shuffle(self.ruts_sin_activa)
+
+    def elegir_estado(self, fin):
+        if fin < self.ahora:
+            opciones = ['finalizada', 'cancelada']
+        else:
+            opciones = ['activa', 'cancelada']
+        pesos = [self.pesos.get(estado, 0) for estado in opciones]
+        if not sum(pesos):
+            pesos = [1, 0]
+        return self.rng.choices(opciones, weights=pesos)[0]
+
+    def horarios(self, cantidad):
+        """
+        Genera 'cantidad' horarios sin traslape para una sala, repartidos
+        uniformemente en el período. Cada día se divide en ventanas de
+        MINUTOS_VENTANA y cada reserva ocupa una ventana distinta, con un
+        desplazamiento al azar dentro de ella.
+        """
+        ventanas = self.rng.sample(range(self.dias * VENTANAS_POR_DIA), cantidad)
+        for ventana in sorted(ventanas):
+            dia, posicion = divmod(ventana, VENTANAS_POR_DIA)
+            apertura = datetime.combine(self.primer_dia + timedelta(days=dia), time(HORA_APERTURA))
+            desplazamiento = self.rng.randrange(0, HOLGURA + 1, 10)
+            yield timezone.make_aware(
+                apertura + timedelta(minutes=posicion * MINUTOS_VENTANA + desplazamiento)
+            )
+
+    def generar_reservas(self, salas, cantidad):
+        por_sala, resto = divmod(cantidad, len(salas))
+        for i, sala in enumerate(salas):
+            for inicio in self.horarios(por_sala + (1 if i < resto else 0)):
+                fin = inicio + DURACION
+                estado = self.elegir_estado(fin)
+
+                if estado == 'activa':
+                    if self.ruts_sin_activa:
+                        rut = self.ruts_sin_activa.pop()
+                    else:
+                        # No quedan RUT sin reserva activa: se respeta la regla de una por RUT
+                        estado = 'cancelada'
+                        rut = self.rng.choice(self.ruts)
+                else:
+                    rut = self.rng.choice(self.ruts)
+
+                yield Reserva(
+                    sala=sala,
+                    rut=rut,
+                    nombre_reservante=self.nombres[rut],
+                    fecha_hora_inicio=inicio,
+                    fecha_hora_fin=fin,
+                    estado=estado,
+                )
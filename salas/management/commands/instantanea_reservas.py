@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from salas.instantaneas import actualizar
+from salas.sedes import sede_de_opcion, usar_sede
+
+
+class Command(BaseCommand):
+    help = (
+        'Escribe las reservas en archivos NDJSON comprimidos por mes (más un '
+        'indice.json) para hacer analítica sin consultar la base de datos '
+        'principal. Solo se reescriben los meses que cambiaron desde la '
+        'ejecución anterior.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('destino', help='Directorio de la instantánea')
+        parser.add_argument('--completo', action='store_true', help='Reescribir todos los meses')
+        parser.add_argument('--sede', help='Código de la sede (por defecto todas las de la base de datos "default")')
+
+    def handle(self, *args, **options):
+        sede = sede_de_opcion(options['sede'])
+
+        inicio = time.perf_counter()
+        with usar_sede(sede):
+            meses, indice = actualizar(options['destino'], sede, options['completo'])
+        segundos = time.perf_counter() - inicio
+
+        for mes in meses:
+            datos = indice['meses'].get(mes)
+            if datos:
+                self.stdout.write(f'📦 {datos["archivo"]}: {datos["filas"]} reservas ({datos["bytes"] / 1024:.1f} KB)')
+            else:
+                self.stdout.write(f'🗑️  {mes}: sin reservas, archivo eliminado')
+
+        total = sum(datos['filas'] for datos in indice['meses'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Instantánea actualizada en {segundos:.1f} s: {len(meses)} de {len(indice["meses"])} meses '
+            f'reescritos, {total} reservas en total.'
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from salas.models import Reserva, Sala
+from salas.sedes import sede_de_opcion, usar_sede
+
+
+class Command(BaseCommand):
+    help = (
+        'Devuelve los puestos de las reservas ya terminadas en salas por puestos, '
+        'para que la disponibilidad mostrada esté al día (al reservar se liberan '
+        'igual cuando la sala está llena). Con --recalcular además repara los '
+        'contadores contando las reservas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sede', help='Código de la sede (por defecto la base de datos "default")')
+        parser.add_argument(
+            '--recalcular', action='store_true', help='Recalcula los contadores de puestos ocupados'
+        )
+
+    def handle(self, *args, **options):
+        sede = sede_de_opcion(options['sede'])
+
+        with usar_sede(sede):
+            liberados = Reserva.objects.liberar_puestos()
+            self.stdout.write(self.style.SUCCESS(f'✓ {liberados} puestos liberados de reservas terminadas'))
+
+            if options['recalcular']:
+                corregidas = Sala.objects.recalcular_puestos()
+                for sala_id, (antes, despues) in corregidas.items():
+                    self.stdout.write(self.style.WARNING(f'   ⚠️  Sala {sala_id}: {antes} → {despues} puestos ocupados'))
+                self.stdout.write(self.style.SUCCESS(f'✓ {len(corregidas)} contadores corregidos'))
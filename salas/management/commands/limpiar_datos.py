@@ -0,0 +1,173 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from salas.mantenimiento import borrar_en_lotes, fecha, publicar_eliminacion
+from salas.models import Sala, Reserva, DisponibilidadDiaria
+from salas.sedes import bases_de_datos, sede_de_opcion
+
+
+class Command(BaseCommand):
+    help = (
+        'Limpia la base de datos de salas y reservas. Sin filtros borra todo, '
+        'en las bases de datos de todas las sedes (y los usuarios que no son '
+        'superusuarios); con --sede solo los datos de esa sede, y con '
+        '--desde/--hasta/--sala solo las reservas indicadas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=fecha, help='Solo reservas que inician desde esta fecha (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=fecha, help='Solo reservas que inician hasta esta fecha, inclusive (AAAA-MM-DD)')
+        parser.add_argument(
+            '--sala', action='append', default=[],
+            help='Solo reservas de esta sala (id o nombre). Se puede repetir.',
+        )
+        parser.add_argument('--sede', help='Solo los datos de esta sede (por defecto los de todas las sedes)')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas borradas por lote (por defecto 5000)')
+        parser.add_argument(
+            '--rapido', action='store_true',
+            help=(
+                'Limpieza total con TRUNCATE ... RESTART IDENTITY CASCADE (solo PostgreSQL). '
+                'No publica eventos: los consumidores del outbox deben recargar todo'
+            ),
+        )
+        parser.add_argument('--conservar-usuarios', action='store_true', help='No borrar los usuarios normales')
+        parser.add_argument('--dry-run', action='store_true', help='Solo mostrar cuántas filas se borrarían')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive', help='No pedir confirmación')
+
+    def handle(self, *args, **options):
+        sede = sede_de_opcion(options['sede'])
+        acotado = bool(options['desde'] or options['hasta'] or options['sala'])
+        if options['rapido'] and (acotado or sede):
+            raise CommandError('--rapido solo se puede usar para limpiar todas las bases de datos.')
+        # Los usuarios no son de una sede: solo se borran en la limpieza total
+        borrar_usuarios = not (acotado or sede or options['conservar_usuarios'])
+
+        # Con --sede, sus datos en su base; sin --sede, todo en cada base de
+        # datos de sedes. Cada base: (alias, reservas, salas)
+        bases = []
+        salas_pedidas = set()
+        for alias in [sede.base_datos] if sede else bases_de_datos():
+            salas = Sala.todas.using(alias).all()
+            reservas = Reserva.objects.using(alias).all()
+            if sede:
+                salas = salas.filter(sede=sede)
+                reservas = reservas.filter(sala__sede=sede)
+            if options['desde']:
+                inicio = timezone.make_aware(datetime.combine(options['desde'], time.min))
+                reservas = reservas.filter(fecha_hora_inicio__gte=inicio)
+            if options['hasta']:
+                fin = timezone.make_aware(datetime.combine(options['hasta'] + timedelta(days=1), time.min))
+                reservas = reservas.filter(fecha_hora_inicio__lt=fin)
+            if options['sala']:
+                ids, encontradas = self.ids_salas(salas, options['sala'])
+                reservas = reservas.filter(sala_id__in=ids)
+                salas_pedidas |= encontradas
+            bases.append((alias, reservas, salas))
+
+        faltantes = [valor for valor in options['sala'] if valor not in salas_pedidas]
+        if faltantes:
+            raise CommandError(f'No existe la sala "{faltantes[0]}".')
+
+        # Resumen de lo que se va a borrar
+        self.stdout.write('🗑️  Limpieza de base de datos')
+        self.stdout.write(f'   • {sum(reservas.count() for _, reservas, _ in bases)} reservas')
+        if not acotado:
+            self.stdout.write(f'   • {sum(salas.count() for _, _, salas in bases)} salas')
+        if borrar_usuarios:
+            self.stdout.write(f'   • {User.objects.filter(is_superuser=False).count()} usuarios normales')
+
+        if options['dry_run']:
+            self.stdout.write('Modo --dry-run: no se borró nada.')
+            return
+
+        if options['interactive']:
+            respuesta = input('¿Confirma la limpieza? Esta acción no se puede deshacer (s/n): ')
+            if respuesta.lower() != 's':
+                self.stdout.write('❌ Operación cancelada')
+                return
+
+        for alias, reservas, salas in bases:
+            if len(bases) > 1:
+                self.stdout.write(f'🗄️  Base de datos "{alias}"')
+            vendor = connections[alias].vendor
+            if acotado:
+                self.eliminar_reservas(reservas, options['lote'])
+            elif options['rapido'] and vendor == 'postgresql':
+                self.truncar(alias)
+            else:
+                if options['rapido']:
+                    self.stdout.write(f'TRUNCATE no está disponible en {vendor}; se borra en lotes.')
+                self.borrar_reservas(reservas, options['lote'])
+                self.borrar_salas(salas, options['lote'])
+
+        if not acotado:
+            # Sin reservas no queda historial válido en cache
+            cache.clear()
+        if borrar_usuarios:
+            cantidad, _ = User.objects.filter(is_superuser=False).delete()
+            self.stdout.write(f'✓ Eliminados {cantidad} usuarios normales (y sus datos asociados)')
+
+        self.stdout.write(self.style.SUCCESS('✅ Base de datos limpiada correctamente!'))
+
+    def ids_salas(self, salas, valores):
+        """
+        Convierte los valores de --sala (id o nombre) en ids de las 'salas'
+        de una base de datos. Retorna (ids, valores encontrados).
+        """
+        ids = []
+        encontradas = set()
+        for valor in valores:
+            coincidentes = salas.filter(pk=valor) if valor.isdigit() else salas.filter(nombre=valor)
+            pks = list(coincidentes.values_list('pk', flat=True))
+            if pks:
+                encontradas.add(valor)
+            ids.extend(pks)
+        return ids, encontradas
+
+    def eliminar_reservas(self, reservas, tamano_lote):
+        """
+        Borrado acotado: cada lote pasa por ReservaQuerySet.eliminar(), que
+        devuelve los puestos, reconstruye los mapas de disponibilidad y la
+        ocupación de las salas, invalida la cache y registra los eventos
+        'eliminada' en el outbox (las salas siguen existiendo)
+        """
+        ids_pendientes = reservas.order_by().values_list('pk', flat=True)
+        total = 0
+        while True:
+            ids = list(ids_pendientes[:tamano_lote])
+            if not ids:
+                break
+            total += Reserva.objects.using(reservas.db).filter(pk__in=ids).eliminar()
+            self.stdout.write(f'   … {total} reservas borradas')
+        self.stdout.write(f'✓ Eliminadas {total} reservas')
+
+    def borrar_reservas(self, reservas, tamano_lote):
+        total = 0
+        for borradas in borrar_en_lotes(reservas, tamano_lote, publicar_eliminacion):
+            total += borradas
+            self.stdout.write(f'   … {total} reservas borradas')
+        self.stdout.write(f'✓ Eliminadas {total} reservas')
+
+    def borrar_salas(self, salas, tamano_lote):
+        # Los mapas de disponibilidad apuntan a las salas: se borran primero
+        for _ in borrar_en_lotes(DisponibilidadDiaria.objects.using(salas.db).filter(sala__in=salas), tamano_lote):
+            pass
+
+        total = 0
+        for borradas in borrar_en_lotes(salas, tamano_lote, publicar_eliminacion):
+            total += borradas
+        self.stdout.write(f'✓ Eliminadas {total} salas')
+
+    def truncar(self, alias):
+        conexion = connections[alias]
+        modelos = (DisponibilidadDiaria, Reserva, Sala)
+        tablas = ', '.join(conexion.ops.quote_name(modelo._meta.db_table) for modelo in modelos)
+        with transaction.atomic(using=alias):
+            with conexion.cursor() as cursor:
+                cursor.execute(f'TRUNCATE {tablas} RESTART IDENTITY CASCADE')
+        self.stdout.write('✓ Tablas de salas y reservas truncadas')
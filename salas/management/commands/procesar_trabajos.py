@@ -0,0 +1,85 @@
+import os
+import socket
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from salas.models import Trabajo
+from salas.trabajos import ejecutar
+
+
+class Command(BaseCommand):
+    help = (
+        'Procesa la cola de trabajos en segundo plano (acciones masivas, mapa de '
+        'ocupación, comandos de mantención encolados desde el panel). Pensado '
+        'para correr con --seguir como proceso aparte; se pueden levantar varios '
+        'en paralelo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=4, help='Trabajos en paralelo (por defecto 4)')
+        parser.add_argument('--seguir', action='store_true', help='Esperar nuevos trabajos hasta interrumpir el proceso')
+        parser.add_argument('--intervalo', type=float, default=2, help='Segundos entre revisiones de la cola sin trabajos')
+        parser.add_argument('--nombre', help='Nombre del trabajador (por defecto host-pid)')
+
+    def handle(self, *args, **options):
+        hilos = options['hilos']
+        if hilos < 1:
+            raise CommandError('--hilos debe ser mayor que cero.')
+        trabajador = options['nombre'] or f'{socket.gethostname()}-{os.getpid()}'
+        self.resultados = Counter()
+
+        self.stdout.write(f'👷 Trabajador {trabajador} con {hilos} hilo(s)...')
+        # Con un solo hilo los trabajos corren en el hilo principal (útil para depurar)
+        pool = ThreadPoolExecutor(max_workers=hilos) if hilos > 1 else None
+        en_curso = set()
+        try:
+            while True:
+                vencidos = Trabajo.objects.vencer()
+                if vencidos:
+                    self.stdout.write(self.style.WARNING(f'⚠️  {vencidos} trabajo(s) superaron su tiempo límite'))
+
+                en_curso = {futuro for futuro in en_curso if not futuro.done()}
+                libres = hilos - len(en_curso)
+                trabajos = Trabajo.objects.reclamar(trabajador, libres) if libres else []
+                for trabajo in trabajos:
+                    self.stdout.write(
+                        f'▶️  #{trabajo.pk} {trabajo.tarea} (intento {trabajo.intentos} de {trabajo.max_intentos})'
+                    )
+                    if pool:
+                        en_curso.add(pool.submit(self.ejecutar_en_hilo, trabajo))
+                    else:
+                        self.ejecutar(trabajo)
+
+                if trabajos:
+                    continue
+                if not en_curso and not options['seguir']:
+                    break
+                if en_curso:
+                    wait(en_curso, timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('⏹️  Deteniendo: se esperan los trabajos en curso...')
+        finally:
+            if pool:
+                pool.shutdown(wait=True)
+
+        resumen = ', '.join(f'{cantidad} {estado}' for estado, cantidad in self.resultados.items())
+        self.stdout.write(self.style.SUCCESS(f'✅ Cola procesada ({resumen or "sin trabajos"}).'))
+
+    def ejecutar(self, trabajo):
+        estado = ejecutar(trabajo)
+        self.resultados[estado] += 1
+        estilo = self.style.SUCCESS if estado == 'completado' else self.style.WARNING
+        self.stdout.write(estilo(f'   #{trabajo.pk} {trabajo.tarea}: {trabajo.get_estado_display().lower()}'))
+
+    def ejecutar_en_hilo(self, trabajo):
+        try:
+            self.ejecutar(trabajo)
+        finally:
+            # Cada hilo abre sus propias conexiones
+            connections.close_all()
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from salas.cache import invalidar_reservas
+from salas.mantenimiento import archivar_ndjson, borrar_en_lotes, publicar_eliminacion
+from salas.models import Sala, Reserva
+from salas.sedes import sede_de_opcion, usar_sede
+
+# Campos de la reserva que se guardan al archivar
+CAMPOS_ARCHIVO = [
+    'id', 'sala_id', 'sala__nombre', 'rut', 'nombre_reservante',
+    'fecha_hora_inicio', 'fecha_hora_fin', 'fecha_creacion', 'estado',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra definitivamente las salas eliminadas (soft-delete) y su historial '
+        'de reservas, en lotes pequeños para no bloquear la base de datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Reservas borradas por lote (por defecto 1000)')
+        parser.add_argument('--pausa', type=float, default=0, help='Segundos de espera entre lotes')
+        parser.add_argument(
+            '--archivo',
+            help='Archivo .ndjson.gz donde archivar las reservas antes de borrarlas',
+        )
+        parser.add_argument('--sede', help='Solo las salas de esta sede (por defecto las de la base de datos "default")')
+
+    def handle(self, *args, **options):
+        sede = sede_de_opcion(options['sede'])
+        with usar_sede(sede):
+            self.purgar(sede, options)
+
+    def purgar(self, sede, options):
+        salas = Sala.todas.filter(eliminada=True)
+        if sede:
+            salas = salas.filter(sede=sede)
+        if not salas.exists():
+            self.stdout.write('No hay salas eliminadas pendientes.')
+            return
+
+        archivar = archivar_ndjson(options['archivo'], CAMPOS_ARCHIVO) if options['archivo'] else None
+
+        def antes_de_borrar(lote):
+            if archivar:
+                archivar(lote)
+            invalidar_reservas(lote.values_list('rut', 'sala_id').distinct())
+            publicar_eliminacion(lote)
+
+        for sala in salas:
+            self.stdout.write(f'🗑️  Purgando sala "{sala.nombre}"...')
+            reservas = Reserva.objects.filter(sala_id=sala.pk)
+
+            total = 0
+            for borradas in borrar_en_lotes(reservas, options['lote'], antes_de_borrar):
+                total += borradas
+                self.stdout.write(f'   ✓ {total} reservas borradas')
+                if options['pausa']:
+                    time.sleep(options['pausa'])
+
+            # Sin reservas asociadas, el borrado de la sala es inmediato
+            sala.delete()
+            self.stdout.write(self.style.SUCCESS(f'✓ Sala "{sala.nombre}" purgada ({total} reservas)'))
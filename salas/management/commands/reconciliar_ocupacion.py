@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from salas.models import Sala
+from salas.sedes import sede_de_opcion, usar_sede
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la ocupación guardada en cada sala (reserva actual y su horario) '
+        'con las reservas y corrige las diferencias, ej. después de cambiar '
+        'reservas con UPDATE directos o de importarlas con bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sede', help='Código de la sede (por defecto la base de datos "default")')
+
+    def handle(self, *args, **options):
+        sede = sede_de_opcion(options['sede'])
+
+        self.stdout.write('🔍 Reconciliando la ocupación de las salas con las reservas...')
+        with usar_sede(sede):
+            corregidas = Sala.objects.reconciliar_ocupacion()
+
+        for sala_id, (antes, despues) in corregidas.items():
+            self.stdout.write(self.style.WARNING(
+                f'   ⚠️  Sala {sala_id}: reserva {antes or "ninguna"} → {despues or "ninguna"}'
+            ))
+        if corregidas:
+            self.stdout.write(self.style.SUCCESS(f'✅ {len(corregidas)} salas corregidas.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ La ocupación de las salas coincide con las reservas.'))
@@ -0,0 +1,56 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from salas.eventos import LOTE_MAXIMO, leer_eventos, serializar
+from salas.sedes import sede_de_opcion, usar_sede
+
+
+class Command(BaseCommand):
+    help = (
+        'Escribe en la salida estándar (una línea JSON por evento) los cambios '
+        'de salas y reservas posteriores a un cursor, leídos del outbox en lotes '
+        'por id creciente. Con --seguir queda esperando eventos nuevos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=int, default=0, help='Leer eventos con id mayor a este (por defecto 0)')
+        parser.add_argument(
+            '--cursor',
+            help='Archivo donde se guarda el último id procesado; si existe, reemplaza a --desde',
+        )
+        parser.add_argument('--lote', type=int, default=500, help=f'Eventos por lectura (máximo {LOTE_MAXIMO})')
+        parser.add_argument('--seguir', action='store_true', help='No terminar: seguir leyendo eventos nuevos')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre lecturas con --seguir')
+        parser.add_argument('--sede', help='Código de la sede (por defecto todas las de la base de datos)')
+
+    def handle(self, *args, **options):
+        sede = sede_de_opcion(options['sede'])
+
+        archivo_cursor = Path(options['cursor']) if options['cursor'] else None
+        cursor = options['desde']
+        if archivo_cursor and archivo_cursor.exists():
+            cursor = int(archivo_cursor.read_text().strip() or 0)
+
+        # Los mensajes van a stderr: stdout queda solo con eventos (NDJSON)
+        self.stderr.write(f'📡 Leyendo eventos desde el id {cursor}...')
+        with usar_sede(sede):
+            while True:
+                eventos, hay_mas = leer_eventos(cursor, options['lote'], sede)
+                for evento in eventos:
+                    self.stdout.write(json.dumps(serializar(evento), ensure_ascii=False))
+                if eventos:
+                    cursor = eventos[-1].pk
+                    self.stdout.flush()
+                    if archivo_cursor:
+                        archivo_cursor.write_text(str(cursor))
+
+                if hay_mas:
+                    continue
+                if not options['seguir']:
+                    break
+                time.sleep(options['intervalo'])
+
+        self.stderr.write(f'✓ Último id procesado: {cursor}')
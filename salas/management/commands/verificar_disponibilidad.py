@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from salas.disponibilidad import unir
+from salas.mantenimiento import fecha
+from salas.models import DisponibilidadDiaria
+from salas.sedes import sede_de_opcion, usar_sede
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara los mapas de bits de disponibilidad con las reservas activas '
+        'y, con --reparar, corrige los días que no coinciden.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sala', type=int, action='append', help='Id de sala a verificar (se puede repetir)')
+        parser.add_argument('--desde', type=fecha, help='Verificar solo desde esta fecha (AAAA-MM-DD)')
+        parser.add_argument('--reparar', action='store_true', help='Reescribe los días con diferencias')
+        parser.add_argument('--sede', help='Código de la sede (por defecto la base de datos "default")')
+
+    def handle(self, *args, **options):
+        with usar_sede(sede_de_opcion(options['sede'])):
+            self.verificar(options)
+
+    def verificar(self, options):
+        salas_ids = options['sala']
+        desde = options['desde']
+
+        self.stdout.write('🔍 Verificando mapas de disponibilidad...')
+        esperados = DisponibilidadDiaria.objects.calcular(salas_ids, desde)
+
+        guardados = DisponibilidadDiaria.objects.all()
+        if salas_ids:
+            guardados = guardados.filter(sala_id__in=salas_ids)
+        if desde:
+            guardados = guardados.filter(fecha__gte=desde)
+
+        existentes = {}
+        faltantes = set()
+        sobrantes = set()
+        filas = guardados.values_list('pk', 'sala_id', 'fecha', 'manana', 'tarde')
+        for pk, sala_id, dia, manana, tarde in filas.iterator(chunk_size=10000):
+            existentes[(sala_id, dia)] = pk
+            guardado = unir(manana, tarde)
+            esperado = esperados.get((sala_id, dia), 0)
+            if esperado & ~guardado:
+                faltantes.add((sala_id, dia))
+            if guardado & ~esperado:
+                sobrantes.add((sala_id, dia))
+
+        # Días con reservas activas que no tienen fila
+        faltantes.update(dia for dia in esperados if dia not in existentes)
+
+        self.stdout.write(f'   • {len(esperados)} días con reservas activas, {len(existentes)} días guardados')
+        self.stdout.write(f'   • {len(faltantes)} días con casillas sin marcar (respuestas incorrectas)')
+        self.stdout.write(f'   • {len(sobrantes)} días con casillas marcadas de más (consultas extra)')
+
+        diferencias = faltantes | sobrantes
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('✅ Los mapas de disponibilidad coinciden con las reservas.'))
+            return
+
+        if not options['reparar']:
+            self.stdout.write(self.style.WARNING('⚠️  Hay diferencias. Ejecute con --reparar para corregirlas.'))
+            return
+
+        with transaction.atomic(using=DisponibilidadDiaria.objects.db):
+            DisponibilidadDiaria.objects.escribir(diferencias, esperados, existentes)
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(diferencias)} días reparados.'))
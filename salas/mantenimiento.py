@@ -0,0 +1,81 @@
+"""
+Utilidades de mantenimiento para operaciones masivas sobre la base de datos.
+"""
+import gzip
+import json
+from datetime import datetime
+
+from django.core.management.base import CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import CAMPOS_EVENTO_SALA, EventoCambio, Reserva
+
+
+def fecha(valor):
+    """
+    Convierte 'AAAA-MM-DD' en date (para argumentos de comandos como
+    --desde/--hasta o --fecha-referencia)
+    """
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida "{valor}". Formato esperado: AAAA-MM-DD')
+
+
+def borrar_en_lotes(queryset, tamano_lote=1000, antes_de_borrar=None):
+    """
+    Borra las filas del queryset en lotes de 'tamano_lote' con un DELETE
+    directo por lote (_raw_delete): no se cargan objetos en Python ni se
+    envían señales, y cada lote usa una transacción corta para no mantener
+    bloqueos largos. Genera la cantidad de filas borradas en cada lote.
+
+    'antes_de_borrar' (opcional) recibe el queryset del lote dentro de la
+    misma transacción, por ejemplo para archivarlo.
+    """
+    modelo = queryset.model
+    alias = queryset.db
+    ids_pendientes = queryset.order_by().values_list('pk', flat=True)
+
+    while True:
+        ids = list(ids_pendientes[:tamano_lote])
+        if not ids:
+            return
+
+        lote = modelo._base_manager.using(alias).filter(pk__in=ids)
+        with transaction.atomic(using=alias):
+            if antes_de_borrar:
+                antes_de_borrar(lote)
+            borradas = lote._raw_delete(alias)
+
+        yield borradas
+
+
+def archivar_ndjson(ruta, campos):
+    """
+    Retorna una función que agrega las filas de un queryset (solo 'campos')
+    al archivo NDJSON comprimido 'ruta'. Pensada para usarse como
+    'antes_de_borrar' en borrar_en_lotes.
+    """
+    def archivar(queryset):
+        with gzip.open(ruta, 'at', encoding='utf-8') as archivo:
+            for fila in queryset.values(*campos):
+                archivo.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+    return archivar
+
+
+def publicar_eliminacion(lote):
+    """
+    Registra en el outbox un evento 'eliminada' por cada sala o reserva del
+    lote. Pensada para usarse como 'antes_de_borrar' en borrar_en_lotes: el
+    DELETE directo no pasa por los modelos. Las filas se bloquean para que
+    los eventos correspondan exactamente a lo que se borra.
+    """
+    if lote.model is Reserva:
+        filas = Reserva.objects.using(lote.db).filter(pk__in=lote).select_for_update(of=('self',))._filas_evento()
+        EventoCambio.objects.db_manager(lote.db).registrar('reserva', 'eliminada', Reserva.filas_evento(filas))
+    else:
+        filas = lote.select_for_update().values('pk', 'sede_id', *CAMPOS_EVENTO_SALA)
+        EventoCambio.objects.db_manager(lote.db).registrar(
+            'sala', 'eliminada', [(fila.pop('pk'), fila.pop('sede_id'), fila) for fila in filas]
+        )
@@ -0,0 +1,87 @@
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404
+
+from .consultas_lentas import registrando_consultas
+from .perfilador import perfilar
+from .sedes import CLAVE_SESION, obtener_sede, usar_sede
+
+
+class SedeMiddleware:
+    """
+    Determina la sede de cada petición y dirige sus consultas a la base de
+    datos de esa sede (ver sedes.py). La sede se toma, en orden, de:
+
+    - el parámetro ?sede=<codigo> (así los enlaces de calendario .ics
+      funcionan sin sesión),
+    - la sede elegida en el menú (guardada en la sesión),
+    - la sede principal.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        codigo = request.GET.get('sede')
+        if codigo:
+            sede = obtener_sede(codigo)
+            if sede is None:
+                raise Http404('Sede no encontrada.')
+        else:
+            sede = obtener_sede(request.session.get(CLAVE_SESION)) or obtener_sede()
+
+        request.sede = sede
+        with usar_sede(sede):
+            return self.get_response(request)
+
+
+class ConsultasLentasMiddleware:
+    """
+    Registra las consultas que tardan más de CONSULTAS_LENTAS_MS, junto con
+    la vista que las originó (ver consultas_lentas.py). Sin el setting el
+    middleware se desactiva por completo.
+    """
+
+    def __init__(self, get_response):
+        if settings.CONSULTAS_LENTAS_MS is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        def vista():
+            match = getattr(request, 'resolver_match', None)
+            return match.view_name if match else request.path
+
+        with registrando_consultas(settings.CONSULTAS_LENTAS_MS, vista):
+            return self.get_response(request)
+
+
+class PerfiladorMiddleware:
+    """
+    Perfila con cProfile las peticiones de usuarios staff que traen el
+    encabezado X-Perfilar o el parámetro ?perfilar=1, y una de cada
+    PERFILAR_MUESTREO peticiones al azar (0 = sin muestreo). Ver perfilador.py.
+
+    Las demás peticiones solo pagan la revisión del encabezado y del
+    parámetro: request.user no se carga si no se pidió el perfil.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.debe_perfilar(request):
+            return self.get_response(request)
+
+        response, nombre = perfilar(self.get_response, request)
+        if nombre:
+            response['X-Perfil'] = nombre
+        return response
+
+    def debe_perfilar(self, request):
+        if 'X-Perfilar' in request.headers or request.GET.get('perfilar'):
+            return request.user.is_staff
+        muestreo = settings.PERFILAR_MUESTREO
+        return muestreo > 0 and random.randrange(muestreo) == 0
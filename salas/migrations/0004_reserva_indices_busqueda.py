@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:45
+
+from django.db import migrations, models
+
+
+def crear_indices_busqueda(apps, schema_editor):
+    """
+    Índices específicos de PostgreSQL para la búsqueda del personal.
+    En otros motores (SQLite en desarrollo) se crea solo un índice normal por fecha.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        # Django traduce icontains a UPPER("nombre_reservante"::text) LIKE UPPER(%s),
+        # por eso el índice trigram se define sobre esa misma expresión
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS reserva_nombre_trgm_idx ON salas_reserva '
+            'USING gin (UPPER(nombre_reservante::text) gin_trgm_ops)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS reserva_inicio_brin_idx ON salas_reserva '
+            'USING brin (fecha_hora_inicio)'
+        )
+    else:
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS reserva_inicio_idx ON salas_reserva (fecha_hora_inicio)'
+        )
+
+
+def eliminar_indices_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS reserva_nombre_trgm_idx')
+        schema_editor.execute('DROP INDEX IF EXISTS reserva_inicio_brin_idx')
+    else:
+        schema_editor.execute('DROP INDEX IF EXISTS reserva_inicio_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0003_alter_reserva_estado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['rut'], name='reserva_rut_patron_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(crear_indices_busqueda, eliminar_indices_busqueda),
+    ]
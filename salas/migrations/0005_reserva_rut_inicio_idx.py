@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0004_reserva_indices_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['rut', '-fecha_hora_inicio'], name='reserva_rut_inicio_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0005_reserva_rut_inicio_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sala',
+            name='eliminada',
+            field=models.BooleanField(default=False, verbose_name='Eliminada'),
+        ),
+        migrations.AlterField(
+            model_name='sala',
+            name='nombre',
+            field=models.CharField(max_length=100, verbose_name='Nombre de la Sala'),
+        ),
+        migrations.AddConstraint(
+            model_name='sala',
+            constraint=models.UniqueConstraint(condition=models.Q(('eliminada', False)), fields=('nombre',), name='sala_nombre_unico', violation_error_message='Ya existe una sala con este nombre.'),
+        ),
+    ]
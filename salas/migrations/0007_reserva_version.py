@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0006_sala_eliminada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Versión'),
+        ),
+    ]
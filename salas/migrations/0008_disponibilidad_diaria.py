@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0007_reserva_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisponibilidadDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('manana', models.BigIntegerField(default=0, verbose_name='Casillas de la mañana')),
+                ('tarde', models.BigIntegerField(default=0, verbose_name='Casillas de la tarde')),
+                ('sala', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disponibilidad', to='salas.sala', verbose_name='Sala')),
+            ],
+            options={
+                'verbose_name': 'Disponibilidad diaria',
+                'verbose_name_plural': 'Disponibilidad diaria',
+                'constraints': [models.UniqueConstraint(fields=('sala', 'fecha'), name='disponibilidad_sala_fecha_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def asignar_sede_principal(apps, schema_editor):
+    """
+    Las salas existentes quedan en la sede principal
+    """
+    Sede = apps.get_model('salas', 'Sede')
+    Sala = apps.get_model('salas', 'Sala')
+    alias = schema_editor.connection.alias
+
+    sede, _ = Sede.objects.using(alias).get_or_create(codigo='principal', defaults={'nombre': 'Sede Principal'})
+    Sala.objects.using(alias).filter(sede__isnull=True).update(sede=sede)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0008_disponibilidad_diaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sede',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True, verbose_name='Nombre de la Sede')),
+                ('codigo', models.SlugField(unique=True, verbose_name='Código')),
+                ('base_datos', models.CharField(default='default', help_text='Alias de settings.DATABASES donde se guardan las salas y reservas de la sede', max_length=50, verbose_name='Base de datos')),
+            ],
+            options={
+                'verbose_name': 'Sede',
+                'verbose_name_plural': 'Sedes',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='sala',
+            name='sede',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='salas', to='salas.sede', verbose_name='Sede'),
+        ),
+        migrations.RunPython(asignar_sede_principal, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='sala',
+            name='sede',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.PROTECT, related_name='salas', to='salas.sede', verbose_name='Sede'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='sala',
+            name='sala_nombre_unico',
+        ),
+        migrations.AddConstraint(
+            model_name='sala',
+            constraint=models.UniqueConstraint(condition=models.Q(('eliminada', False)), fields=('sede', 'nombre'), name='sala_nombre_unico', violation_error_message='Ya existe una sala con este nombre.'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:25
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0009_sede'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoCambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('modelo', models.CharField(choices=[('sala', 'Sala'), ('reserva', 'Reserva')], max_length=20, verbose_name='Modelo')),
+                ('objeto_id', models.BigIntegerField(verbose_name='Id del objeto')),
+                ('accion', models.CharField(choices=[('creada', 'Creada'), ('editada', 'Editada'), ('cancelada', 'Cancelada'), ('finalizada', 'Finalizada'), ('eliminada', 'Eliminada')], max_length=20, verbose_name='Acción')),
+                ('datos', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Datos')),
+                ('sede', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='salas.sede', verbose_name='Sede')),
+            ],
+            options={
+                'verbose_name': 'Evento de cambio',
+                'verbose_name_plural': 'Eventos de cambio',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['sede', 'id'], name='evento_sede_id_idx')],
+            },
+        ),
+    ]
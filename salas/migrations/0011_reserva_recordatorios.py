@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0010_evento_cambio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='email',
+            field=models.EmailField(blank=True, default='', max_length=254, verbose_name='Correo electrónico'),
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='recordatorio_fin_enviado',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Recordatorio de término enviado'),
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='recordatorio_inicio_enviado',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Recordatorio de inicio enviado'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('estado', 'activa'), ('recordatorio_inicio_enviado__isnull', True), models.Q(('email', ''), _negated=True)), fields=['fecha_hora_inicio'], name='reserva_recordatorio_ini_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('estado', 'activa'), ('recordatorio_fin_enviado__isnull', True), models.Q(('email', ''), _negated=True)), fields=['fecha_hora_fin'], name='reserva_recordatorio_fin_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0011_reserva_recordatorios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventocambio',
+            index=models.Index(fields=['modelo', 'objeto_id'], name='evento_objeto_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0012_evento_objeto_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='grupo',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='Grupo'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('grupo__isnull', False)), fields=['grupo'], name='reserva_grupo_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0013_reserva_grupo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='ocupa_puesto',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Ocupa puesto'),
+        ),
+        migrations.AddField(
+            model_name='sala',
+            name='por_puestos',
+            field=models.BooleanField(default=False, help_text='Cada reserva ocupa un puesto; la sala se puede reservar hasta completar su capacidad', verbose_name='Reserva por puestos'),
+        ),
+        migrations.AddField(
+            model_name='sala',
+            name='puestos_ocupados',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Puestos ocupados'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('ocupa_puesto', True)), fields=['sala', 'fecha_hora_fin'], name='reserva_puesto_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-19 06:00
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0014_sala_por_puestos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarea', models.CharField(max_length=100, verbose_name='Tarea')),
+                ('parametros', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Parámetros')),
+                ('usuario', models.CharField(blank=True, default='', max_length=150, verbose_name='Encolado por')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completado', 'Completado'), ('fallido', 'Fallido'), ('cancelado', 'Cancelado')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('max_intentos', models.PositiveSmallIntegerField(default=3, verbose_name='Máximo de intentos')),
+                ('limite_segundos', models.PositiveIntegerField(default=600, verbose_name='Tiempo límite (segundos)')),
+                ('progreso', models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')),
+                ('mensaje', models.CharField(blank=True, default='', max_length=200, verbose_name='Mensaje')),
+                ('resultado', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Resultado')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Último error')),
+                ('trabajador', models.CharField(blank=True, default='', max_length=100, verbose_name='Trabajador')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponible desde')),
+                ('iniciado', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado')),
+                ('vence', models.DateTimeField(blank=True, null=True, verbose_name='Vence')),
+                ('terminado', models.DateTimeField(blank=True, null=True, verbose_name='Terminado')),
+                ('sede', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos', to='salas.sede', verbose_name='Sede')),
+            ],
+            options={
+                'verbose_name': 'Trabajo',
+                'verbose_name_plural': 'Trabajos',
+                'ordering': ['-id'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'pendiente')), fields=['disponible_desde', 'id'], name='trabajo_pendiente_idx'), models.Index(condition=models.Q(('estado', 'en_curso')), fields=['vence'], name='trabajo_en_curso_idx')],
+            },
+        ),
+    ]
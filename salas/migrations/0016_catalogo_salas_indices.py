@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0015_trabajo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('estado', 'activa')), fields=['sala', 'fecha_hora_fin'], name='reserva_activa_sala_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sala',
+            index=models.Index(condition=models.Q(('eliminada', False)), fields=['habilitada', 'capacidad'], name='sala_habilitada_cap_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-19 06:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+
+def calcular_ocupacion(apps, schema_editor):
+    """
+    La ocupación guardada de cada sala: su reserva activa en curso o próxima
+    """
+    Sala = apps.get_model('salas', 'Sala')
+    Reserva = apps.get_model('salas', 'Reserva')
+    alias = schema_editor.connection.alias
+
+    siguiente = (
+        Reserva.objects.using(alias)
+        .filter(sala=OuterRef('pk'), estado='activa', fecha_hora_fin__gte=timezone.now())
+        .order_by('fecha_hora_inicio')
+    )
+    Sala.objects.using(alias).filter(por_puestos=False).update(
+        reserva_actual=Subquery(siguiente.values('pk')[:1]),
+        ocupada_desde=Subquery(siguiente.values('fecha_hora_inicio')[:1]),
+        ocupada_hasta=Subquery(siguiente.values('fecha_hora_fin')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0016_catalogo_salas_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sala',
+            name='ocupada_desde',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Ocupada desde'),
+        ),
+        migrations.AddField(
+            model_name='sala',
+            name='ocupada_hasta',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Ocupada hasta'),
+        ),
+        migrations.AddField(
+            model_name='sala',
+            name='reserva_actual',
+            field=models.ForeignKey(blank=True, db_constraint=False, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='salas.reserva', verbose_name='Reserva actual'),
+        ),
+        migrations.RunPython(calcular_ocupacion, migrations.RunPython.noop),
+    ]
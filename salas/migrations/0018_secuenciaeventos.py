@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 06:43
+
+from django.db import migrations, models
+
+
+def crear_secuencia(apps, schema_editor):
+    """
+    La fila que ordena las escrituras del outbox (ver SecuenciaEventos)
+    """
+    SecuenciaEventos = apps.get_model('salas', 'SecuenciaEventos')
+    SecuenciaEventos.objects.using(schema_editor.connection.alias).get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0017_sala_ocupacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaEventos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('escrituras', models.BigIntegerField(default=0, verbose_name='Escrituras')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de eventos',
+                'verbose_name_plural': 'Secuencias de eventos',
+            },
+        ),
+        migrations.RunPython(crear_secuencia, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salas', '0018_secuenciaeventos'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='SecuenciaEventos',
+        ),
+        migrations.RemoveIndex(
+            model_name='eventocambio',
+            name='evento_sede_id_idx',
+        ),
+        migrations.AddField(
+            model_name='eventocambio',
+            name='transaccion',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Transacción'),
+        ),
+        migrations.AddIndex(
+            model_name='eventocambio',
+            index=models.Index(fields=['transaccion', 'id'], name='evento_transaccion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventocambio',
+            index=models.Index(fields=['sede', 'transaccion', 'id'], name='evento_sede_transaccion_idx'),
+        ),
+    ]
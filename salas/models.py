@@ -1,7 +1,39 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import Exists, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from collections import Counter
 from datetime import timedelta
+import uuid
+from .cache import invalidar_reservas, invalidar_salas
+from .disponibilidad import acumular, dividir, inicio_dia, mascaras_por_dia, unir
+from .sedes import invalidar_sedes, obtener_sede, sede_actual
+
+def calcular_dv(cuerpo):
+    """
+    Calcula el dígito verificador de un RUT chileno (módulo 11)
+    a partir de su cuerpo numérico. Ej: '12345678' -> '5'
+    """
+    suma = 0
+    multiplicador = 2
+    
+    for digito in reversed(str(cuerpo)):
+        suma += int(digito) * multiplicador
+        multiplicador += 1
+        if multiplicador == 8:
+            multiplicador = 2
+    
+    resto = suma % 11
+    dv_calculado = 11 - resto
+    
+    if dv_calculado == 11:
+        return '0'
+    elif dv_calculado == 10:
+        return 'K'
+    return str(dv_calculado)
 
 def validar_rut(rut):
     """
@@ -19,24 +51,7 @@ def validar_rut(rut):
     if not cuerpo.isdigit():
         raise ValidationError('El RUT ingresado es inválido: el cuerpo debe contener solo números')
     
-    suma = 0
-    multiplicador = 2
-    
-    for digito in reversed(cuerpo):
-        suma += int(digito) * multiplicador
-        multiplicador += 1
-        if multiplicador == 8:
-            multiplicador = 2
-    
-    resto = suma % 11
-    dv_calculado = 11 - resto
-    
-    if dv_calculado == 11:
-        dv_calculado = '0'
-    elif dv_calculado == 10:
-        dv_calculado = 'K'
-    else:
-        dv_calculado = str(dv_calculado)
+    dv_calculado = calcular_dv(cuerpo)
     
     if dv != dv_calculado:
         raise ValidationError(f'El RUT ingresado es inválido: dígito verificador incorrecto. Esperado: {dv_calculado}')
@@ -44,41 +59,620 @@ def validar_rut(rut):
     return True
 
 
+def normalizar_rut(rut):
+    """
+    Lleva un RUT a su forma canónica (sin puntos ni espacios, en mayúsculas
+    y con guión antes del dígito verificador): 12.345.678-k -> 12345678-K
+    """
+    rut = rut.upper().replace(".", "").replace(" ", "")
+    
+    # Si no tiene guión, agregarlo antes del último dígito
+    if '-' not in rut and len(rut) > 1:
+        rut = rut[:-1] + '-' + rut[-1]
+    
+    return rut
+
+def bloquear_ruts(ruts, using):
+    """
+    Serializa hasta el fin de la transacción las reservas de estos RUT, para
+    confirmar sin carreras la regla de una reserva activa por RUT. En
+    PostgreSQL toma un advisory lock por RUT (siempre en el mismo orden, para
+    no caer en deadlock); SQLite ya serializa las transacciones que escriben.
+    """
+    conexion = connections[using]
+    if conexion.vendor != 'postgresql':
+        return
+    with conexion.cursor() as cursor:
+        for rut in sorted(set(ruts)):
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [rut])
+
+
+class Sede(models.Model):
+    """
+    Modelo para representar una sede (sucursal) de la biblioteca.
+    Sus salas y reservas se guardan en la base de datos 'base_datos'
+    (ver sedes.py); el catálogo de sedes está siempre en 'default'.
+    """
+    nombre = models.CharField(max_length=100, unique=True, verbose_name='Nombre de la Sede')
+    codigo = models.SlugField(max_length=50, unique=True, verbose_name='Código')
+    base_datos = models.CharField(
+        max_length=50,
+        default='default',
+        verbose_name='Base de datos',
+        help_text='Alias de settings.DATABASES donde se guardan las salas y reservas de la sede',
+    )
+    
+    class Meta:
+        verbose_name = 'Sede'
+        verbose_name_plural = 'Sedes'
+        ordering = ['nombre']
+    
+    def __str__(self):
+        return self.nombre
+    
+    def clean(self):
+        if self.base_datos not in settings.DATABASES:
+            raise ValidationError({'base_datos': f'No existe la base de datos "{self.base_datos}" en la configuración.'})
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidar_sedes()
+    
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        invalidar_sedes()
+        return resultado
+
+
+class SalaQuerySet(models.QuerySet):
+    """
+    Consultas de salas: por sede y con su disponibilidad actual
+    """
+    
+    def de_sede(self, sede):
+        return self.filter(sede=sede)
+    
+    def con_disponibilidad(self, momento=None):
+        """
+        Anota 'disponible' en cada sala dentro de la misma consulta, con la
+        misma comparación que esta_disponible() sobre la ocupación guardada
+        (ocupada_desde, ocupada_hasta), así un listado se filtra, ordena y
+        pagina por disponibilidad sin una consulta por sala. Solo en las
+        salas cuya reserva guardada ya terminó se consulta Reserva (con el
+        índice por sala y horario), porque la siguiente puede haber empezado.
+        'momento' (por defecto ahora) solo tiene sentido cerca de ahora: la
+        sala guarda una sola reserva, la en curso o la próxima.
+        """
+        momento = momento or timezone.now()
+        en_curso = Reserva.objects.filter(
+            sala=OuterRef('pk'), estado='activa', fecha_hora_inicio__lte=momento, fecha_hora_fin__gte=momento
+        )
+        libre = (
+            models.Q(ocupada_hasta__isnull=True) | models.Q(ocupada_desde__gt=momento)
+            | (models.Q(ocupada_hasta__lt=momento) & ~Exists(en_curso))
+        )
+        # Sala por puestos llena según el contador: igual se puede reservar
+        # si alguna reserva ya terminó (tomar_puesto libera su puesto)
+        puesto_vencido = Reserva.objects.filter(sala=OuterRef('pk'), ocupa_puesto=True, fecha_hora_fin__lt=momento)
+        return self.annotate(disponible=models.Case(
+            models.When(habilitada=False, then=models.Value(False)),
+            models.When(por_puestos=True, then=models.ExpressionWrapper(
+                models.Q(puestos_ocupados__lt=F('capacidad')) | Exists(puesto_vencido),
+                output_field=models.BooleanField(),
+            )),
+            default=models.ExpressionWrapper(libre, output_field=models.BooleanField()),
+            output_field=models.BooleanField(),
+        ))
+
+
+class SalaManager(models.Manager.from_queryset(SalaQuerySet)):
+    """
+    Manager por defecto: oculta las salas eliminadas (soft-delete)
+    """
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(eliminada=False)
+    
+    def tomar_puesto(self, sala_id):
+        """
+        Toma un puesto de una sala por puestos con un UPDATE condicional:
+        
+            UPDATE ... SET puestos_ocupados = puestos_ocupados + 1
+            WHERE id = ? AND habilitada AND puestos_ocupados < capacidad
+        
+        Dos reservas en paralelo no pueden tomar el último puesto a la vez y
+        no se cuentan las reservas de la sala. Si la sala está llena, antes
+        de rendirse se liberan los puestos de reservas que ya terminaron.
+        Retorna False si no quedan puestos.
+        """
+        sala = self.filter(pk=sala_id, habilitada=True, puestos_ocupados__lt=F('capacidad'))
+        if sala.update(puestos_ocupados=F('puestos_ocupados') + 1):
+            return True
+        if Reserva.objects.using(self.db).filter(sala_id=sala_id).liberar_puestos():
+            return bool(sala.update(puestos_ocupados=F('puestos_ocupados') + 1))
+        return False
+    
+    def devolver_puestos(self, puestos):
+        """
+        Devuelve puestos a sus salas. 'puestos' es {sala_id: cantidad}.
+        """
+        for sala_id, cantidad in puestos.items():
+            # También en salas eliminadas, para que el contador siga cuadrando
+            self.model.todas.db_manager(self.db).filter(pk=sala_id).update(
+                puestos_ocupados=Greatest(F('puestos_ocupados') - cantidad, 0)
+            )
+    
+    def recalcular_puestos(self):
+        """
+        Reparación: recalcula puestos_ocupados contando las reservas que
+        ocupan un puesto (las reservas nunca cuentan; usan el contador).
+        Retorna {sala_id: (antes, después)} de las salas corregidas.
+        """
+        salas = self.model.todas.db_manager(self.db)
+        with transaction.atomic(using=self.db):
+            # Bloquear las salas: nadie toma ni devuelve puestos mientras se cuenta
+            contadores = dict(
+                salas.select_for_update()
+                .filter(models.Q(por_puestos=True) | models.Q(puestos_ocupados__gt=0))
+                .values_list('pk', 'puestos_ocupados')
+            )
+            reales = Counter(
+                Reserva.objects.using(self.db).filter(sala_id__in=contadores, ocupa_puesto=True)
+                .values_list('sala_id', flat=True)
+            )
+            corregidas = {
+                sala_id: (antes, reales[sala_id])
+                for sala_id, antes in contadores.items() if antes != reales[sala_id]
+            }
+            for sala_id, (_, despues) in corregidas.items():
+                salas.filter(pk=sala_id).update(puestos_ocupados=despues)
+        return corregidas
+
+
+    def actualizar_ocupacion(self, salas_ids=(), reservas_ids=()):
+        """
+        Recalcula la ocupación guardada (reserva_actual, ocupada_desde,
+        ocupada_hasta) de las salas indicadas y de las que apuntan a alguna
+        de 'reservas_ids' (ej. una reserva que se cambió de sala), con un
+        solo UPDATE:
+        
+            UPDATE ... SET reserva_actual_id = (SELECT id FROM reserva
+                WHERE sala_id = sala.id AND estado = 'activa' AND fecha_hora_fin >= ahora
+                ORDER BY fecha_hora_inicio LIMIT 1), ...
+        
+        Se llama en la transacción de cada cambio de reservas. Las salas se
+        bloquean antes (por pk, como en reservar_grupo): así la subconsulta
+        ve las reservas que otra transacción acaba de confirmar en la misma
+        sala. Las salas por puestos usan su contador y no se tocan.
+        """
+        filtro = models.Q(pk__in=set(salas_ids))
+        if reservas_ids:
+            filtro |= models.Q(reserva_actual__in=set(reservas_ids))
+        salas = self.model.todas.db_manager(self.db)
+        # Sin savepoint: casi siempre corre dentro de la transacción del cambio
+        with transaction.atomic(using=self.db, savepoint=False):
+            ids = list(
+                salas.select_for_update().filter(filtro, por_puestos=False).order_by('pk').values_list('pk', flat=True)
+            )
+            if not ids:
+                return 0
+            siguiente = (
+                Reserva.objects.using(self.db)
+                .filter(sala=OuterRef('pk'), estado='activa', fecha_hora_fin__gte=timezone.now())
+                .order_by('fecha_hora_inicio')
+            )
+            return salas.filter(pk__in=ids).update(
+                reserva_actual=Subquery(siguiente.values('pk')[:1]),
+                ocupada_desde=Subquery(siguiente.values('fecha_hora_inicio')[:1]),
+                ocupada_hasta=Subquery(siguiente.values('fecha_hora_fin')[:1]),
+            )
+    
+    def reconciliar_ocupacion(self):
+        """
+        Reparación: compara la ocupación guardada de cada sala con las
+        reservas y corrige las que no coinciden (ej. reservas cambiadas con
+        UPDATE directos o importadas con bulk_create). Retorna
+        {sala_id: (reserva antes, reserva después)} de las salas corregidas.
+        """
+        salas = self.model.todas.db_manager(self.db)
+        with transaction.atomic(using=self.db):
+            # Bloquear las salas: nadie cambia su ocupación mientras se compara
+            guardadas = {
+                pk: (reserva_id, desde, hasta)
+                for pk, por_puestos, reserva_id, desde, hasta in salas.select_for_update().values_list(
+                    'pk', 'por_puestos', 'reserva_actual_id', 'ocupada_desde', 'ocupada_hasta'
+                )
+                if not por_puestos or reserva_id is not None
+            }
+            # La reserva en curso o próxima de cada sala (la primera por inicio)
+            esperadas = {}
+            reservas = (
+                Reserva.objects.using(self.db)
+                .filter(sala_id__in=guardadas, sala__por_puestos=False, estado='activa', fecha_hora_fin__gte=timezone.now())
+                .order_by('sala_id', 'fecha_hora_inicio')
+                .values_list('sala_id', 'pk', 'fecha_hora_inicio', 'fecha_hora_fin')
+            )
+            for sala_id, *ocupacion in reservas.iterator(chunk_size=2000):
+                esperadas.setdefault(sala_id, tuple(ocupacion))
+            
+            corregidas = {}
+            for sala_id, guardada in guardadas.items():
+                esperada = esperadas.get(sala_id, (None, None, None))
+                if guardada != esperada:
+                    corregidas[sala_id] = (guardada[0], esperada[0])
+                    salas.filter(pk=sala_id).update(
+                        reserva_actual=esperada[0], ocupada_desde=esperada[1], ocupada_hasta=esperada[2]
+                    )
+        return corregidas
+
+
 class Sala(models.Model):
     """
     Modelo para representar una sala de estudio
     """
-    nombre = models.CharField(max_length=100, unique=True, verbose_name='Nombre de la Sala')
+    # Sin restricción de clave foránea: la sede está en 'default' y la sala
+    # puede estar en la base de datos de su sede
+    sede = models.ForeignKey(
+        Sede, on_delete=models.PROTECT, related_name='salas', db_constraint=False, verbose_name='Sede'
+    )
+    nombre = models.CharField(max_length=100, verbose_name='Nombre de la Sala')
     capacidad = models.IntegerField(verbose_name='Capacidad')
     descripcion = models.TextField(blank=True, null=True, verbose_name='Descripción')
     habilitada = models.BooleanField(default=True, verbose_name='Habilitada')
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')
+    # Las salas eliminadas se ocultan de inmediato y se borran definitivamente
+    # (junto con sus reservas) en segundo plano con: manage.py purgar_salas
+    eliminada = models.BooleanField(default=False, verbose_name='Eliminada')
+    # Sala por puestos: cada reserva ocupa un puesto y la sala se puede seguir
+    # reservando hasta completar su capacidad (ej. salas de conferencias)
+    por_puestos = models.BooleanField(
+        default=False,
+        verbose_name='Reserva por puestos',
+        help_text='Cada reserva ocupa un puesto; la sala se puede reservar hasta completar su capacidad',
+    )
+    # Reservas que ocupan un puesto (ver Reserva.ocupa_puesto). Solo cambia
+    # con UPDATE atómicos (tomar_puesto, devolver_puestos), nunca con save().
+    puestos_ocupados = models.PositiveIntegerField(default=0, editable=False, verbose_name='Puestos ocupados')
+    # Ocupación guardada: la reserva activa en curso o la próxima (la que
+    # empieza antes entre las que no han terminado) y su horario. Se mantiene
+    # en la misma transacción que cada cambio de reservas (ver
+    # SalaManager.actualizar_ocupacion), así esta_disponible() no consulta
+    # Reserva. Sin restricción de clave foránea, como sede: un borrado
+    # masivo de reservas no tiene que revisar las salas. Las salas por
+    # puestos usan puestos_ocupados.
+    reserva_actual = models.ForeignKey(
+        'Reserva', on_delete=models.DO_NOTHING, null=True, blank=True, editable=False,
+        related_name='+', db_constraint=False, verbose_name='Reserva actual',
+    )
+    ocupada_desde = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Ocupada desde')
+    ocupada_hasta = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Ocupada hasta')
+    
+    objects = SalaManager()
+    todas = models.Manager()
     
     class Meta:
         verbose_name = 'Sala'
         verbose_name_plural = 'Salas'
         ordering = ['nombre']
+        constraints = [
+            # El nombre solo debe ser único entre las salas no eliminadas de la sede
+            models.UniqueConstraint(
+                fields=['sede', 'nombre'],
+                condition=models.Q(eliminada=False),
+                name='sala_nombre_unico',
+                violation_error_message='Ya existe una sala con este nombre.',
+            ),
+        ]
+        indexes = [
+            # Catálogo de salas (lista_salas, admin_salas): filtro y orden por
+            # capacidad entre las salas no eliminadas
+            models.Index(
+                fields=['habilitada', 'capacidad'], name='sala_habilitada_cap_idx', condition=models.Q(eliminada=False)
+            ),
+        ]
     
     def __str__(self):
         return f"{self.nombre} (Capacidad: {self.capacidad})"
     
+    @property
+    def puestos_libres(self):
+        return max(self.capacidad - self.puestos_ocupados, 0)
+    
+    def clean(self):
+        # Las reservas vigentes se tomaron con el modo anterior: cambiarlo
+        # ahora dejaría traslapes o puestos sin contar
+        if self.pk and self.reservas.vigentes().exists():
+            if Sala.todas.filter(pk=self.pk).exclude(por_puestos=self.por_puestos).exists():
+                raise ValidationError({'por_puestos': 'No se puede cambiar el modo de reserva mientras la sala tenga reservas vigentes.'})
+    
+    def save(self, *args, **kwargs):
+        # Sin sede explícita, la sala queda en la sede en curso
+        if self.sede_id is None:
+            self.sede = sede_actual() or obtener_sede()
+        
+        # Una copia leída antes pisaría los puestos tomados y la ocupación
+        # guardada entretanto
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in CAMPOS_MANTENIDOS_SALA
+            ]
+        
+        if self._state.adding:
+            accion = 'creada'
+        else:
+            # Una sala solo se guarda como eliminada desde eliminar()
+            accion = 'eliminada' if self.eliminada else 'editada'
+        
+        # El evento se registra en la misma transacción que el cambio
+        alias = router.db_for_write(Sala, instance=self)
+        with transaction.atomic(using=alias):
+            super().save(*args, **kwargs)
+            EventoCambio.objects.db_manager(alias).registrar('sala', accion, [self.fila_evento()])
+        
+        # El calendario cacheado muestra el nombre de la sala
+        invalidar_salas(self.pk)
+    
+    def fila_evento(self):
+        """
+        (objeto_id, sede_id, datos) publicados en el outbox (ver EventoCambio)
+        """
+        datos = {campo: getattr(self, campo) for campo in CAMPOS_EVENTO_SALA}
+        return self.pk, self.sede_id, datos
+    
+    def eliminar(self):
+        """
+        Elimina la sala de forma lógica: deja de mostrarse y de aceptar
+        reservas inmediatamente, y sus reservas vigentes se cancelan.
+        El historial se borra después, en lotes, con manage.py purgar_salas.
+        """
+        alias = router.db_for_write(Sala, instance=self)
+        with transaction.atomic(using=alias):
+            # Primero las reservas (cancelar() bloquea también la sala) y
+            # después la sala, para no tomar su fila en otro orden que las
+            # reservas concurrentes; el evento de la sala queda al final
+            self.reservas.cancelar()
+            self.eliminada = True
+            self.habilitada = False
+            self.save(update_fields=['eliminada', 'habilitada'])
+    
     def esta_disponible(self):
         """
         Verifica si la sala está disponible actualmente
-        (no tiene reservas activas y está habilitada)
+        (no tiene reservas activas y está habilitada; en una sala por
+        puestos, si le queda algún puesto libre). Compara la ocupación
+        guardada con la hora actual, sin consultar Reserva. Si la reserva
+        guardada ya terminó, la siguiente (que avanzan el próximo cambio de
+        reservas de la sala o reconciliar_ocupacion) puede haber empezado:
+        solo entonces se hace la consulta exacta.
         """
         if not self.habilitada:
             return False
         
+        if self.por_puestos:
+            # Llena según el contador: se liberan los puestos de reservas ya
+            # terminadas antes de responder
+            if not self.puestos_libres:
+                self.puestos_ocupados -= self.reservas.liberar_puestos()
+            return self.puestos_libres > 0
+        
         ahora = timezone.now()
+        if self.ocupada_hasta is None or self.ocupada_desde > ahora:
+            return True
+        if self.ocupada_hasta < ahora:
+            return not self.tiene_reservas_entre(ahora, ahora)
+        return False
+    
+    def actualizar_ocupacion(self):
+        """
+        Recalcula la ocupación guardada de la sala y la recarga en esta instancia
+        """
+        alias = router.db_for_write(Sala, instance=self)
+        Sala.objects.db_manager(alias).actualizar_ocupacion([self.pk])
+        self.refresh_from_db(fields=CAMPOS_OCUPACION_SALA)
+    
+    def tiene_reservas_entre(self, inicio, fin, excluir=None):
+        """
+        Consulta exacta: indica si alguna reserva activa se traslapa con
+        [inicio, fin] (si inicio == fin, si alguna reserva lo incluye)
+        """
         # IMPORTANTE: Solo considerar reservas con estado 'activa'
-        reserva_activa = self.reservas.filter(
-            fecha_hora_inicio__lte=ahora,
-            fecha_hora_fin__gte=ahora,
-            estado='activa'  # <--- ESTA LÍNEA ES CRÍTICA
-        ).exists()
+        reservas = self.reservas.filter(estado='activa')
+        if fin > inicio:
+            reservas = reservas.filter(fecha_hora_inicio__lt=fin, fecha_hora_fin__gt=inicio)
+        else:
+            reservas = reservas.filter(fecha_hora_inicio__lte=inicio, fecha_hora_fin__gte=inicio)
+        if excluir:
+            reservas = reservas.exclude(pk=excluir)
+        return reservas.exists()
+    
+    def libre_entre(self, inicio, fin, excluir=None):
+        """
+        Indica si la sala no tiene reservas activas entre 'inicio' y 'fin'.
+        Primero se revisa el mapa de bits del día (ver disponibilidad.py);
+        solo si hay una casilla ocupada se confirma con la consulta exacta.
+        """
+        if DisponibilidadDiaria.objects.libre(self.pk, inicio, fin):
+            return True
+        return not self.tiene_reservas_entre(inicio, fin, excluir)
+
+
+# Ocupación guardada de la sala (ver Sala.reserva_actual)
+CAMPOS_OCUPACION_SALA = ('reserva_actual', 'ocupada_desde', 'ocupada_hasta')
+
+# Campos de Sala que solo cambian con UPDATE atómicos, nunca con save()
+CAMPOS_MANTENIDOS_SALA = ('puestos_ocupados', *CAMPOS_OCUPACION_SALA)
+
+# Campos de Reserva que cambian la ocupación guardada de su sala
+CAMPOS_OCUPACION_RESERVA = frozenset({'sala', 'sala_id', 'estado', 'fecha_hora_inicio', 'fecha_hora_fin'})
+
+# Campos publicados en los eventos de cambio (ver EventoCambio)
+CAMPOS_EVENTO_SALA = ('nombre', 'capacidad', 'habilitada', 'eliminada')
+CAMPOS_EVENTO_RESERVA = ('sala_id', 'rut', 'fecha_hora_inicio', 'fecha_hora_fin', 'estado', 'version', 'grupo')
+
+
+class ConflictoReserva(Exception):
+    """
+    La reserva cambió (otra persona la canceló, finalizó o modificó) entre que
+    se leyó y se intentó actualizar. El mensaje se puede mostrar al usuario.
+    """
+
+
+class ReservaQuerySet(models.QuerySet):
+    """
+    Operaciones masivas sobre reservas. Cada transición se aplica con un solo
+    UPDATE/DELETE sin importar cuántas reservas se seleccionen, respetando las
+    mismas reglas que las vistas de una sola reserva.
+    """
+    
+    def de_sede(self, sede):
+        return self.filter(sala__sede=sede)
+    
+    def vigentes(self):
+        """
+        Reservas activas que todavía no terminan (las únicas que se pueden
+        finalizar o cancelar)
+        """
+        return self.filter(estado='activa', fecha_hora_fin__gte=timezone.now())
+    
+    def _filas_evento(self):
+        """
+        Lee las reservas del queryset como diccionarios con los campos que
+        se publican en el outbox, más 'pk', 'sede_id' y 'ocupa_puesto'
+        """
+        return list(self.values('pk', 'sala__sede_id', 'ocupa_puesto', *CAMPOS_EVENTO_RESERVA))
+    
+    def _actualizar_vigentes(self, accion, **valores):
+        alias = self.db
+        with transaction.atomic(using=alias):
+            # Bloquear las filas: los eventos corresponden exactamente a las
+            # reservas que cambia el UPDATE
+            afectadas = self.vigentes().select_for_update(of=('self',))._filas_evento()
+            cantidad = Reserva.objects.using(alias).filter(pk__in=[fila['pk'] for fila in afectadas]).update(
+                version=F('version') + 1, ocupa_puesto=False, **valores
+            )
+            for fila in afectadas:
+                fila.update(valores, version=fila['version'] + 1)
+            Sala.objects.db_manager(alias).devolver_puestos(
+                Counter(fila['sala_id'] for fila in afectadas if fila['ocupa_puesto'])
+            )
+            Sala.objects.db_manager(alias).actualizar_ocupacion(fila['sala_id'] for fila in afectadas)
+            DisponibilidadDiaria.objects.db_manager(alias).reconstruir(
+                (fila['sala_id'], fila['fecha_hora_inicio'], fila['fecha_hora_fin']) for fila in afectadas
+            )
+            EventoCambio.objects.db_manager(alias).registrar('reserva', accion, Reserva.filas_evento(afectadas))
+        
+        invalidar_reservas((fila['rut'], fila['sala_id']) for fila in afectadas)
+        return cantidad
+    
+    def finalizar(self):
+        """
+        Finaliza anticipadamente las reservas vigentes. Retorna cuántas cambiaron.
+        """
+        return self._actualizar_vigentes('finalizada', estado='finalizada', fecha_hora_fin=timezone.now())
+    
+    def cancelar(self):
+        """
+        Cancela las reservas vigentes. Retorna cuántas cambiaron.
+        """
+        return self._actualizar_vigentes('cancelada', estado='cancelada')
+    
+    def liberar_puestos(self):
+        """
+        Devuelve los puestos que siguen ocupando las reservas del queryset que
+        ya terminaron (en una sala por puestos una reserva vencida no cambia
+        de estado por sí sola). Retorna cuántos puestos se liberaron.
+        """
+        alias = self.db
+        with transaction.atomic(using=alias):
+            vencidas = list(
+                self.filter(ocupa_puesto=True, fecha_hora_fin__lt=timezone.now())
+                .select_for_update(of=('self',)).values_list('pk', 'sala_id')
+            )
+            if not vencidas:
+                return 0
+            Reserva.objects.using(alias).filter(pk__in=[pk for pk, _ in vencidas]).update(ocupa_puesto=False)
+            Sala.objects.db_manager(alias).devolver_puestos(Counter(sala_id for _, sala_id in vencidas))
+        return len(vencidas)
+    
+    def reservar_grupo(self, salas_ids, inicio, fin, **datos):
+        """
+        Reserva varias salas para el mismo horario en una sola transacción:
+        se crean todas o ninguna. 'datos' son los campos del reservante (rut,
+        nombre_reservante, email). Retorna las reservas creadas o lanza
+        ValidationError si alguna sala no está disponible. Las salas por
+        puestos no se reservan completas.
+        """
+        salas_ids = set(salas_ids)
+        if fin <= inicio:
+            raise ValidationError('La fecha de fin debe ser posterior a la fecha de inicio.')
+        # Validar los campos una vez, antes de bloquear las salas
+        Reserva(fecha_hora_inicio=inicio, fecha_hora_fin=fin, **datos).clean_fields(exclude=['sala'])
+        
+        alias = router.db_for_write(Reserva)
+        grupo = uuid.uuid4()
+        with transaction.atomic(using=alias):
+            # Primero el RUT y luego las salas, en el mismo orden que Reserva.save
+            bloquear_ruts([datos.get('rut')], using=alias)
+            # Las salas se bloquean siempre en el mismo orden (por pk): dos
+            # grupos con salas en común se esperan en vez de caer en deadlock,
+            # y mientras tanto nadie puede reservar esas salas (Reserva.save
+            # bloquea la sala antes de confirmar el horario)
+            salas = list(
+                Sala.objects.using(alias).select_for_update()
+                .filter(pk__in=salas_ids, habilitada=True, por_puestos=False).order_by('pk')
+            )
+            if len(salas) != len(salas_ids):
+                raise ValidationError('Alguna de las salas no existe, no está habilitada o se reserva por puestos.')
+            
+            # Disponibilidad de todas las salas en una sola consulta
+            ocupadas = list(
+                Reserva.objects.using(alias)
+                .filter(sala_id__in=salas_ids, estado='activa', fecha_hora_inicio__lt=fin, fecha_hora_fin__gt=inicio)
+                .order_by('sala__nombre').values_list('sala__nombre', flat=True).distinct()
+            )
+            if ocupadas:
+                raise ValidationError(f'Ya están reservadas en ese horario: {", ".join(ocupadas)}.')
+            
+            if Reserva.objects.using(alias).filter(rut=datos.get('rut'), fecha_hora_fin__gte=timezone.now(), estado='activa').exists():
+                raise ValidationError('Este RUT ya tiene una reserva activa. No puede reservar otra sala hasta que finalice la reserva actual.')
+            
+            reservas = [
+                Reserva(sala=sala, grupo=grupo, fecha_hora_inicio=inicio, fecha_hora_fin=fin, **datos)
+                for sala in salas
+            ]
+            Reserva.objects.using(alias).bulk_create(reservas)
+            Sala.objects.db_manager(alias).actualizar_ocupacion(salas_ids)
+            for reserva in reservas:
+                DisponibilidadDiaria.objects.db_manager(alias).marcar(reserva.sala_id, inicio, fin)
+            EventoCambio.objects.db_manager(alias).registrar('reserva', 'creada', [reserva.fila_evento() for reserva in reservas])
         
-        return not reserva_activa
+        invalidar_reservas((reserva.rut, reserva.sala_id) for reserva in reservas)
+        return reservas
+    
+    def eliminar(self):
+        """
+        Elimina las reservas. Retorna cuántas se eliminaron.
+        """
+        alias = self.db
+        with transaction.atomic(using=alias):
+            afectadas = self.select_for_update(of=('self',))._filas_evento()
+            cantidad, _ = Reserva.objects.using(alias).filter(pk__in=[fila['pk'] for fila in afectadas]).delete()
+            Sala.objects.db_manager(alias).devolver_puestos(
+                Counter(fila['sala_id'] for fila in afectadas if fila['ocupa_puesto'])
+            )
+            Sala.objects.db_manager(alias).actualizar_ocupacion(
+                fila['sala_id'] for fila in afectadas if fila['estado'] == 'activa'
+            )
+            # Solo las reservas activas ocupan casillas en los mapas de disponibilidad
+            DisponibilidadDiaria.objects.db_manager(alias).reconstruir(
+                (fila['sala_id'], fila['fecha_hora_inicio'], fila['fecha_hora_fin'])
+                for fila in afectadas if fila['estado'] == 'activa'
+            )
+            EventoCambio.objects.db_manager(alias).registrar('reserva', 'eliminada', Reserva.filas_evento(afectadas))
+        
+        invalidar_reservas((fila['rut'], fila['sala_id']) for fila in afectadas)
+        return cantidad
 
 
 class Reserva(models.Model):
@@ -94,6 +688,8 @@ class Reserva(models.Model):
     sala = models.ForeignKey(Sala, on_delete=models.CASCADE, related_name='reservas', verbose_name='Sala')
     rut = models.CharField(max_length=12, validators=[validar_rut], verbose_name='RUT')
     nombre_reservante = models.CharField(max_length=200, verbose_name='Nombre del Reservante')
+    # Opcional: para enviar recordatorios antes del inicio y del término (ver recordatorios.py)
+    email = models.EmailField(blank=True, default='', verbose_name='Correo electrónico')
     fecha_hora_inicio = models.DateTimeField(verbose_name='Fecha y Hora de Inicio')
     fecha_hora_fin = models.DateTimeField(verbose_name='Fecha y Hora de Fin')
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación de Reserva')
@@ -103,11 +699,18 @@ class Reserva(models.Model):
         default='activa',
         verbose_name='Estado'
     )
+    # Se incrementa en cada cambio de estado (control de concurrencia optimista)
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name='Versión')
+    # Fecha de envío de cada recordatorio (None: pendiente); evita duplicados
+    recordatorio_inicio_enviado = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Recordatorio de inicio enviado')
+    recordatorio_fin_enviado = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Recordatorio de término enviado')
+    # Reservas de varias salas hechas juntas (ver ReservaQuerySet.reservar_grupo)
+    grupo = models.UUIDField(null=True, blank=True, editable=False, verbose_name='Grupo')
+    # La reserva cuenta en Sala.puestos_ocupados (solo en salas por puestos):
+    # se apaga al cancelar, finalizar o eliminar, o con liberar_puestos() cuando termina
+    ocupa_puesto = models.BooleanField(default=False, editable=False, verbose_name='Ocupa puesto')
     
-    class Meta:
-        verbose_name = 'Reserva'
-        verbose_name_plural = 'Reservas'
-        ordering = ['-fecha_hora_inicio']
+    objects = ReservaQuerySet.as_manager()
     
     def __str__(self):
         return f"Reserva de {self.nombre_reservante} - Sala {self.sala.nombre}"
@@ -121,39 +724,45 @@ class Reserva(models.Model):
             return
         
         # Validar que no exista otra reserva activa del mismo RUT
-        ahora = timezone.now()
-        
-        # Asegurarse de que las fechas estén definidas para la comparación
-        fecha_fin_comparar = self.fecha_hora_fin if self.fecha_hora_fin else ahora + timedelta(hours=2)
-        
-        # Construir el queryset de reservas activas
-        reservas_activas = Reserva.objects.filter(
-            rut=self.rut,
-            fecha_hora_fin__gte=ahora,
-            estado='activa'
-        )
-        
-        # Excluir la reserva actual si ya existe (para ediciones)
-        if self.pk:
-            reservas_activas = reservas_activas.exclude(pk=self.pk)
-        
-        # Si hay reservas activas, lanzar error
-        if reservas_activas.exists():
+        # (save() lo confirma con el RUT bloqueado, ver _confirmar_rut)
+        if self._otras_activas_del_rut().exists():
             raise ValidationError('Este RUT ya tiene una reserva activa. No puede reservar otra sala hasta que finalice la reserva actual.')
         
         # Validar que la sala esté habilitada
         if hasattr(self, 'sala') and not self.sala.habilitada:
             raise ValidationError('Esta sala no está habilitada para reservas.')
         
+        # Validar que la sala no tenga otra reserva activa en el mismo horario
+        # (en una sala por puestos el límite es su capacidad, ver save())
+        if self.estado == 'activa' and self.fecha_hora_inicio and self.fecha_hora_fin and not self.sala.por_puestos:
+            if not self.sala.libre_entre(self.fecha_hora_inicio, self.fecha_hora_fin, excluir=self.pk):
+                raise ValidationError('La sala ya está reservada en ese horario.')
+        
         # Validar que la fecha de fin sea mayor a la de inicio
         if self.fecha_hora_inicio and self.fecha_hora_fin:
             if self.fecha_hora_fin <= self.fecha_hora_inicio:
                 raise ValidationError('La fecha de fin debe ser posterior a la fecha de inicio.')
     
-    def save(self, *args, **kwargs):
+    def _otras_activas_del_rut(self, alias=None):
         """
-        Método save personalizado para asignar fechas automáticamente
+        Otras reservas activas vigentes del mismo RUT
         """
+        reservas_activas = Reserva.objects.using(alias).filter(
+            rut=self.rut,
+            fecha_hora_fin__gte=timezone.now(),
+            estado='activa'
+        )
+        
+        # Excluir la reserva actual si ya existe (para ediciones)
+        if self.pk:
+            reservas_activas = reservas_activas.exclude(pk=self.pk)
+        
+        # Las salas de una reserva grupal cuentan como una sola reserva
+        if self.grupo:
+            reservas_activas = reservas_activas.exclude(grupo=self.grupo)
+        return reservas_activas
+    
+    def save(self, *args, **kwargs):
         # Si no se especifica fecha_hora_inicio, usar la hora actual
         if not self.fecha_hora_inicio:
             self.fecha_hora_inicio = timezone.now()
@@ -163,57 +772,650 @@ class Reserva(models.Model):
             self.fecha_hora_fin = self.fecha_hora_inicio + timedelta(hours=2)
         
         # Ejecutar validaciones SOLO si no se especifica update_fields
-        # (para permitir actualizaciones directas sin validaciones completas)
-        if 'update_fields' not in kwargs:
+        # (para permitir actualizaciones directas en tests)
+        if 'update_fields' not in kwargs:  # <--- ÚNICA CORRECCIÓN AQUÍ
             self.full_clean()
         
-        super().save(*args, **kwargs)
+        # El evento se registra en la misma transacción que el cambio
+        accion = 'creada' if self._state.adding else 'editada'
+        alias = router.db_for_write(Reserva, instance=self)
+        update_fields = kwargs.get('update_fields')
+        cambia_ocupacion = not self.sala.por_puestos and (
+            update_fields is None or not CAMPOS_OCUPACION_RESERVA.isdisjoint(update_fields)
+        )
+        with transaction.atomic(using=alias):
+            if 'update_fields' not in kwargs:
+                self._confirmar_rut(alias)
+                self._confirmar_horario(alias)
+                self._ajustar_puesto(alias)
+            reservas_ids = [] if self._state.adding else [self.pk]
+            super().save(*args, **kwargs)
+            if cambia_ocupacion:
+                # También la sala anterior si la reserva se cambió de sala
+                Sala.objects.db_manager(alias).actualizar_ocupacion([self.sala_id], reservas_ids)
+            
+            # Mantener el mapa de disponibilidad en la misma transacción (un
+            # mapa sin marcar haría pasar por libre la sala): una reserva
+            # activa marca sus casillas; si dejó de estar activa, se
+            # reconstruyen sus días. Las reservas de salas por puestos no
+            # ocupan casillas.
+            disponibilidad = DisponibilidadDiaria.objects.db_manager(alias)
+            if not self.sala.por_puestos and self.estado == 'activa':
+                disponibilidad.marcar(self.sala_id, self.fecha_hora_inicio, self.fecha_hora_fin)
+            elif not self.sala.por_puestos:
+                disponibilidad.reconstruir([(self.sala_id, self.fecha_hora_inicio, self.fecha_hora_fin)])
+            EventoCambio.objects.db_manager(alias).registrar('reserva', accion, [self.fila_evento()])
+        if cambia_ocupacion:
+            self.sala.refresh_from_db(fields=CAMPOS_OCUPACION_SALA)
+        
+        # El historial cacheado de este RUT y el calendario de la sala ya no son válidos
+        invalidar_reservas([(self.rut, self.sala_id)])
+    
+    def _confirmar_rut(self, alias):
+        """
+        Bloquea el RUT y repite la validación de clean() de una reserva activa
+        por RUT. Se llama dentro de la transacción de save(), antes de bloquear
+        la sala: dos reservas concurrentes del mismo RUT, aunque sean de salas
+        distintas, se esperan y la segunda ve a la primera.
+        """
+        if self.estado != 'activa':
+            return
+        bloquear_ruts([self.rut], using=alias)
+        if self._otras_activas_del_rut(alias).exists():
+            raise ValidationError('Este RUT ya tiene una reserva activa. No puede reservar otra sala hasta que finalice la reserva actual.')
+    
+    def _confirmar_horario(self, alias):
+        """
+        Bloquea la sala y repite, con la consulta exacta, la validación de
+        traslape de clean(). Se llama dentro de la transacción de save(): una
+        reserva concurrente de la misma sala (individual o grupal, ver
+        ReservaQuerySet.reservar_grupo) espera a que esta termine.
+        """
+        if self.estado != 'activa' or self.sala.por_puestos:
+            return
+        # En el mismo orden que actualizar_ocupacion(), que luego bloquea
+        # también la sala anterior si la reserva se cambió de sala
+        filtro = models.Q(pk=self.sala_id)
+        if not self._state.adding:
+            filtro |= models.Q(pk__in=Reserva.objects.filter(pk=self.pk).values('sala_id'))
+        list(Sala.todas.using(alias).select_for_update().filter(filtro).order_by('pk').values_list('pk', flat=True))
+        
+        reservas = Reserva.objects.using(alias).filter(
+            sala_id=self.sala_id,
+            estado='activa',
+            fecha_hora_inicio__lt=self.fecha_hora_fin,
+            fecha_hora_fin__gt=self.fecha_hora_inicio,
+        )
+        if self.pk:
+            reservas = reservas.exclude(pk=self.pk)
+        if reservas.exists():
+            raise ValidationError('La sala ya está reservada en ese horario.')
+    
+    def _ajustar_puesto(self, alias):
+        """
+        Toma o devuelve el puesto de la reserva según su sala y estado. Se
+        llama dentro de la transacción de save(); si no quedan puestos lanza
+        ValidationError y la reserva no se guarda.
+        """
+        debe_ocupar = self.sala.por_puestos and self.estado == 'activa' and self.fecha_hora_fin >= timezone.now()
+        anterior = None
+        if not self._state.adding and (debe_ocupar or self.ocupa_puesto):
+            # Leer el puesto guardado con la fila bloqueada: esta instancia
+            # puede ser una copia vieja
+            anterior = (
+                Reserva.objects.using(alias).select_for_update()
+                .filter(pk=self.pk, ocupa_puesto=True).values_list('sala_id', flat=True).first()
+            )
+        
+        if anterior is not None and (not debe_ocupar or anterior != self.sala_id):
+            Sala.objects.db_manager(alias).devolver_puestos({anterior: 1})
+            anterior = None
+        if debe_ocupar and anterior is None:
+            if not Sala.objects.db_manager(alias).tomar_puesto(self.sala_id):
+                raise ValidationError('No quedan puestos disponibles en esta sala.')
+        self.ocupa_puesto = debe_ocupar
+    
+    def _devolver_puesto(self, alias):
+        """
+        Devuelve el puesto de la reserva si todavía lo ocupa (UPDATE
+        condicional: solo la primera cancelación o eliminación lo devuelve)
+        """
+        if self.ocupa_puesto and Reserva.objects.using(alias).filter(pk=self.pk, ocupa_puesto=True).update(ocupa_puesto=False):
+            Sala.objects.db_manager(alias).devolver_puestos({self.sala_id: 1})
+        self.ocupa_puesto = False
+    
+    def delete(self, *args, **kwargs):
+        alias = router.db_for_write(Reserva, instance=self)
+        fila = self.fila_evento()
+        with transaction.atomic(using=alias):
+            self._devolver_puesto(alias)
+            resultado = super().delete(*args, **kwargs)
+            if self.estado == 'activa':
+                Sala.objects.db_manager(alias).actualizar_ocupacion([self.sala_id])
+                DisponibilidadDiaria.objects.db_manager(alias).reconstruir(
+                    [(self.sala_id, self.fecha_hora_inicio, self.fecha_hora_fin)]
+                )
+            EventoCambio.objects.db_manager(alias).registrar('reserva', 'eliminada', [fila])
+        invalidar_reservas([(self.rut, self.sala_id)])
+        return resultado
+    
+    def _transicionar(self, version=None, **valores):
+        """
+        Aplica un cambio de estado con un UPDATE condicional:
+        
+            UPDATE ... SET ..., version = version + 1
+            WHERE id = ? AND version = ? AND estado = 'activa' AND fecha_hora_fin >= ahora
+        
+        Si otra persona cambió la reserva entretanto no se actualiza ninguna
+        fila y se lanza ConflictoReserva, sin bloquear filas en la base de datos.
+        'version' es la versión que vio el usuario (por defecto la de esta instancia).
+        """
+        if version is None:
+            version = self.version
+        horario = (self.sala_id, self.fecha_hora_inicio, self.fecha_hora_fin)
+        
+        alias = router.db_for_write(Reserva, instance=self)
+        with transaction.atomic(using=alias):
+            actualizadas = Reserva.objects.using(alias).filter(pk=self.pk, version=version).vigentes().update(
+                version=F('version') + 1, **valores
+            )
+            if actualizadas:
+                for campo, valor in valores.items():
+                    setattr(self, campo, valor)
+                self.version = version + 1
+                self._devolver_puesto(alias)
+                Sala.objects.db_manager(alias).actualizar_ocupacion([self.sala_id])
+                DisponibilidadDiaria.objects.db_manager(alias).reconstruir([horario])
+                EventoCambio.objects.db_manager(alias).registrar('reserva', self.estado, [self.fila_evento()])
+        
+        if not actualizadas:
+            self.refresh_from_db()
+            raise ConflictoReserva(self._motivo_conflicto())
+        
+        if not self.sala.por_puestos:
+            self.sala.refresh_from_db(fields=CAMPOS_OCUPACION_SALA)
+        invalidar_reservas([(self.rut, self.sala_id)])
+    
+    def fila_evento(self):
+        """
+        (objeto_id, sede_id, datos) publicados en el outbox (ver EventoCambio)
+        """
+        datos = {campo: getattr(self, campo) for campo in CAMPOS_EVENTO_RESERVA}
+        return self.pk, self.sala.sede_id, datos
+    
+    @staticmethod
+    def filas_evento(filas):
+        """
+        Igual que fila_evento() para los diccionarios de ReservaQuerySet._filas_evento()
+        """
+        return [
+            (fila['pk'], fila['sala__sede_id'], {campo: fila[campo] for campo in CAMPOS_EVENTO_RESERVA})
+            for fila in filas
+        ]
+    
+    def _motivo_conflicto(self):
+        if self.estado == 'cancelada':
+            return 'Esta reserva ya fue cancelada.'
+        if self.estado == 'finalizada':
+            return 'Esta reserva ya fue finalizada.'
+        if self.fecha_hora_fin < timezone.now():
+            return 'Esta reserva ya terminó.'
+        return 'La reserva fue modificada por otra persona. Revise los datos e intente nuevamente.'
+    
+    def finalizar(self, version=None):
+        """
+        Finaliza anticipadamente la reserva (activa -> finalizada)
+        """
+        self._transicionar(version, estado='finalizada', fecha_hora_fin=timezone.now())
+    
+    def cancelar(self, version=None):
+        """
+        Cancela la reserva (activa -> cancelada)
+        """
+        self._transicionar(version, estado='cancelada')
     
     class Meta:
         verbose_name = 'Reserva'
         verbose_name_plural = 'Reservas'
         ordering = ['-fecha_hora_inicio']
+        indexes = [
+            # Búsqueda por prefijo del RUT canónico (LIKE '123%'). En PostgreSQL
+            # varchar_pattern_ops permite usar el índice sin depender del collation;
+            # en otros motores se crea un índice normal.
+            models.Index(fields=['rut'], name='reserva_rut_patron_idx', opclasses=['varchar_pattern_ops']),
+            # Historial por RUT (mis_reservas): filtro y orden resueltos con el
+            # mismo índice, así cada página es un recorrido acotado del índice
+            models.Index(fields=['rut', '-fecha_hora_inicio'], name='reserva_rut_inicio_idx'),
+            # Recordatorios pendientes (recordatorios.py): índices parciales que
+            # solo contienen las reservas activas con correo aún sin aviso
+            models.Index(
+                fields=['fecha_hora_inicio'],
+                name='reserva_recordatorio_ini_idx',
+                condition=models.Q(estado='activa', recordatorio_inicio_enviado__isnull=True) & ~models.Q(email=''),
+            ),
+            models.Index(
+                fields=['fecha_hora_fin'],
+                name='reserva_recordatorio_fin_idx',
+                condition=models.Q(estado='activa', recordatorio_fin_enviado__isnull=True) & ~models.Q(email=''),
+            ),
+            # Reservas de un grupo: solo las grupales ocupan el índice
+            models.Index(fields=['grupo'], name='reserva_grupo_idx', condition=models.Q(grupo__isnull=False)),
+            # Reserva en curso o próxima de cada sala (SalaManager.actualizar_ocupacion):
+            # solo las reservas activas, así no crece con el historial de cada sala
+            models.Index(
+                fields=['sala', 'fecha_hora_fin'], name='reserva_activa_sala_idx', condition=models.Q(estado='activa')
+            ),
+            # Puestos por liberar (liberar_puestos): solo las reservas que ocupan un puesto
+            models.Index(
+                fields=['sala', 'fecha_hora_fin'], name='reserva_puesto_idx', condition=models.Q(ocupa_puesto=True)
+            ),
+        ]
+
+
+class DisponibilidadManager(models.Manager):
+    """
+    Mantención y consulta de los mapas de bits de disponibilidad
+    """
     
-    def __str__(self):
-        return f"Reserva de {self.nombre_reservante} - Sala {self.sala.nombre}"
+    def marcar(self, sala_id, inicio, fin):
+        """
+        Marca como ocupadas las casillas de [inicio, fin) con un OR atómico
+        (dos reservas creadas en paralelo no se pisan)
+        """
+        for fecha, mascara in mascaras_por_dia(inicio, fin).items():
+            manana, tarde = dividir(mascara)
+            dia = self.filter(sala_id=sala_id, fecha=fecha)
+            valores = {'manana': F('manana').bitor(manana), 'tarde': F('tarde').bitor(tarde)}
+            if dia.update(**valores):
+                continue
+            try:
+                with transaction.atomic(using=self.db):
+                    self.create(sala_id=sala_id, fecha=fecha, manana=manana, tarde=tarde)
+            except IntegrityError:
+                # Otro proceso creó el día entretanto
+                dia.update(**valores)
     
-    def clean(self):
+    def reconstruir(self, horarios):
         """
-        Validaciones personalizadas antes de guardar
+        Recalcula desde Reserva los días que tocan los horarios indicados,
+        tuplas (sala_id, inicio, fin) de reservas que dejaron de estar activas.
+        Usa la misma cantidad de consultas sin importar cuántos días sean.
         """
-        # Validar que no exista otra reserva activa del mismo RUT
-        ahora = timezone.now()
-        reservas_activas = Reserva.objects.filter(
-            rut=self.rut,
-            fecha_hora_fin__gte=ahora,
-            estado='ACTIVA'
-        ).exclude(pk=self.pk)
+        dias = set()
+        for sala_id, inicio, fin in horarios:
+            dias.update((sala_id, fecha) for fecha in mascaras_por_dia(inicio, fin))
+        if not dias:
+            return
         
-        if reservas_activas.exists():
-            raise ValidationError('Este RUT ya tiene una reserva activa. No puede reservar otra sala hasta que finalice la reserva actual.')
+        salas_ids = {sala_id for sala_id, _ in dias}
+        fechas = {fecha for _, fecha in dias}
         
-        # Validar que la sala esté habilitada
-        if not self.sala.habilitada:
-            raise ValidationError('Esta sala no está habilitada para reservas.')
-        
-        # Validar que la fecha de fin sea mayor a la de inicio
-        # SOLO si ambas fechas están definidas
-        if self.fecha_hora_inicio and self.fecha_hora_fin:  # <--- ÚNICA CORRECCIÓN AQUÍ
-            if self.fecha_hora_fin <= self.fecha_hora_inicio:
-                raise ValidationError('La fecha de fin debe ser posterior a la fecha de inicio.')
+        with transaction.atomic(using=self.db):
+            # Bloquear los días: un marcar() concurrente espera a que termine
+            # la reconstrucción y luego agrega su OR, así no se pierden bits
+            existentes = {
+                (sala_id, fecha): pk
+                for pk, sala_id, fecha in self.select_for_update()
+                .filter(sala_id__in=salas_ids, fecha__in=fechas)
+                .values_list('pk', 'sala_id', 'fecha')
+            }
+            
+            mapas = {}
+            reservas = Reserva.objects.using(self.db).filter(
+                sala_id__in=salas_ids,
+                sala__por_puestos=False,
+                estado='activa',
+                fecha_hora_inicio__lt=inicio_dia(max(fechas) + timedelta(days=1)),
+                fecha_hora_fin__gt=inicio_dia(min(fechas)),
+            ).values_list('sala_id', 'fecha_hora_inicio', 'fecha_hora_fin')
+            for sala_id, inicio, fin in reservas:
+                acumular(mapas, sala_id, inicio, fin, fechas)
+            
+            self.escribir(dias, mapas, existentes)
     
-    def save(self, *args, **kwargs):
-        # Si no se especifica fecha_hora_inicio, usar la hora actual
-        if not self.fecha_hora_inicio:
-            self.fecha_hora_inicio = timezone.now()
+    def escribir(self, dias, mapas, existentes):
+        """
+        Guarda los mapas calculados para los días indicados. 'existentes' es
+        {(sala_id, fecha): pk} con las filas que ya hay para esos días.
+        """
+        actualizar, crear, borrar = [], [], []
+        for sala_id, fecha in dias:
+            mascara = mapas.get((sala_id, fecha), 0)
+            pk = existentes.get((sala_id, fecha))
+            if not mascara:
+                # Un día sin fila equivale a un día completamente libre
+                if pk:
+                    borrar.append(pk)
+                continue
+            manana, tarde = dividir(mascara)
+            dia = self.model(pk=pk, sala_id=sala_id, fecha=fecha, manana=manana, tarde=tarde)
+            (actualizar if pk else crear).append(dia)
         
-        # Si no se especifica fecha_hora_fin, calcular automáticamente (2 horas después)
-        if not self.fecha_hora_fin:
-            self.fecha_hora_fin = self.fecha_hora_inicio + timedelta(hours=2)
+        if actualizar:
+            self.bulk_update(actualizar, ['manana', 'tarde'], batch_size=1000)
+        if crear:
+            self.bulk_create(crear, batch_size=1000)
+        if borrar:
+            self.filter(pk__in=borrar).delete()
+    
+    def calcular(self, salas_ids=None, desde=None):
+        """
+        Calcula desde Reserva los mapas {(sala_id, fecha): máscara} de las
+        salas indicadas (todas por defecto), desde la fecha 'desde' si se indica
+        """
+        reservas = Reserva.objects.using(self.db).filter(estado='activa', sala__por_puestos=False)
+        if salas_ids is not None:
+            reservas = reservas.filter(sala_id__in=salas_ids)
+        if desde:
+            reservas = reservas.filter(fecha_hora_fin__gt=inicio_dia(desde))
         
-        # Ejecutar validaciones SOLO si no se especifica update_fields
-        # (para permitir actualizaciones directas en tests)
-        if 'update_fields' not in kwargs:  # <--- ÚNICA CORRECCIÓN AQUÍ
-            self.full_clean()
+        mapas = {}
+        filas = reservas.order_by().values_list('sala_id', 'fecha_hora_inicio', 'fecha_hora_fin')
+        for sala_id, inicio, fin in filas.iterator(chunk_size=10000):
+            acumular(mapas, sala_id, inicio, fin)
         
-        super().save(*args, **kwargs)
+        if desde:
+            mapas = {dia: mascara for dia, mascara in mapas.items() if dia[1] >= desde}
+        return mapas
+    
+    def reconstruir_salas(self, salas_ids):
+        """
+        Recalcula por completo los mapas de las salas indicadas (por ejemplo
+        después de insertar reservas con bulk_create, que no pasa por save())
+        """
+        mapas = self.calcular(salas_ids)
+        with transaction.atomic(using=self.db):
+            self.filter(sala_id__in=salas_ids).delete()
+            self.escribir(mapas.keys(), mapas, {})
+    
+    def salas_libres(self, salas_ids, inicio, fin):
+        """
+        Retorna el conjunto de salas que según los mapas de bits están
+        seguramente libres entre 'inicio' y 'fin' (una sola consulta)
+        """
+        mascaras = mascaras_por_dia(inicio, fin)
+        ocupadas = set()
+        dias = self.filter(sala_id__in=salas_ids, fecha__in=mascaras).values_list('sala_id', 'fecha', 'manana', 'tarde')
+        for sala_id, fecha, manana, tarde in dias:
+            if unir(manana, tarde) & mascaras[fecha]:
+                ocupadas.add(sala_id)
+        return set(salas_ids) - ocupadas
+    
+    def libre(self, sala_id, inicio, fin):
+        return sala_id in self.salas_libres([sala_id], inicio, fin)
+
+
+class DisponibilidadDiaria(models.Model):
+    """
+    Casillas de 15 minutos ocupadas por reservas activas de una sala en un
+    día local (ver disponibilidad.py). Las salas por puestos no tienen
+    casillas ocupadas: su límite es Sala.puestos_ocupados. Se mantiene al crear, cancelar,
+    finalizar y eliminar reservas; manage.py verificar_disponibilidad la
+    compara con Reserva y la repara.
+    """
+    sala = models.ForeignKey(Sala, on_delete=models.CASCADE, related_name='disponibilidad', verbose_name='Sala')
+    fecha = models.DateField(verbose_name='Fecha')
+    # Casillas 0-47 (00:00 a 11:45) y 48-95 (12:00 a 23:45), un bit por casilla
+    manana = models.BigIntegerField(default=0, verbose_name='Casillas de la mañana')
+    tarde = models.BigIntegerField(default=0, verbose_name='Casillas de la tarde')
+    
+    objects = DisponibilidadManager()
+    
+    class Meta:
+        verbose_name = 'Disponibilidad diaria'
+        verbose_name_plural = 'Disponibilidad diaria'
+        constraints = [
+            models.UniqueConstraint(fields=['sala', 'fecha'], name='disponibilidad_sala_fecha_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.sala_id} {self.fecha}: {self.mascara:024x}"
+    
+    @property
+    def mascara(self):
+        return unir(self.manana, self.tarde)
+
+
+class EventoCambioManager(models.Manager):
+    
+    def registrar(self, modelo, accion, filas):
+        """
+        Agrega un evento por cada fila (objeto_id, sede_id, datos). Se llama
+        dentro de la transacción del cambio, como su última escritura: si el
+        cambio se revierte, el evento también, y los datos publicados son los
+        finales. En PostgreSQL guarda además el id de la transacción, con el
+        que los lectores ordenan los eventos por confirmación (ver eventos.py)
+        sin que las escrituras se esperen entre sí.
+        """
+        if not filas:
+            return
+        with transaction.atomic(using=self.db, savepoint=False):
+            transaccion = 0
+            conexion = connections[self.db]
+            if conexion.vendor == 'postgresql':
+                with conexion.cursor() as cursor:
+                    cursor.execute('SELECT pg_current_xact_id()::text::bigint')
+                    transaccion = cursor.fetchone()[0]
+            eventos = [
+                self.model(
+                    modelo=modelo, accion=accion, objeto_id=objeto_id, sede_id=sede_id,
+                    datos=datos, transaccion=transaccion
+                )
+                for objeto_id, sede_id, datos in filas
+            ]
+            self.bulk_create(eventos, batch_size=1000)
+
+
+class EventoCambio(models.Model):
+    """
+    Outbox de cambios de salas y reservas (solo se agregan filas). Cada
+    creación, edición, cancelación, finalización o eliminación agrega un
+    evento en la misma transacción que el cambio, así los sistemas externos
+    (control de acceso, señalética, analítica) leen solo lo nuevo, en orden de
+    confirmación, en vez de recorrer la tabla de reservas (ver eventos.py).
+    """
+    MODELO_CHOICES = [
+        ('sala', 'Sala'),
+        ('reserva', 'Reserva'),
+    ]
+    ACCION_CHOICES = [
+        ('creada', 'Creada'),
+        ('editada', 'Editada'),
+        ('cancelada', 'Cancelada'),
+        ('finalizada', 'Finalizada'),
+        ('eliminada', 'Eliminada'),
+    ]
+    
+    fecha = models.DateTimeField(auto_now_add=True, verbose_name='Fecha')
+    # Como en Sala, sin restricción de clave foránea (la sede está en 'default')
+    sede = models.ForeignKey(
+        Sede, on_delete=models.DO_NOTHING, related_name='+', db_constraint=False, verbose_name='Sede'
+    )
+    modelo = models.CharField(max_length=20, choices=MODELO_CHOICES, verbose_name='Modelo')
+    objeto_id = models.BigIntegerField(verbose_name='Id del objeto')
+    accion = models.CharField(max_length=20, choices=ACCION_CHOICES, verbose_name='Acción')
+    # Estado del objeto después del cambio (antes, si se eliminó)
+    datos = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name='Datos')
+    # Id de la transacción que lo registró (solo en PostgreSQL; 0 en otras bases)
+    transaccion = models.BigIntegerField(default=0, editable=False, verbose_name='Transacción')
+    
+    objects = EventoCambioManager()
+    
+    class Meta:
+        verbose_name = 'Evento de cambio'
+        verbose_name_plural = 'Eventos de cambio'
+        ordering = ['id']
+        indexes = [
+            # Lectura desde un cursor, en orden de confirmación (ver eventos.py):
+            # WHERE [sede_id = ? AND] (transaccion, id) > (?, ?) ORDER BY transaccion, id
+            models.Index(fields=['transaccion', 'id'], name='evento_transaccion_idx'),
+            models.Index(fields=['sede', 'transaccion', 'id'], name='evento_sede_transaccion_idx'),
+            # Historial de un objeto (ver instantaneas.py): WHERE modelo = ? AND objeto_id IN (...)
+            models.Index(fields=['modelo', 'objeto_id'], name='evento_objeto_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.pk} {self.modelo} {self.objeto_id} {self.accion}"
+
+
+class TrabajoInterrumpido(Exception):
+    """
+    El trabajo dejó de estar en curso mientras se ejecutaba (se canceló o
+    superó su tiempo límite). La tarea debe terminar sin guardar su resultado.
+    """
+
+
+class TrabajoManager(models.Manager):
+    
+    def reclamar(self, trabajador, cantidad):
+        """
+        Toma hasta 'cantidad' trabajos pendientes para 'trabajador' y los
+        deja en curso. Con SELECT ... FOR UPDATE SKIP LOCKED dos procesos no
+        se esperan entre sí ni leen los mismos trabajos; en motores sin
+        bloqueo de filas (SQLite) el UPDATE condicional basta para que cada
+        trabajo lo tome uno solo.
+        """
+        ahora = timezone.now()
+        with transaction.atomic(using=self.db):
+            pendientes = list(
+                self.filter(estado='pendiente', disponible_desde__lte=ahora)
+                .order_by('disponible_desde', 'pk')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', 'limite_segundos')[:cantidad]
+            )
+            reclamados = [
+                pk for pk, limite_segundos in pendientes
+                if self.filter(pk=pk, estado='pendiente').update(
+                    estado='en_curso',
+                    trabajador=trabajador,
+                    intentos=F('intentos') + 1,
+                    progreso=0,
+                    iniciado=ahora,
+                    vence=ahora + timedelta(seconds=limite_segundos),
+                )
+            ]
+        return list(self.filter(pk__in=reclamados).select_related('sede').order_by('pk'))
+    
+    def vencer(self):
+        """
+        Da por vencidos los trabajos en curso que superaron su tiempo límite
+        (tarea colgada o trabajador caído): se reintentan o quedan fallidos.
+        Retorna cuántos vencieron.
+        """
+        vencidos = list(self.filter(estado='en_curso', vence__lt=timezone.now()))
+        for trabajo in vencidos:
+            trabajo.fallar(f'Tiempo agotado ({trabajo.limite_segundos} s)')
+        return len(vencidos)
+
+
+class Trabajo(models.Model):
+    """
+    Trabajo en segundo plano (exportaciones, acciones masivas, recálculo de
+    estadísticas). La tabla es la cola: manage.py procesar_trabajos los
+    reclama y ejecuta (ver trabajos.py). Vive siempre en 'default', como Sede;
+    la tarea corre en la base de datos de su sede.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_curso', 'En curso'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+        ('cancelado', 'Cancelado'),
+    ]
+    # Espera antes del primer reintento; se duplica en cada intento fallido
+    ESPERA_REINTENTO = timedelta(seconds=30)
+    
+    tarea = models.CharField(max_length=100, verbose_name='Tarea')
+    parametros = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name='Parámetros')
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, related_name='trabajos', verbose_name='Sede')
+    usuario = models.CharField(max_length=150, blank=True, default='', verbose_name='Encolado por')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente', verbose_name='Estado')
+    # Cada reclamo incrementa 'intentos': las escrituras de un intento
+    # anterior (vencido) ya no coinciden y se descartan
+    intentos = models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')
+    max_intentos = models.PositiveSmallIntegerField(default=3, verbose_name='Máximo de intentos')
+    limite_segundos = models.PositiveIntegerField(default=600, verbose_name='Tiempo límite (segundos)')
+    progreso = models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')
+    mensaje = models.CharField(max_length=200, blank=True, default='', verbose_name='Mensaje')
+    resultado = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name='Resultado')
+    error = models.TextField(blank=True, default='', verbose_name='Último error')
+    trabajador = models.CharField(max_length=100, blank=True, default='', verbose_name='Trabajador')
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')
+    disponible_desde = models.DateTimeField(default=timezone.now, verbose_name='Disponible desde')
+    iniciado = models.DateTimeField(null=True, blank=True, verbose_name='Iniciado')
+    vence = models.DateTimeField(null=True, blank=True, verbose_name='Vence')
+    terminado = models.DateTimeField(null=True, blank=True, verbose_name='Terminado')
+    
+    objects = TrabajoManager()
+    
+    class Meta:
+        verbose_name = 'Trabajo'
+        verbose_name_plural = 'Trabajos'
+        ordering = ['-id']
+        indexes = [
+            # Reclamo: WHERE estado = 'pendiente' AND disponible_desde <= ? ORDER BY disponible_desde
+            models.Index(
+                fields=['disponible_desde', 'id'], name='trabajo_pendiente_idx', condition=models.Q(estado='pendiente')
+            ),
+            # Vencimiento: WHERE estado = 'en_curso' AND vence < ?
+            models.Index(fields=['vence'], name='trabajo_en_curso_idx', condition=models.Q(estado='en_curso')),
+        ]
+    
+    def __str__(self):
+        return f"#{self.pk} {self.tarea} ({self.get_estado_display()})"
+    
+    @property
+    def activo(self):
+        return self.estado in ('pendiente', 'en_curso')
+    
+    def _actualizar(self, **valores):
+        """
+        UPDATE condicional: solo si el trabajo sigue en curso en este mismo
+        intento. Retorna False si se canceló, venció o lo tomó otro intento.
+        """
+        actualizados = Trabajo.objects.filter(pk=self.pk, estado='en_curso', intentos=self.intentos).update(**valores)
+        if actualizados:
+            for campo, valor in valores.items():
+                setattr(self, campo, valor)
+        return bool(actualizados)
+    
+    def avanzar(self, hechos, total=100, mensaje=None):
+        """
+        Informa el avance de la tarea (hechos de total; con hechos=None solo
+        el mensaje). Lanza TrabajoInterrumpido si el trabajo ya no está en
+        curso: las tareas largas deben llamarlo seguido para detenerse a tiempo.
+        """
+        valores = {}
+        if hechos is not None:
+            valores['progreso'] = min(100, hechos * 100 // total) if total else 100
+        if mensaje is not None:
+            valores['mensaje'] = mensaje[:200]
+        if not self._actualizar(**valores):
+            raise TrabajoInterrumpido(f'El trabajo #{self.pk} ya no está en curso.')
+    
+    def completar(self, resultado=None):
+        return self._actualizar(estado='completado', progreso=100, resultado=resultado, terminado=timezone.now())
+    
+    def fallar(self, error):
+        """
+        Registra el error y deja el trabajo pendiente para reintentarlo con
+        espera exponencial, o fallido si ya agotó sus intentos
+        """
+        if self.intentos < self.max_intentos:
+            espera = self.ESPERA_REINTENTO * 2 ** (self.intentos - 1)
+            return self._actualizar(
+                estado='pendiente', error=error, vence=None, disponible_desde=timezone.now() + espera
+            )
+        return self._actualizar(estado='fallido', error=error, terminado=timezone.now())
+    
+    def cancelar(self):
+        """
+        Cancela el trabajo si está pendiente o en curso (una tarea en curso se
+        detiene en su próximo avanzar()). Retorna si se canceló.
+        """
+        cancelados = Trabajo.objects.filter(pk=self.pk, estado__in=['pendiente', 'en_curso']).update(
+            estado='cancelado', terminado=timezone.now()
+        )
+        if cancelados:
+            self.refresh_from_db()
+        return bool(cancelados)
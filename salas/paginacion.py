@@ -0,0 +1,66 @@
+"""
+Paginación con conteo estimado para tablas grandes.
+
+Paginator ejecuta un SELECT COUNT(*) en cada página, que en PostgreSQL
+recorre toda la tabla (o el índice completo) y con millones de reservas
+tarda segundos. Cuando la tabla es grande basta con un número aproximado:
+
+- Sin filtros se usa pg_class.reltuples, la cantidad de filas que PostgreSQL
+  estimó en el último ANALYZE/autovacuum (costo constante).
+- Con filtros se usa la cantidad de filas estimada por el planificador
+  (EXPLAIN), sin ejecutar la consulta.
+
+Si la estimación queda bajo UMBRAL_ESTIMACION se hace el COUNT(*) exacto,
+que a ese tamaño es rápido. En otros motores siempre se cuenta exacto.
+"""
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
+
+# Sobre esta cantidad de filas (estimadas) no se hace el COUNT(*) exacto
+UMBRAL_ESTIMACION = 100_000
+
+
+def estimar_filas(queryset):
+    """
+    Retorna la cantidad estimada de filas del queryset en PostgreSQL,
+    o None si no se puede estimar
+    """
+    if not isinstance(queryset, QuerySet):
+        return None
+
+    conexion = connections[queryset.db]
+    if conexion.vendor != 'postgresql':
+        return None
+
+    if not queryset.query.where:
+        with conexion.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            fila = cursor.fetchone()
+        # reltuples es -1 si la tabla nunca se ha analizado
+        if fila and fila[0] >= 0:
+            return fila[0]
+        return None
+
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginator que usa el conteo estimado cuando la tabla es grande.
+    El número de páginas mostrado es aproximado; las páginas en sí son exactas.
+    """
+
+    @cached_property
+    def count(self):
+        estimacion = estimar_filas(self.object_list)
+        if estimacion is not None and estimacion > UMBRAL_ESTIMACION:
+            return estimacion
+        return super().count
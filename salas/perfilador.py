@@ -0,0 +1,119 @@
+"""
+Perfiles de rendimiento (cProfile) de peticiones individuales.
+
+PerfiladorMiddleware (ver middleware.py) ejecuta bajo cProfile:
+
+- las peticiones de usuarios staff que traen el encabezado X-Perfilar o el
+  parámetro ?perfilar=1,
+- y, si PERFILAR_MUESTREO = N > 0, una de cada N peticiones al azar.
+
+Cada perfil se guarda en PERFILES_DIR como un archivo .prof (formato pstats,
+se abre con snakeviz o python -m pstats) junto a un .json con la URL, el
+nombre de la ruta y el tiempo. En panel-admin/perfiles/ se listan y descargan.
+"""
+import cProfile
+import io
+import json
+import pstats
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+# Perfiles que se conservan en disco (los más antiguos se borran)
+PERFILES_MAXIMO = 200
+
+# Nombre de archivo de un perfil: 20251019-153012-123456-lista_salas
+_NOMBRE_VALIDO = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9]{6}-[\w.-]+$')
+
+
+def directorio():
+    ruta = Path(settings.PERFILES_DIR)
+    ruta.mkdir(parents=True, exist_ok=True)
+    return ruta
+
+
+def perfilar(get_response, request):
+    """
+    Ejecuta la petición bajo cProfile y guarda el perfil.
+    Retorna (response, nombre del perfil).
+    """
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError:
+        # Ya hay otro perfilador activo (ej. dos peticiones en el mismo hilo
+        # con Python 3.12+): la petición se atiende sin perfilar
+        return get_response(request), None
+    inicio = time.perf_counter()
+    try:
+        response = get_response(request)
+    finally:
+        perfil.disable()
+    milisegundos = (time.perf_counter() - inicio) * 1000
+
+    match = getattr(request, 'resolver_match', None)
+    ruta = match.view_name if match else 'sin-ruta'
+    ahora = timezone.localtime()
+    nombre = f'{ahora:%Y%m%d-%H%M%S-%f}-' + re.sub(r'[^\w.-]', '_', ruta)
+
+    carpeta = directorio()
+    perfil.dump_stats(carpeta / f'{nombre}.prof')
+    datos = {
+        'nombre': nombre,
+        'fecha': ahora.isoformat(),
+        'metodo': request.method,
+        'url': request.get_full_path(),
+        'ruta': ruta,
+        'estado': response.status_code,
+        'milisegundos': round(milisegundos, 1),
+        'usuario': request.user.get_username() if getattr(request, 'user', None) else '',
+    }
+    (carpeta / f'{nombre}.json').write_text(json.dumps(datos, ensure_ascii=False))
+    _podar(carpeta)
+    return response, nombre
+
+
+def _podar(carpeta):
+    perfiles = sorted(carpeta.glob('*.json'))
+    for sobrante in perfiles[:-PERFILES_MAXIMO]:
+        sobrante.unlink(missing_ok=True)
+        sobrante.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def listar_perfiles():
+    """
+    Metadatos de los perfiles guardados, del más reciente al más antiguo
+    """
+    perfiles = []
+    for archivo in sorted(directorio().glob('*.json'), reverse=True):
+        try:
+            datos = json.loads(archivo.read_text())
+        except (OSError, ValueError):
+            continue
+        datos['fecha'] = datetime.fromisoformat(datos['fecha'])
+        perfiles.append(datos)
+    return perfiles
+
+
+def ruta_perfil(nombre):
+    """
+    Ruta del .prof de un perfil, o None si el nombre no es válido o no existe
+    """
+    if not _NOMBRE_VALIDO.match(nombre):
+        return None
+    ruta = directorio() / f'{nombre}.prof'
+    return ruta if ruta.exists() else None
+
+
+def resumen(ruta, lineas=40):
+    """
+    Texto de pstats con las funciones de mayor tiempo acumulado
+    """
+    salida = io.StringIO()
+    estadisticas = pstats.Stats(str(ruta), stream=salida)
+    estadisticas.strip_dirs().sort_stats('cumulative').print_stats(lineas)
+    return salida.getvalue()
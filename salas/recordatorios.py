@@ -0,0 +1,149 @@
+"""
+Recordatorios por correo de reservas que empiezan o terminan pronto.
+
+Cada ciclo (manage.py enviar_recordatorios) hace:
+
+1. Una sola consulta por los índices parciales de recordatorios pendientes:
+   reservas activas con correo cuyo inicio o fin cae dentro de la ventana y
+   que aún no tienen ese recordatorio. Las filas se bloquean con
+   SKIP LOCKED y se marcan como enviadas en la misma transacción, así dos
+   procesos en paralelo nunca envían el mismo recordatorio.
+2. El envío en un pool de hilos: cada hilo toma un lote de mensajes y los
+   manda uno a uno por una sola conexión SMTP, en vez de abrir una conexión
+   por correo.
+3. Los mensajes que no se alcanzaron a enviar se desmarcan para
+   reintentarlos en el próximo ciclo; los ya enviados de un lote que falla
+   a la mitad quedan marcados y no se repiten.
+
+Los hilos solo hablan con el servidor de correo, nunca con la base de datos,
+y todo corre fuera de los workers web.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Reserva
+
+# Anticipación con que se avisa el inicio o el término de una reserva
+VENTANA_RECORDATORIO = timedelta(minutes=15)
+
+# Campo que registra el envío de cada tipo de recordatorio
+CAMPOS_ENVIADO = {
+    'inicio': 'recordatorio_inicio_enviado',
+    'fin': 'recordatorio_fin_enviado',
+}
+
+
+def reclamar_pendientes(ahora, ventana=VENTANA_RECORDATORIO, limite=None):
+    """
+    Busca los recordatorios pendientes y los marca como enviados en una sola
+    transacción. Retorna una lista de (tipo, fila) con las reservas como
+    diccionarios (sin cargar instancias del modelo).
+    """
+    hasta = ahora + ventana
+    condicion = (
+        Q(fecha_hora_inicio__gt=ahora, fecha_hora_inicio__lte=hasta, recordatorio_inicio_enviado__isnull=True)
+        | Q(fecha_hora_fin__gt=ahora, fecha_hora_fin__lte=hasta, recordatorio_fin_enviado__isnull=True)
+    )
+    reservas = (
+        Reserva.objects.filter(condicion, estado='activa')
+        .exclude(email='')
+        .order_by()
+        .select_for_update(skip_locked=True, of=('self',))
+        .values(
+            'pk', 'email', 'nombre_reservante', 'sala__nombre', 'fecha_hora_inicio', 'fecha_hora_fin',
+            'recordatorio_inicio_enviado', 'recordatorio_fin_enviado',
+        )
+    )
+    if limite:
+        reservas = reservas[:limite]
+
+    with transaction.atomic(using=Reserva.objects.db):
+        filas = list(reservas)
+        pendientes = []
+        for fila in filas:
+            if fila['recordatorio_inicio_enviado'] is None and ahora < fila['fecha_hora_inicio'] <= hasta:
+                pendientes.append(('inicio', fila))
+            if fila['recordatorio_fin_enviado'] is None and ahora < fila['fecha_hora_fin'] <= hasta:
+                pendientes.append(('fin', fila))
+        marcar(pendientes, ahora)
+    return pendientes
+
+
+def marcar(pendientes, valor):
+    """
+    Guarda 'valor' (fecha de envío, o None para reintentar) en el campo de
+    cada recordatorio: un UPDATE por tipo
+    """
+    for tipo, campo in CAMPOS_ENVIADO.items():
+        ids = [fila['pk'] for tipo_fila, fila in pendientes if tipo_fila == tipo]
+        if ids:
+            Reserva.objects.filter(pk__in=ids).update(**{campo: valor})
+
+
+def construir_mensaje(tipo, fila):
+    inicio = timezone.localtime(fila['fecha_hora_inicio'])
+    fin = timezone.localtime(fila['fecha_hora_fin'])
+    sala = fila['sala__nombre']
+    if tipo == 'inicio':
+        asunto = f'Tu reserva de {sala} comienza a las {inicio:%H:%M}'
+        cuerpo = f'Hola {fila["nombre_reservante"]}, tu reserva de {sala} es de {inicio:%H:%M} a {fin:%H:%M}.'
+    else:
+        asunto = f'Tu reserva de {sala} termina a las {fin:%H:%M}'
+        cuerpo = (
+            f'Hola {fila["nombre_reservante"]}, tu reserva de {sala} termina a las {fin:%H:%M}. '
+            'Por favor deja la sala ordenada para el siguiente grupo.'
+        )
+    return EmailMessage(asunto, cuerpo, settings.DEFAULT_FROM_EMAIL, [fila['email']])
+
+
+def _enviar_lote(lote):
+    """
+    Envía un lote por una sola conexión, un mensaje a la vez. Al primer
+    error se deja de enviar. Retorna (enviados, fallidos): los fallidos son
+    el mensaje que falló y los que no se alcanzaron a enviar.
+    """
+    enviados = 0
+    try:
+        with get_connection() as conexion:
+            for tipo, fila in lote:
+                conexion.send_messages([construir_mensaje(tipo, fila)])
+                enviados += 1
+    except Exception:
+        pass
+    return lote[:enviados], lote[enviados:]
+
+
+def enviar(pendientes, hilos=4, tamano_lote=100):
+    """
+    Envía los recordatorios en paralelo, 'tamano_lote' mensajes por conexión.
+    Retorna (enviados, fallidos) como listas de (tipo, fila).
+    """
+    lotes = [pendientes[i:i + tamano_lote] for i in range(0, len(pendientes), tamano_lote)]
+    enviados, fallidos = [], []
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for enviados_lote, fallidos_lote in pool.map(_enviar_lote, lotes):
+            enviados.extend(enviados_lote)
+            fallidos.extend(fallidos_lote)
+    return enviados, fallidos
+
+
+def procesar(ahora=None, ventana=VENTANA_RECORDATORIO, hilos=4, tamano_lote=100, limite=None):
+    """
+    Un ciclo completo: reclamar, enviar y desmarcar los que fallaron.
+    Retorna (enviados, fallidos).
+    """
+    ahora = ahora or timezone.now()
+    pendientes = reclamar_pendientes(ahora, ventana, limite)
+    if not pendientes:
+        return 0, 0
+
+    enviados, fallidos = enviar(pendientes, hilos, tamano_lote)
+    if fallidos:
+        marcar(fallidos, None)
+    return len(enviados), len(fallidos)
@@ -0,0 +1,163 @@
+"""
+Sedes (sucursales de la biblioteca) y reparto de sus datos entre bases de datos.
+
+El catálogo de sedes vive siempre en la base 'default'. Cada sede indica en
+'base_datos' el alias (de settings.DATABASES) donde se guardan sus salas,
+reservas y mapas de disponibilidad, así cada sede se puede mover a su propio
+nodo sin cambiar el código. Varias sedes pueden compartir una misma base.
+
+La sede de la petición la fija SedeMiddleware (ver middleware.py) y
+RouterSedes envía las consultas a la base de esa sede. Fuera de una petición
+(comandos, scripts) se usa 'default': para leer o escribir datos de una sede
+con base propia, el código debe ir dentro de usar_sede(sede). Los comandos
+reciben la sede con --sede (ver sede_de_opcion).
+
+El catálogo de sedes se cachea por TIEMPO_CACHE_SEDES segundos. Con la cache
+local por proceso (locmem, por defecto) invalidar_sedes() solo limpia la del
+proceso que guardó la sede: los demás workers ven el cambio al vencer ese
+tiempo. Con una cache compartida (CACHE_URL, ver settings) se ve de inmediato.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+# Código de la sede que se usa cuando no se indica ninguna
+CODIGO_PRINCIPAL = 'principal'
+
+# Clave de sesión con el código de la sede elegida por el usuario
+CLAVE_SESION = 'sede'
+
+_CLAVE_CACHE = 'salas:sedes'
+
+# Segundos que se guarda el catálogo de sedes en la cache (ver arriba)
+TIEMPO_CACHE_SEDES = 60
+
+# Modelos que viven siempre en 'default': el catálogo de sedes y la cola de
+# trabajos (una sola cola para todas las sedes)
+MODELOS_DEFAULT = ('sede', 'trabajo')
+
+_sede_actual = contextvars.ContextVar('sede_actual', default=None)
+
+
+def sede_actual():
+    """
+    Sede de la petición o bloque usar_sede() en curso (None si no hay)
+    """
+    return _sede_actual.get()
+
+
+@contextmanager
+def usar_sede(sede):
+    """
+    Dirige a la base de datos de 'sede' todas las consultas del bloque:
+
+        with usar_sede(Sede.objects.get(codigo='norte')):
+            Sala.objects.count()
+    """
+    token = _sede_actual.set(sede)
+    try:
+        yield sede
+    finally:
+        _sede_actual.reset(token)
+
+
+def sedes_por_codigo():
+    """
+    Retorna {codigo: Sede} con todas las sedes. Se cachea (el catálogo casi
+    no cambia) para no agregar una consulta a cada petición.
+    """
+    sedes = cache.get(_CLAVE_CACHE)
+    if sedes is None:
+        from .models import Sede
+        sedes = {sede.codigo: sede for sede in Sede.objects.all()}
+        cache.set(_CLAVE_CACHE, sedes, TIEMPO_CACHE_SEDES)
+    return sedes
+
+
+def invalidar_sedes():
+    cache.delete(_CLAVE_CACHE)
+
+
+def obtener_sede(codigo=None):
+    """
+    Retorna la sede con el código indicado o None si no existe. Sin código
+    retorna la sede principal (se crea si no existe).
+    """
+    if codigo:
+        return sedes_por_codigo().get(codigo)
+
+    sede = sedes_por_codigo().get(CODIGO_PRINCIPAL)
+    if sede is None:
+        from .models import Sede
+        sede, _ = Sede.objects.get_or_create(codigo=CODIGO_PRINCIPAL, defaults={'nombre': 'Sede Principal'})
+    return sede
+
+
+def sede_de_opcion(codigo, principal=False):
+    """
+    Sede de la opción --sede de un comando. Sin código retorna None (la base
+    'default') o, con principal=True, la sede principal. Lanza CommandError
+    si no existe.
+    """
+    if not codigo:
+        return obtener_sede() if principal else None
+    sede = obtener_sede(codigo)
+    if sede is None:
+        raise CommandError(f'No existe la sede "{codigo}".')
+    return sede
+
+
+def bases_de_datos():
+    """
+    Alias de todas las bases de datos con datos de sedes ('default' primero)
+    """
+    alias = {sede.base_datos for sede in sedes_por_codigo().values()} - {DEFAULT_DB_ALIAS}
+    return [DEFAULT_DB_ALIAS, *sorted(alias)]
+
+
+class RouterSedes:
+    """
+    Router de base de datos: Sede y Trabajo van siempre a 'default' y el resto
+    de los modelos de la app va a la base de la sede. La sede se toma de la
+    instancia (una sala nueva va a la base de su sede, una reserva a la de
+    su sala) o, para consultas sin instancia, de la sede en curso.
+    Los modelos de otras apps (usuarios, sesiones) quedan en 'default'.
+    """
+
+    def _base_datos(self, model, instance=None):
+        if model._meta.app_label != 'salas':
+            return None
+        if model._meta.model_name in MODELOS_DEFAULT:
+            return DEFAULT_DB_ALIAS
+        if instance is not None:
+            if instance._meta.model_name == 'sede':
+                return instance.base_datos
+            if instance._state.db:
+                return instance._state.db
+        sede = sede_actual()
+        return sede.base_datos if sede else None
+
+    def db_for_read(self, model, **hints):
+        return self._base_datos(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._base_datos(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las salas apuntan a su sede aunque estén en otra base de datos
+        if 'sede' in (obj1._meta.model_name, obj2._meta.model_name):
+            return True
+        return None
+
+
+def contexto_sedes(request):
+    """
+    Context processor: sede actual y lista de sedes para el selector del menú
+    """
+    return {
+        'sede_actual': getattr(request, 'sede', None),
+        'sedes': sorted(sedes_por_codigo().values(), key=lambda sede: sede.nombre),
+    }
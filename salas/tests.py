@@ -1,10 +1,38 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta
-from .models import Sala, Reserva, validar_rut
+from datetime import datetime, timedelta
+from io import StringIO
+import gzip
+import json
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+from .models import Sede, Sala, Reserva, ConflictoReserva, DisponibilidadDiaria, EventoCambio, Trabajo, TrabajoInterrumpido, bloquear_ruts, validar_rut
+from .disponibilidad import mascaras_por_dia
+from .busqueda import buscar_reservas
+from .busqueda_salas import buscar_salas_libres, primer_hueco
+from .paginacion import PaginadorEstimado, estimar_filas
+from .sedes import obtener_sede, usar_sede
+from .eventos import leer_eventos, ultimo_evento
+from .recordatorios import procesar
+from .estaticos import servir_estatico
+from .perfilador import listar_perfiles
+from .consultas_lentas import listar_consultas, normalizar, registrando_consultas
+from .instantaneas import actualizar
+from .trabajos import encolar
+from django.contrib.staticfiles.storage import staticfiles_storage
+from .analitica import calcular_mapa_ocupacion, ocupacion_por_hora, ocupacion_por_hora_ingenua
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import Http404
+from django.core.management import call_command, CommandError
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection, router, transaction
+from django.test.utils import CaptureQueriesContext
 
 
 class ValidacionRUTTestCase(TestCase):
@@ -399,3 +427,1897 @@ class IntegracionTestCase(TestCase):
         
         # 6. Verificar que vuelve a estar disponible
         self.assertTrue(sala.esta_disponible())
+
+
+class BusquedaReservasTestCase(TestCase):
+    """
+    Tests para la búsqueda de reservas del panel de administración
+    """
+    
+    def setUp(self):
+        """Configuración inicial"""
+        self.client = Client()
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.sala = Sala.objects.create(nombre='Sala Búsqueda', capacidad=6, habilitada=True)
+        
+        ahora = timezone.now()
+        self.reserva_juan = Reserva.objects.create(
+            sala=self.sala,
+            rut='12345678-5',
+            nombre_reservante='Juan Pérez',
+            fecha_hora_inicio=ahora,
+            fecha_hora_fin=ahora + timedelta(hours=2),
+        )
+        self.reserva_carlos = Reserva.objects.create(
+            sala=self.sala,
+            rut='9015074-K',
+            nombre_reservante='Carlos Ramírez',
+            fecha_hora_inicio=ahora - timedelta(days=10),
+            fecha_hora_fin=ahora - timedelta(days=10) + timedelta(hours=2),
+            estado='finalizada'
+        )
+    
+    def test_buscar_por_prefijo_rut(self):
+        """Test para buscar reservas por prefijo del RUT (con o sin puntos)"""
+        resultado = buscar_reservas(Reserva.objects.all(), '12.345')
+        self.assertEqual(list(resultado), [self.reserva_juan])
+    
+    def test_buscar_rut_completo_sin_guion(self):
+        """Test para buscar un RUT completo escrito sin guión"""
+        resultado = buscar_reservas(Reserva.objects.all(), '9015074k')
+        self.assertEqual(list(resultado), [self.reserva_carlos])
+    
+    def test_buscar_por_nombre(self):
+        """Test para buscar reservas por parte del nombre sin distinguir mayúsculas"""
+        resultado = buscar_reservas(Reserva.objects.all(), 'ramír')
+        self.assertEqual(list(resultado), [self.reserva_carlos])
+    
+    def test_buscar_por_rango_de_fechas(self):
+        """Test para filtrar reservas por rango de fechas de inicio"""
+        hoy = timezone.localdate()
+        resultado = buscar_reservas(Reserva.objects.all(), desde=hoy - timedelta(days=1))
+        self.assertEqual(list(resultado), [self.reserva_juan])
+    
+    def test_busqueda_desde_panel(self):
+        """Test para verificar el buscador de la vista admin_reservas"""
+        self.client.login(username='admin', password='admin123')
+        response = self.client.get(reverse('admin_reservas'), {'q': 'juan'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Juan Pérez')
+        self.assertNotContains(response, 'Carlos Ramírez')
+
+
+class HistorialReservasTestCase(TestCase):
+    """
+    Tests para el historial paginado y cacheado de mis_reservas
+    """
+    
+    def setUp(self):
+        """Configuración inicial"""
+        cache.clear()
+        self.client = Client()
+        self.sala = Sala.objects.create(nombre='Sala Historial', capacidad=4, habilitada=True)
+        
+        # 25 reservas pasadas del mismo RUT
+        inicio = timezone.now() - timedelta(days=30)
+        for i in range(25):
+            Reserva.objects.create(
+                sala=self.sala,
+                rut='11111111-1',
+                nombre_reservante=f'Usuario {i}',
+                fecha_hora_inicio=inicio + timedelta(days=i),
+                fecha_hora_fin=inicio + timedelta(days=i, hours=2),
+                estado='finalizada'
+            )
+    
+    def test_historial_paginado(self):
+        """Test para verificar que el historial se muestra por páginas"""
+        response = self.client.get(reverse('mis_reservas'), {'rut': '11.111.111-1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['reservas']), 20)
+        self.assertEqual(response.context['page_obj'].paginator.count, 25)
+        # La página 1 muestra las reservas más recientes
+        self.assertContains(response, 'Usuario 24')
+        
+        response = self.client.get(reverse('mis_reservas'), {'rut': '11111111-1', 'page': 2})
+        self.assertEqual(len(response.context['reservas']), 5)
+        self.assertContains(response, 'Usuario 0')
+    
+    def test_historial_cacheado(self):
+        """Test para verificar que la segunda consulta no toca la base de datos"""
+        self.client.get(reverse('mis_reservas'), {'rut': '11111111-1'})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('mis_reservas'), {'rut': '11111111-1'})
+        self.assertEqual(len(response.context['reservas']), 20)
+    
+    def test_historial_invalidado_al_reservar(self):
+        """Test para verificar que una nueva reserva invalida el historial cacheado"""
+        self.client.get(reverse('mis_reservas'), {'rut': '11111111-1'})
+        
+        self.client.post(reverse('crear_reserva', args=[self.sala.id]), {
+            'sala': self.sala.id,
+            'rut': '11111111-1',
+            'nombre_reservante': 'Reserva Nueva'
+        })
+        
+        response = self.client.get(reverse('mis_reservas'), {'rut': '11111111-1'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 26)
+        self.assertContains(response, 'Reserva Nueva')
+    
+    def test_rut_invalido(self):
+        """Test para verificar que un RUT inválido no realiza la búsqueda"""
+        response = self.client.get(reverse('mis_reservas'), {'rut': '12345678-0'})
+        self.assertIsNone(response.context['page_obj'])
+
+
+class OcupacionTestCase(TestCase):
+    """
+    Tests para el mapa de ocupación por sala y hora de la semana
+    """
+    
+    def setUp(self):
+        """Configuración inicial"""
+        cache.clear()
+        self.client = Client()
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.sala = Sala.objects.create(nombre='Sala Ocupación', capacidad=6, habilitada=True)
+    
+    def test_vectorizado_igual_a_bucle(self):
+        """Test para verificar que el cálculo vectorizado coincide con el bucle ingenuo"""
+        desde = 0.0
+        hasta = 48 * 3600.0
+        salas_idx = [0, 0, 1, 1]
+        inicios = [-1800.0, 5400.0, 3600.0 * 10, 3600.0 * 47.5]
+        fines = [3600.0, 5400.0 + 7200, 3600.0 * 12, 3600.0 * 50]
+        
+        vectorizado = ocupacion_por_hora(salas_idx, inicios, fines, 2, desde, hasta)
+        ingenuo = ocupacion_por_hora_ingenua(salas_idx, inicios, fines, 2, desde, hasta)
+        
+        self.assertTrue(np.allclose(vectorizado, ingenuo))
+        self.assertAlmostEqual(vectorizado[0, 0], 1.0)
+        self.assertAlmostEqual(vectorizado[0, 1], 0.5)
+        self.assertAlmostEqual(vectorizado[1, 47], 0.5)
+    
+    def test_mapa_por_hora_de_la_semana(self):
+        """Test para verificar la utilización de una reserva el lunes de 10:00 a 12:00"""
+        lunes = timezone.make_aware(datetime(2025, 3, 3, 10, 0))
+        Reserva.objects.create(
+            sala=self.sala,
+            rut='11111111-1',
+            nombre_reservante='Test User',
+            fecha_hora_inicio=lunes,
+            fecha_hora_fin=lunes + timedelta(hours=2),
+            estado='finalizada'
+        )
+        # Las canceladas no cuentan
+        Reserva.objects.create(
+            sala=self.sala,
+            rut='12345678-5',
+            nombre_reservante='Test User',
+            fecha_hora_inicio=lunes + timedelta(hours=4),
+            fecha_hora_fin=lunes + timedelta(hours=6),
+            estado='cancelada'
+        )
+        
+        # Dos semanas: la casilla del lunes 10:00 aparece dos veces
+        desde = timezone.make_aware(datetime(2025, 3, 3))
+        salas, utilizacion = calcular_mapa_ocupacion(desde, desde + timedelta(days=14))
+        
+        self.assertEqual(salas, [(self.sala.id, 'Sala Ocupación')])
+        self.assertAlmostEqual(utilizacion[0, 10], 0.5)
+        self.assertAlmostEqual(utilizacion[0, 11], 0.5)
+        self.assertAlmostEqual(utilizacion[0, 14], 0.0)
+        self.assertAlmostEqual(utilizacion.sum(), 1.0)
+    
+    def test_vista_ocupacion(self):
+        """Test para verificar que la vista del mapa de ocupación funciona"""
+        self.client.login(username='admin', password='admin123')
+        response = self.client.get(reverse('admin_ocupacion'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Sala Ocupación')
+
+
+class AccionesMasivasTestCase(TestCase):
+    """
+    Tests para las acciones masivas sobre reservas
+    """
+    
+    def setUp(self):
+        """Configuración inicial"""
+        cache.clear()
+        self.client = Client()
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.client.login(username='admin', password='admin123')
+        
+        ahora = timezone.now()
+        self.reservas = []
+        for i, rut in enumerate(['11111111-1', '12345678-5', '9015074-K']):
+            sala = Sala.objects.create(nombre=f'Sala Masiva {i}', capacidad=4, habilitada=True)
+            self.reservas.append(Reserva.objects.create(
+                sala=sala,
+                rut=rut,
+                nombre_reservante=f'Usuario {i}',
+                fecha_hora_inicio=ahora,
+                fecha_hora_fin=ahora + timedelta(hours=2),
+            ))
+        
+        # Una de ellas ya estaba cancelada
+        self.reservas[2].estado = 'cancelada'
+        self.reservas[2].save(update_fields=['estado'])
+    
+    def test_finalizar_masivo(self):
+        """Test para finalizar varias reservas; las canceladas no se modifican"""
+        response = self.client.post(reverse('admin_reservas_masivo'), {
+            'accion': 'finalizar',
+            'reservas': [r.id for r in self.reservas],
+        })
+        self.assertEqual(response.status_code, 302)
+        
+        estados = list(Reserva.objects.order_by('pk').values_list('estado', flat=True))
+        self.assertEqual(estados, ['finalizada', 'finalizada', 'cancelada'])
+    
+    def test_cancelar_masivo_reporta_cantidad(self):
+        """Test para cancelar varias reservas e informar cuántas cambiaron"""
+        response = self.client.post(reverse('admin_reservas_masivo'), {
+            'accion': 'cancelar',
+            'reservas': [r.id for r in self.reservas],
+        }, follow=True)
+        self.assertContains(response, '2 reserva(s) cancelada(s)')
+        self.assertEqual(Reserva.objects.filter(estado='cancelada').count(), 3)
+    
+    def test_eliminar_masivo(self):
+        """Test para eliminar varias reservas en una sola acción"""
+        self.client.post(reverse('admin_reservas_masivo'), {
+            'accion': 'eliminar',
+            'reservas': [self.reservas[0].id, self.reservas[1].id],
+        })
+        self.assertEqual(list(Reserva.objects.all()), [self.reservas[2]])
+    
+    def test_actualizacion_en_una_consulta(self):
+        """Test para verificar que la transición usa un solo UPDATE"""
+        # SAVEPOINT, 1 SELECT de las reservas afectadas (bloqueadas), 1 UPDATE,
+        # bloqueo de las salas y 1 UPDATE de su ocupación guardada; la
+        # reconstrucción de los mapas de disponibilidad (SAVEPOINT, bloqueo de
+        # los días, SELECT de las reservas activas, DELETE de los días libres y
+        # RELEASE); al final 1 INSERT de los eventos del outbox y RELEASE
+        # (la misma cantidad sin importar cuántas reservas sean)
+        with self.assertNumQueries(12):
+            cantidad = Reserva.objects.all().finalizar()
+        self.assertEqual(cantidad, 2)
+
+
+class EliminacionSalaTestCase(TestCase):
+    """
+    Tests para el soft-delete de salas y la purga en segundo plano
+    """
+    
+    def setUp(self):
+        """Configuración inicial"""
+        self.client = Client()
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.sala = Sala.objects.create(nombre='Sala Antigua', capacidad=8, habilitada=True)
+        
+        # Historial de reservas pasadas y una reserva vigente
+        ahora = timezone.now()
+        for i in range(5):
+            inicio = ahora - timedelta(days=i + 1)
+            Reserva.objects.create(
+                sala=self.sala,
+                rut='11111111-1',
+                nombre_reservante='Historial',
+                fecha_hora_inicio=inicio,
+                fecha_hora_fin=inicio + timedelta(hours=2),
+                estado='finalizada'
+            )
+        self.vigente = Reserva.objects.create(
+            sala=self.sala,
+            rut='12345678-5',
+            nombre_reservante='Vigente',
+            fecha_hora_inicio=ahora,
+            fecha_hora_fin=ahora + timedelta(hours=2),
+        )
+    
+    def test_eliminar_oculta_la_sala(self):
+        """Test para verificar que la sala se oculta sin borrar sus reservas en la petición"""
+        self.client.login(username='admin', password='admin123')
+        self.client.post(reverse('admin_eliminar_sala', args=[self.sala.id]))
+        
+        self.assertFalse(Sala.objects.filter(pk=self.sala.pk).exists())
+        self.assertTrue(Sala.todas.filter(pk=self.sala.pk, eliminada=True).exists())
+        self.assertEqual(Reserva.objects.filter(sala_id=self.sala.pk).count(), 6)
+        
+        # La reserva vigente queda cancelada y la sala no aparece en el listado
+        self.vigente.refresh_from_db()
+        self.assertEqual(self.vigente.estado, 'cancelada')
+        response = self.client.get(reverse('lista_salas'))
+        self.assertEqual(list(response.context['salas']), [])
+    
+    def test_nombre_reutilizable(self):
+        """Test para verificar que se puede crear otra sala con el nombre de una eliminada"""
+        self.sala.eliminar()
+        Sala.objects.create(nombre='Sala Antigua', capacidad=4, habilitada=True)
+        self.assertEqual(Sala.todas.filter(nombre='Sala Antigua').count(), 2)
+    
+    def test_purgar_salas_en_lotes(self):
+        """Test para verificar que el comando borra el historial en lotes y luego la sala"""
+        self.sala.eliminar()
+        salida = StringIO()
+        call_command('purgar_salas', lote=2, stdout=salida)
+        
+        self.assertFalse(Sala.todas.filter(pk=self.sala.pk).exists())
+        self.assertEqual(Reserva.objects.count(), 0)
+        self.assertIn('6 reservas borradas', salida.getvalue())
+        self.assertEqual(EventoCambio.objects.filter(modelo='reserva', accion='eliminada').count(), 6)
+        self.assertTrue(EventoCambio.objects.filter(modelo='sala', objeto_id=self.sala.pk, accion='eliminada').exists())
+
+
+class LimpiarDatosTestCase(TestCase):
+    """
+    Tests para el comando limpiar_datos
+    """
+    
+    def setUp(self):
+        """Configuración inicial"""
+        self.sala_a = Sala.objects.create(nombre='Sala A', capacidad=4, habilitada=True)
+        self.sala_b = Sala.objects.create(nombre='Sala B', capacidad=8, habilitada=True)
+        User.objects.create_user(username='alumno', password='alumno123')
+        User.objects.create_superuser(username='admin', password='admin123')
+        
+        ahora = timezone.now()
+        for i, sala in enumerate([self.sala_a, self.sala_b, self.sala_a]):
+            inicio = ahora - timedelta(days=10 * i)
+            Reserva.objects.create(
+                sala=sala,
+                rut='11111111-1',
+                nombre_reservante=f'Usuario {i}',
+                fecha_hora_inicio=inicio,
+                fecha_hora_fin=inicio + timedelta(hours=2),
+                estado='finalizada'
+            )
+    
+    def test_dry_run_no_borra(self):
+        """Test para verificar que --dry-run solo muestra los conteos"""
+        salida = StringIO()
+        call_command('limpiar_datos', dry_run=True, interactive=False, stdout=salida)
+        self.assertIn('3 reservas', salida.getvalue())
+        self.assertEqual(Reserva.objects.count(), 3)
+    
+    def test_limpieza_total(self):
+        """Test para verificar la limpieza total en lotes"""
+        call_command('limpiar_datos', lote=2, interactive=False, stdout=StringIO())
+        self.assertEqual(Reserva.objects.count(), 0)
+        self.assertEqual(Sala.todas.count(), 0)
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['admin'])
+    
+    def test_limpieza_por_sala(self):
+        """Test para borrar solo las reservas de una sala"""
+        call_command('limpiar_datos', sala=['Sala A'], interactive=False, stdout=StringIO())
+        self.assertEqual(list(Reserva.objects.values_list('sala_id', flat=True)), [self.sala_b.id])
+        self.assertEqual(Sala.objects.count(), 2)
+        self.assertEqual(User.objects.count(), 2)
+    
+    def test_limpieza_por_fechas(self):
+        """Test para borrar solo las reservas de un rango de fechas"""
+        hoy = timezone.localdate()
+        desde = (hoy - timedelta(days=15)).isoformat()
+        call_command('limpiar_datos', '--desde', desde, '--noinput', stdout=StringIO())
+        self.assertEqual(Reserva.objects.count(), 1)
+    
+    def test_limpieza_acotada_mantiene_puestos_mapas_y_eventos(self):
+        """Test para verificar que el borrado acotado devuelve puestos, limpia los mapas y publica eventos"""
+        conferencias = Sala.objects.create(nombre='Sala C', capacidad=2, por_puestos=True)
+        Reserva.objects.create(sala=conferencias, rut='22222222-2', nombre_reservante='Ana Soto')
+        vigente = Reserva.objects.create(sala=self.sala_b, rut='33333333-3', nombre_reservante='Luis Rojas')
+        
+        call_command('limpiar_datos', sala=['Sala B', 'Sala C'], lote=1, interactive=False, stdout=StringIO())
+        self.assertEqual(Reserva.objects.filter(sala__in=[self.sala_b, conferencias]).count(), 0)
+        conferencias.refresh_from_db()
+        self.assertEqual(conferencias.puestos_ocupados, 0)
+        self.assertTrue(DisponibilidadDiaria.objects.libre(self.sala_b.pk, vigente.fecha_hora_inicio, vigente.fecha_hora_fin))
+        self.assertEqual(EventoCambio.objects.filter(modelo='reserva', accion='eliminada').count(), 3)
+        self.assertTrue(Sala.objects.get(pk=self.sala_b.pk).esta_disponible())
+
+
+class GenerarDatosTestCase(TestCase):
+    """Tests para el generador de datos sintéticos"""
+    
+    def generar(self, **opciones):
+        opciones = {
+            'salas': 3, 'reservas': 120, 'ruts': 30, 'dias': 20, 'dias_futuros': 5,
+            'fecha_referencia': datetime(2025, 3, 10).date(), 'stdout': StringIO(),
+            **opciones
+        }
+        call_command('generar_datos', **opciones)
+        return list(
+            Reserva.objects.order_by('sala__nombre', 'fecha_hora_inicio')
+            .values_list('sala__nombre', 'rut', 'fecha_hora_inicio', 'estado')
+        )
+    
+    def test_genera_cantidades_pedidas(self):
+        """Test para verificar la cantidad de salas y reservas generadas"""
+        self.generar()
+        self.assertEqual(Sala.objects.count(), 3)
+        self.assertEqual(Reserva.objects.count(), 120)
+    
+    def test_publica_eventos_de_creacion(self):
+        """Test para verificar que las inserciones masivas llegan al outbox"""
+        self.generar()
+        creadas = EventoCambio.objects.filter(accion='creada')
+        self.assertEqual(creadas.filter(modelo='sala').count(), 3)
+        self.assertEqual(creadas.filter(modelo='reserva').count(), 120)
+    
+    def test_es_determinista(self):
+        """Test para verificar que la misma semilla genera los mismos datos"""
+        primera = self.generar(semilla=7)
+        Reserva.objects.all().delete()
+        Sala.todas.all().delete()
+        self.assertEqual(self.generar(semilla=7), primera)
+    
+    def test_ruts_validos(self):
+        """Test para verificar que todos los RUT generados son válidos"""
+        self.generar()
+        for rut in Reserva.objects.values_list('rut', flat=True).distinct():
+            self.assertTrue(validar_rut(rut), rut)
+    
+    def test_sin_traslapes_y_una_activa_por_rut(self):
+        """Test para verificar horarios sin traslape y una reserva activa por RUT"""
+        self.generar(reservas=300, ruts=10)
+        for sala in Sala.objects.all():
+            reservas = list(sala.reservas.order_by('fecha_hora_inicio'))
+            for anterior, siguiente in zip(reservas, reservas[1:]):
+                self.assertLessEqual(anterior.fecha_hora_fin, siguiente.fecha_hora_inicio)
+        
+        activas = list(Reserva.objects.filter(estado='activa').values_list('rut', flat=True))
+        self.assertEqual(len(activas), len(set(activas)))
+        self.assertGreater(len(activas), 0)
+    
+    def test_rechaza_mas_reservas_que_cupos(self):
+        """Test para verificar el error cuando las reservas no caben en el período"""
+        with self.assertRaises(CommandError):
+            self.generar(reservas=10000)
+
+
+class ConcurrenciaReservaTestCase(TestCase):
+    """Tests para los cambios de estado con control de concurrencia optimista"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.sala = Sala.objects.create(nombre='Sala Test', capacidad=4, habilitada=True)
+        self.reserva = Reserva.objects.create(
+            sala=self.sala,
+            rut='12345678-5',
+            nombre_reservante='Juan Pérez'
+        )
+    
+    def test_transicion_incrementa_version(self):
+        """Test para verificar que cancelar incrementa la versión"""
+        self.reserva.cancelar()
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.estado, 'cancelada')
+        self.assertEqual(self.reserva.version, 1)
+    
+    def test_version_obsoleta_genera_conflicto(self):
+        """Test para verificar que una copia obsoleta no pisa otro cambio"""
+        copia = Reserva.objects.get(pk=self.reserva.pk)
+        self.reserva.finalizar()
+        
+        with self.assertRaisesMessage(ConflictoReserva, 'ya fue finalizada'):
+            copia.cancelar()
+        self.assertEqual(Reserva.objects.get(pk=self.reserva.pk).estado, 'finalizada')
+    
+    def test_cancelar_con_version_obsoleta_muestra_conflicto(self):
+        """Test para verificar la respuesta de la vista ante un conflicto"""
+        Reserva.objects.filter(pk=self.reserva.pk).finalizar()
+        
+        response = self.client.post(
+            reverse('cancelar_reserva', args=[self.reserva.id]),
+            {'version': 0},
+            follow=True
+        )
+        self.assertContains(response, 'ya fue finalizada')
+        self.assertEqual(Reserva.objects.get(pk=self.reserva.pk).estado, 'finalizada')
+    
+    def test_finalizar_admin_con_version_obsoleta(self):
+        """Test para verificar que el admin no finaliza una reserva ya cancelada"""
+        self.client.login(username='admin', password='admin123')
+        self.reserva.cancelar()
+        
+        response = self.client.post(
+            reverse('admin_finalizar_reserva', args=[self.reserva.id]),
+            {'version': 0},
+            follow=True
+        )
+        self.assertContains(response, 'ya fue cancelada')
+        self.assertEqual(Reserva.objects.get(pk=self.reserva.pk).estado, 'cancelada')
+    
+    def test_traslape_se_confirma_con_la_sala_bloqueada(self):
+        """Test para verificar que save() repite la validación de horario bajo el bloqueo de la sala"""
+        # Simula otra reserva confirmada entre clean() y el guardado
+        with mock.patch.object(Sala, 'libre_entre', return_value=True):
+            with self.assertRaisesMessage(ValidationError, 'ya está reservada'):
+                Reserva.objects.create(
+                    sala=self.sala,
+                    rut='11111111-1',
+                    nombre_reservante='María González',
+                    fecha_hora_inicio=self.reserva.fecha_hora_inicio,
+                    fecha_hora_fin=self.reserva.fecha_hora_fin
+                )
+        self.assertEqual(Reserva.objects.filter(sala=self.sala).count(), 1)
+    
+    def test_rut_se_confirma_con_el_rut_bloqueado(self):
+        """Test para verificar que save() repite la regla de una reserva activa por RUT"""
+        otra_sala = Sala.objects.create(nombre='Otra Sala', capacidad=4, habilitada=True)
+        # Simula que clean() pasó antes de que se confirmara la otra reserva del RUT
+        with mock.patch.object(Reserva, 'clean'):
+            with self.assertRaisesMessage(ValidationError, 'ya tiene una reserva activa'):
+                Reserva.objects.create(sala=otra_sala, rut='12345678-5', nombre_reservante='Juan Pérez')
+        self.assertFalse(otra_sala.reservas.exists())
+    
+    def test_bloquear_ruts_en_postgresql(self):
+        """Test para verificar los advisory locks por RUT, en orden y sin repetir"""
+        conexion = mock.MagicMock(vendor='postgresql')
+        with mock.patch('salas.models.connections', {'default': conexion}):
+            bloquear_ruts(['2-7', '1-9', '2-7'], using='default')
+        cursor = conexion.cursor.return_value.__enter__.return_value
+        self.assertEqual(
+            cursor.execute.call_args_list,
+            [mock.call('SELECT pg_advisory_xact_lock(hashtext(%s))', [rut]) for rut in ('1-9', '2-7')]
+        )
+
+
+class AdminReservaTestCase(TestCase):
+    """Tests para la lista de reservas del admin de Django"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_superuser(username='admin', password='admin123')
+        self.client.login(username='admin', password='admin123')
+        self.sala_a = Sala.objects.create(nombre='Sala A', capacidad=4)
+        self.sala_b = Sala.objects.create(nombre='Sala B', capacidad=8)
+        
+        ahora = timezone.now()
+        for i, sala in enumerate([self.sala_a, self.sala_b, self.sala_b]):
+            inicio = ahora - timedelta(days=i + 1)
+            Reserva.objects.create(
+                sala=sala,
+                rut='11111111-1',
+                nombre_reservante=f'Usuario {i}',
+                fecha_hora_inicio=inicio,
+                fecha_hora_fin=inicio + timedelta(hours=2),
+                estado='finalizada'
+            )
+    
+    def test_lista_sin_consultas_por_fila(self):
+        """Test para verificar que la lista no consulta la sala de cada reserva"""
+        url = reverse('admin:salas_reserva_changelist')
+        self.client.get(url)
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'filtro-sala')
+    
+    def test_filtro_por_sala(self):
+        """Test para verificar el filtro por sala con autocompletado"""
+        url = reverse('admin:salas_reserva_changelist')
+        response = self.client.get(url, {'sala__id__exact': self.sala_b.id})
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertContains(response, f'<option value="{self.sala_b.id}" selected>Sala B (Capacidad: 8)</option>', html=True)
+    
+    def test_paginador_cuenta_exacto_fuera_de_postgresql(self):
+        """Test para verificar que el paginador usa COUNT(*) si no puede estimar"""
+        paginador = PaginadorEstimado(Reserva.objects.all(), 2)
+        self.assertIsNone(estimar_filas(Reserva.objects.all()))
+        self.assertEqual(paginador.count, 3)
+        self.assertEqual(paginador.num_pages, 2)
+
+
+class CalendarioTestCase(TestCase):
+    """Tests para los feeds iCalendar por sala y por RUT"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.sala = Sala.objects.create(nombre='Sala Test', capacidad=4, habilitada=True)
+        self.reserva = Reserva.objects.create(
+            sala=self.sala,
+            rut='12345678-5',
+            nombre_reservante='Juan Pérez, estudiante'
+        )
+        self.url_sala = reverse('calendario_sala', args=[self.sala.id])
+        self.url_rut = reverse('calendario_rut', args=['12.345.678-5'])
+    
+    def test_feed_sala(self):
+        """Test para verificar el contenido del calendario de una sala"""
+        response = self.client.get(self.url_sala)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        contenido = response.content.decode()
+        self.assertIn(f'UID:reserva-{self.reserva.id}@testserver', contenido)
+        self.assertIn('SUMMARY:Reservada: Juan Pérez\\, estudiante', contenido)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+    
+    def test_feed_sin_cambios_responde_304_sin_consultas(self):
+        """Test para verificar que un feed sin cambios no consulta la base de datos"""
+        etag = self.client.get(self.url_sala)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url_sala, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+    
+    def test_feed_cambia_al_cancelar(self):
+        """Test para verificar que cancelar una reserva invalida los feeds"""
+        etag_sala = self.client.get(self.url_sala)['ETag']
+        etag_rut = self.client.get(self.url_rut)['ETag']
+        self.reserva.cancelar()
+        
+        response = self.client.get(self.url_sala, HTTP_IF_NONE_MATCH=etag_sala)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(f'reserva-{self.reserva.id}@', response.content.decode())
+        
+        response = self.client.get(self.url_rut, HTTP_IF_NONE_MATCH=etag_rut)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('STATUS:CANCELLED', response.content.decode())
+    
+    def test_feed_inexistente(self):
+        """Test para verificar 404 en salas eliminadas y RUT inválidos"""
+        self.sala.eliminar()
+        self.assertEqual(self.client.get(self.url_sala).status_code, 404)
+        url = reverse('calendario_rut', args=['12345678-9'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class DisponibilidadTestCase(TestCase):
+    """Tests para los mapas de bits de disponibilidad por sala y día"""
+    
+    def setUp(self):
+        self.sala = Sala.objects.create(nombre='Sala Test', capacidad=4, habilitada=True)
+        self.manana = timezone.localdate() + timedelta(days=1)
+        self.inicio = timezone.make_aware(datetime.combine(self.manana, datetime.min.time())) + timedelta(hours=10)
+    
+    def reservar(self, inicio, fin, rut='12345678-5'):
+        return Reserva.objects.create(
+            sala=self.sala,
+            rut=rut,
+            nombre_reservante='Juan Pérez',
+            fecha_hora_inicio=inicio,
+            fecha_hora_fin=fin
+        )
+    
+    def test_mascara_de_un_intervalo(self):
+        """Test para verificar las casillas de 10:00 a 12:00 (40 a 47)"""
+        mascaras = mascaras_por_dia(self.inicio, self.inicio + timedelta(hours=2))
+        self.assertEqual(mascaras, {self.manana: sum(1 << k for k in range(40, 48))})
+    
+    def test_crear_y_cancelar_actualiza_el_mapa(self):
+        """Test para verificar que crear marca casillas y cancelar las libera"""
+        reserva = self.reservar(self.inicio, self.inicio + timedelta(hours=2))
+        dia = DisponibilidadDiaria.objects.get(sala=self.sala, fecha=self.manana)
+        self.assertEqual(dia.mascara, mascaras_por_dia(reserva.fecha_hora_inicio, reserva.fecha_hora_fin)[self.manana])
+        
+        reserva.cancelar()
+        self.assertFalse(DisponibilidadDiaria.objects.filter(sala=self.sala).exists())
+    
+    def test_fallo_del_mapa_revierte_la_reserva(self):
+        """Test para verificar que la reserva y su mapa se escriben en la misma transacción"""
+        with mock.patch.object(type(DisponibilidadDiaria.objects), 'marcar', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.reservar(self.inicio, self.inicio + timedelta(hours=2))
+        self.assertFalse(Reserva.objects.filter(sala=self.sala).exists())
+        self.assertEqual(EventoCambio.objects.filter(modelo='reserva').count(), 0)
+    
+    def test_libre_entre(self):
+        """Test para verificar la disponibilidad con el mapa y la consulta exacta"""
+        self.reservar(self.inicio, self.inicio + timedelta(minutes=5))
+        # Reserva contigua: el mapa basta
+        self.assertTrue(self.sala.libre_entre(self.inicio + timedelta(minutes=15), self.inicio + timedelta(hours=1)))
+        # Misma casilla sin traslape real: se confirma con la consulta exacta
+        self.assertTrue(self.sala.libre_entre(self.inicio + timedelta(minutes=10), self.inicio + timedelta(minutes=14)))
+        self.assertFalse(self.sala.libre_entre(self.inicio, self.inicio + timedelta(hours=1)))
+    
+    def test_no_permite_reservas_traslapadas(self):
+        """Test para verificar que dos reservas de la misma sala no se traslapan"""
+        self.reservar(self.inicio, self.inicio + timedelta(hours=2))
+        with self.assertRaises(ValidationError):
+            self.reservar(self.inicio + timedelta(hours=1), self.inicio + timedelta(hours=3), rut='11111111-1')
+    
+    def test_verificar_y_reparar(self):
+        """Test para verificar el comando que compara y repara los mapas"""
+        Reserva.objects.bulk_create([Reserva(
+            sala=self.sala,
+            rut='12345678-5',
+            nombre_reservante='Juan Pérez',
+            fecha_hora_inicio=self.inicio,
+            fecha_hora_fin=self.inicio + timedelta(hours=2),
+        )])
+        salida = StringIO()
+        call_command('verificar_disponibilidad', stdout=salida)
+        self.assertIn('1 días con casillas sin marcar', salida.getvalue())
+        
+        call_command('verificar_disponibilidad', reparar=True, stdout=StringIO())
+        self.assertFalse(self.sala.libre_entre(self.inicio, self.inicio + timedelta(hours=1)))
+        salida = StringIO()
+        call_command('verificar_disponibilidad', stdout=salida)
+        self.assertIn('coinciden', salida.getvalue())
+
+
+class BuscarSalaTestCase(TestCase):
+    """Tests para la búsqueda de salas libres por capacidad, horario y duración"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.chica = Sala.objects.create(nombre='Sala Chica', capacidad=4, habilitada=True)
+        self.grande = Sala.objects.create(nombre='Sala Grande', capacidad=10, habilitada=True)
+        Sala.objects.create(nombre='Sala Cerrada', capacidad=6, habilitada=False)
+        self.desde = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), datetime.min.time())) + timedelta(hours=10)
+    
+    def reservar(self, sala, inicio, horas=2):
+        Reserva.objects.bulk_create([Reserva(
+            sala=sala,
+            rut='12345678-5',
+            nombre_reservante='Juan Pérez',
+            fecha_hora_inicio=inicio,
+            fecha_hora_fin=inicio + timedelta(hours=horas),
+        )])
+    
+    def test_primer_hueco(self):
+        """Test para verificar el recorrido de las reservas de una sala"""
+        hora = timedelta(hours=1)
+        reservas = [(self.desde, self.desde + hora), (self.desde + 2 * hora, self.desde + 4 * hora)]
+        self.assertEqual(primer_hueco(reservas, self.desde, self.desde + 8 * hora, hora), self.desde + hora)
+        self.assertEqual(primer_hueco(reservas, self.desde, self.desde + 8 * hora, 2 * hora), self.desde + 4 * hora)
+        self.assertIsNone(primer_hueco(reservas, self.desde, self.desde + 3 * hora, 2 * hora))
+    
+    def test_ordena_por_ajuste_y_filtra_capacidad(self):
+        """Test para verificar el orden por ajuste y el filtro de capacidad"""
+        self.reservar(self.chica, self.desde)
+        with self.assertNumQueries(2):
+            resultados = buscar_salas_libres(3, self.desde, self.desde + timedelta(hours=4), timedelta(hours=1))
+        self.assertEqual([sala['nombre'] for sala in resultados], ['Sala Chica', 'Sala Grande'])
+        self.assertEqual(resultados[0]['inicio'], self.desde + timedelta(hours=2))
+        
+        resultados = buscar_salas_libres(8, self.desde, self.desde + timedelta(hours=4), timedelta(hours=1))
+        self.assertEqual([sala['nombre'] for sala in resultados], ['Sala Grande'])
+    
+    def test_vista_buscar_sala(self):
+        """Test para verificar la vista de búsqueda"""
+        self.reservar(self.grande, self.desde - timedelta(hours=1), horas=8)
+        response = self.client.get(reverse('buscar_sala'), {
+            'personas': 5,
+            'fecha': self.desde.date().isoformat(),
+            'desde': '10:00',
+            'hasta': '12:00',
+            'duracion': 60,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'No hay salas libres')
+        
+        response = self.client.get(reverse('buscar_sala'))
+        self.assertEqual(response.status_code, 200)
+
+
+class SedesTestCase(TestCase):
+    """Tests para las sedes y el reparto de sus datos entre bases de datos"""
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = Client()
+        self.principal = obtener_sede()
+        self.norte = Sede.objects.create(nombre='Sede Norte', codigo='norte')
+        self.sala_principal = Sala.objects.create(nombre='Sala Común', capacidad=4, habilitada=True)
+        # El nombre solo es único dentro de cada sede
+        self.sala_norte = Sala.objects.create(sede=self.norte, nombre='Sala Común', capacidad=6, habilitada=True)
+    
+    def test_sala_sin_sede_queda_en_la_sede_en_curso(self):
+        """Test para verificar la sede por defecto de una sala nueva"""
+        self.assertEqual(self.sala_principal.sede, self.principal)
+        with usar_sede(self.norte):
+            sala = Sala.objects.create(nombre='Sala Nueva', capacidad=2)
+        self.assertEqual(sala.sede, self.norte)
+    
+    def test_vistas_filtradas_por_sede(self):
+        """Test para verificar que cada sede ve solo sus salas"""
+        response = self.client.get(reverse('lista_salas'))
+        self.assertEqual(list(response.context['salas']), [self.sala_principal])
+        
+        response = self.client.get(reverse('lista_salas'), {'sede': 'norte'})
+        self.assertEqual(list(response.context['salas']), [self.sala_norte])
+        
+        # Una sala de otra sede no se encuentra
+        response = self.client.get(reverse('detalle_sala', args=[self.sala_norte.id]))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_cambiar_sede(self):
+        """Test para verificar que la sede elegida se recuerda en la sesión"""
+        response = self.client.get(reverse('cambiar_sede', args=['norte']))
+        self.assertRedirects(response, reverse('lista_salas'))
+        
+        response = self.client.get(reverse('detalle_sala', args=[self.sala_norte.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Sede Norte')
+    
+    def test_sede_inexistente(self):
+        """Test para verificar 404 con un código de sede desconocido"""
+        self.assertEqual(self.client.get(reverse('lista_salas'), {'sede': 'sur'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('cambiar_sede', args=['sur'])).status_code, 404)
+    
+    def test_router_usa_la_base_de_la_sede(self):
+        """Test para verificar a qué base de datos se dirigen las consultas"""
+        sur = Sede(nombre='Sede Sur', codigo='sur', base_datos='sur')
+        
+        # Una sala nueva va a la base de su sede, y sus reservas a la de la sala
+        sala = Sala(nombre='Sala Sur', capacidad=4, sede=sur)
+        self.assertEqual(sala._state.db, 'sur')
+        self.assertEqual(Reserva(sala=sala)._state.db, 'sur')
+        
+        # Sin instancia se usa la sede en curso; el catálogo de sedes siempre en 'default'
+        self.assertEqual(router.db_for_read(Reserva), 'default')
+        with usar_sede(sur):
+            self.assertEqual(router.db_for_read(Reserva), 'sur')
+            self.assertEqual(router.db_for_write(DisponibilidadDiaria), 'sur')
+            self.assertEqual(router.db_for_read(Sede), 'default')
+            self.assertEqual(router.db_for_read(User), 'default')
+    
+    def test_base_de_datos_inexistente(self):
+        """Test para verificar la validación del alias de base de datos"""
+        sede = Sede(nombre='Sede Sur', codigo='sur', base_datos='sur')
+        with self.assertRaises(ValidationError):
+            sede.full_clean()
+    
+    def test_comandos_de_mantencion_por_sede(self):
+        """Test para verificar --sede en limpiar_datos y purgar_salas"""
+        User.objects.create_user(username='alumno', password='alumno123')
+        Reserva.objects.create(sala=self.sala_principal, rut='12345678-5', nombre_reservante='Juan Pérez')
+        Reserva.objects.create(sala=self.sala_norte, rut='11111111-1', nombre_reservante='Ana Soto')
+        
+        for comando in ('limpiar_datos', 'purgar_salas', 'verificar_disponibilidad'):
+            with self.assertRaisesMessage(CommandError, 'No existe la sede "sur"'):
+                call_command(comando, sede='sur', stdout=StringIO())
+        
+        # Solo la sala eliminada de la sede indicada
+        otra = Sala.objects.create(nombre='Sala Vieja', capacidad=2)
+        otra.eliminar()
+        call_command('purgar_salas', sede='norte', stdout=StringIO())
+        self.assertTrue(Sala.todas.filter(pk=otra.pk).exists())
+        
+        # Limpieza total de una sede: sus salas y reservas, no las demás ni los usuarios
+        call_command('limpiar_datos', sede='norte', interactive=False, stdout=StringIO())
+        self.assertEqual(list(Sala.todas.values_list('pk', flat=True).order_by('pk')), [self.sala_principal.pk, otra.pk])
+        self.assertEqual(list(Reserva.objects.values_list('rut', flat=True)), ['12345678-5'])
+        self.assertTrue(User.objects.filter(username='alumno').exists())
+
+
+class EventosCambioTestCase(TestCase):
+    """Tests para el outbox de cambios y su lectura por cursor"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.sala = Sala.objects.create(nombre='Sala Test', capacidad=4, habilitada=True)
+        self.reserva = Reserva.objects.create(sala=self.sala, rut='12345678-5', nombre_reservante='Juan Pérez')
+    
+    def acciones(self):
+        return list(EventoCambio.objects.values_list('modelo', 'objeto_id', 'accion'))
+    
+    def test_eventos_por_cambio(self):
+        """Test para verificar que cada cambio agrega su evento"""
+        self.reserva.cancelar()
+        self.assertEqual(self.acciones(), [
+            ('sala', self.sala.id, 'creada'),
+            ('reserva', self.reserva.id, 'creada'),
+            ('reserva', self.reserva.id, 'cancelada'),
+        ])
+        evento = EventoCambio.objects.last()
+        self.assertEqual(evento.sede, self.sala.sede)
+        self.assertEqual(evento.datos['estado'], 'cancelada')
+        self.assertEqual(evento.datos['version'], 1)
+    
+    def test_conflicto_no_agrega_evento(self):
+        """Test para verificar que una transición rechazada no deja evento"""
+        Reserva.objects.filter(pk=self.reserva.pk).update(version=5)
+        with self.assertRaises(ConflictoReserva):
+            self.reserva.finalizar()
+        self.assertEqual(EventoCambio.objects.filter(modelo='reserva').count(), 1)
+    
+    def test_eventos_masivos(self):
+        """Test para verificar los eventos de las acciones masivas"""
+        self.sala.eliminar()
+        self.assertEqual(self.acciones()[2:], [
+            ('reserva', self.reserva.id, 'cancelada'),
+            ('sala', self.sala.id, 'eliminada'),
+        ])
+        
+        Reserva.objects.all().eliminar()
+        self.assertEqual(self.acciones()[-1], ('reserva', self.reserva.id, 'eliminada'))
+    
+    def test_api_por_cursor(self):
+        """Test para verificar la lectura del feed por cursor"""
+        url = reverse('api_eventos')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.client.login(username='admin', password='admin123')
+        
+        datos = self.client.get(url, {'limite': 1}).json()
+        self.assertEqual([evento['accion'] for evento in datos['eventos']], ['creada'])
+        self.assertTrue(datos['hay_mas'])
+        
+        datos = self.client.get(url, {'desde': datos['cursor']}).json()
+        self.assertEqual(datos['eventos'][0]['modelo'], 'reserva')
+        self.assertFalse(datos['hay_mas'])
+    
+    @override_settings(EVENTOS_TOKEN='secreto')
+    def test_api_con_token(self):
+        """Test para verificar el acceso con token"""
+        url = reverse('api_eventos')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+    
+    def test_comando_seguir_eventos(self):
+        """Test para verificar la salida NDJSON y el archivo de cursor"""
+        with tempfile.TemporaryDirectory() as directorio:
+            cursor = os.path.join(directorio, 'cursor')
+            salida = StringIO()
+            call_command('seguir_eventos', cursor=cursor, lote=1, stdout=salida, stderr=StringIO())
+            lineas = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+            self.assertEqual([evento['modelo'] for evento in lineas], ['sala', 'reserva'])
+            
+            # La segunda lectura parte desde el cursor guardado
+            self.reserva.cancelar()
+            salida = StringIO()
+            call_command('seguir_eventos', cursor=cursor, stdout=salida, stderr=StringIO())
+            lineas = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+            self.assertEqual([evento['accion'] for evento in lineas], ['cancelada'])
+    
+    def test_eventos_en_orden_de_transaccion(self):
+        """Test para verificar que un evento de id menor confirmado después no queda detrás del cursor"""
+        sala_creada, reserva_creada = EventoCambio.objects.order_by('id')
+        self.reserva.cancelar()
+        cancelada = EventoCambio.objects.last()
+        # Como en PostgreSQL: la transacción de 'reserva_creada' (id menor)
+        # sigue en curso cuando 'cancelada' ya se confirmó
+        for evento, transaccion in ((sala_creada, 10), (reserva_creada, 20), (cancelada, 15)):
+            EventoCambio.objects.filter(pk=evento.pk).update(transaccion=transaccion)
+        
+        with mock.patch('salas.eventos.horizonte', return_value=18):
+            eventos, _ = leer_eventos()
+            self.assertEqual([evento.pk for evento in eventos], [sala_creada.pk, cancelada.pk])
+            self.assertEqual(ultimo_evento(), cancelada.pk)
+        with mock.patch('salas.eventos.horizonte', return_value=25):
+            eventos, hay_mas = leer_eventos(cancelada.pk)
+        self.assertEqual([evento.pk for evento in eventos], [reserva_creada.pk])
+        self.assertFalse(hay_mas)
+
+
+class BackendConError(BaseEmailBackend):
+    """Backend de correo que siempre falla (para los tests de reintento)"""
+    
+    def send_messages(self, email_messages):
+        raise ConnectionError('Servidor SMTP no disponible')
+
+
+class BackendFallaALaMitad(BaseEmailBackend):
+    """Backend de correo que envía un mensaje por conexión y luego falla"""
+    
+    def open(self):
+        self.enviados = 0
+    
+    def send_messages(self, email_messages):
+        if self.enviados:
+            raise ConnectionError('Conexión cerrada por el servidor')
+        self.enviados += len(email_messages)
+        mail.outbox.extend(email_messages)
+        return len(email_messages)
+
+
+class RecordatoriosTestCase(TestCase):
+    """Tests para los recordatorios por correo"""
+    
+    def setUp(self):
+        self.sala = Sala.objects.create(nombre='Sala Test', capacidad=4, habilitada=True)
+        ahora = timezone.now()
+        
+        def reserva(rut, inicio, email='alumno@correo.cl', estado='activa'):
+            return Reserva(
+                sala=self.sala, rut=rut, nombre_reservante='Juan Pérez', email=email, estado=estado,
+                fecha_hora_inicio=inicio, fecha_hora_fin=inicio + timedelta(hours=2),
+            )
+        
+        self.por_empezar, self.por_terminar, _, _, _ = Reserva.objects.bulk_create([
+            reserva('11111111-1', ahora + timedelta(minutes=10)),
+            reserva('22222222-2', ahora - timedelta(minutes=110)),
+            reserva('33333333-3', ahora - timedelta(minutes=110), email=''),
+            reserva('44444444-4', ahora - timedelta(minutes=110), estado='cancelada'),
+            reserva('55555555-5', ahora - timedelta(minutes=30)),
+        ])
+    
+    def test_envia_una_vez(self):
+        """Test para verificar el envío y que no se repite"""
+        self.assertEqual(procesar(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        asuntos = sorted(mensaje.subject for mensaje in mail.outbox)
+        self.assertIn('comienza', asuntos[0])
+        self.assertIn('termina', asuntos[1])
+        self.assertEqual(mail.outbox[0].to, ['alumno@correo.cl'])
+        
+        self.assertEqual(procesar(), (0, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.por_terminar.refresh_from_db()
+        self.assertIsNotNone(self.por_terminar.recordatorio_fin_enviado)
+    
+    def test_lotes_en_paralelo(self):
+        """Test para verificar el envío en varios lotes e hilos"""
+        self.assertEqual(procesar(hilos=2, tamano_lote=1), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+    
+    @override_settings(EMAIL_BACKEND='salas.tests.BackendConError')
+    def test_fallo_se_reintenta(self):
+        """Test para verificar que un envío fallido queda pendiente"""
+        self.assertEqual(procesar(), (0, 2))
+        self.por_empezar.refresh_from_db()
+        self.assertIsNone(self.por_empezar.recordatorio_inicio_enviado)
+        
+        with self.settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            self.assertEqual(procesar(), (2, 0))
+    
+    @override_settings(EMAIL_BACKEND='salas.tests.BackendFallaALaMitad')
+    def test_lote_que_falla_a_la_mitad(self):
+        """Test para verificar que los mensajes ya enviados de un lote fallido no se repiten"""
+        self.assertEqual(procesar(), (1, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        
+        with self.settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            self.assertEqual(procesar(), (1, 0))
+        asuntos = sorted(mensaje.subject for mensaje in mail.outbox)
+        self.assertIn('comienza', asuntos[0])
+        self.assertIn('termina', asuntos[1])
+    
+    def test_comando(self):
+        """Test para verificar el comando enviar_recordatorios"""
+        salida = StringIO()
+        call_command('enviar_recordatorios', '--hilos', '2', stdout=salida)
+        self.assertIn('2 recordatorios enviados', salida.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class EstaticosTestCase(TestCase):
+    """Tests para los archivos estáticos con hash y precomprimidos"""
+    
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = override_settings(STATIC_ROOT=directorio.name)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.nombre = staticfiles_storage.stored_name('salas/css/styles.css')
+        self.factory = RequestFactory()
+    
+    def test_collectstatic_genera_hash_y_variantes(self):
+        """Test para verificar el nombre con hash y la versión .gz"""
+        self.assertRegex(self.nombre, r'^salas/css/styles\.[0-9a-f]{12}\.css$')
+        self.assertTrue(staticfiles_storage.exists(self.nombre + '.gz'))
+        
+        response = self.client.get(reverse('lista_salas'))
+        self.assertContains(response, self.nombre)
+    
+    def test_sirve_variante_comprimida_inmutable(self):
+        """Test para verificar la variante según Accept-Encoding y la cache"""
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        response = servir_estatico(request, self.nombre)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        contenido = gzip.decompress(b''.join(response.streaming_content))
+        with staticfiles_storage.open(self.nombre) as archivo:
+            self.assertEqual(contenido, archivo.read())
+        
+        # Sin soporte de compresión se envía el original
+        response = servir_estatico(self.factory.get('/'), self.nombre)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response.close()
+        
+        # El nombre sin hash se puede pedir, pero no se marca como immutable
+        response = servir_estatico(self.factory.get('/'), 'salas/css/styles.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+        response.close()
+    
+    def test_revalidacion_y_rutas_invalidas(self):
+        """Test para verificar el 304 y el bloqueo de rutas fuera de STATIC_ROOT"""
+        ultima = servir_estatico(self.factory.get('/'), self.nombre)
+        ultima.close()
+        request = self.factory.get('/', HTTP_IF_MODIFIED_SINCE=ultima['Last-Modified'])
+        self.assertEqual(servir_estatico(request, self.nombre).status_code, 304)
+        
+        with self.assertRaises(Http404):
+            servir_estatico(self.factory.get('/'), '../manage.py')
+
+
+class PerfiladorTestCase(TestCase):
+    """Tests para los perfiles cProfile bajo demanda"""
+    
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = override_settings(PERFILES_DIR=directorio.name, PERFILAR_MUESTREO=0)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        User.objects.create_user(username='usuario', password='usuario123')
+    
+    def test_staff_con_parametro_guarda_perfil(self):
+        """Test para verificar que ?perfilar=1 de un staff guarda el perfil"""
+        self.client.login(username='admin', password='admin123')
+        response = self.client.get(reverse('lista_salas'), {'perfilar': '1'})
+        self.assertEqual(response.status_code, 200)
+        
+        perfiles = listar_perfiles()
+        self.assertEqual(len(perfiles), 1)
+        self.assertEqual(response['X-Perfil'], perfiles[0]['nombre'])
+        self.assertEqual(perfiles[0]['ruta'], 'lista_salas')
+        self.assertEqual(perfiles[0]['usuario'], 'admin')
+        
+        # El encabezado también activa el perfil
+        self.client.get(reverse('lista_salas'), HTTP_X_PERFILAR='1')
+        self.assertEqual(len(listar_perfiles()), 2)
+    
+    def test_sin_staff_ni_marca_no_perfila(self):
+        """Test para verificar que las demás peticiones no se perfilan"""
+        response = self.client.get(reverse('lista_salas'), {'perfilar': '1'})
+        self.assertFalse(response.has_header('X-Perfil'))
+        
+        self.client.login(username='usuario', password='usuario123')
+        self.client.get(reverse('lista_salas'), HTTP_X_PERFILAR='1')
+        
+        self.client.login(username='admin', password='admin123')
+        self.client.get(reverse('lista_salas'))
+        self.assertEqual(listar_perfiles(), [])
+        
+        # Con muestreo 1 se perfila toda petición, incluso anónima
+        self.client.logout()
+        with self.settings(PERFILAR_MUESTREO=1):
+            response = self.client.get(reverse('lista_salas'))
+        self.assertTrue(response.has_header('X-Perfil'))
+    
+    def test_listar_y_descargar(self):
+        """Test para verificar la lista, el resumen y la descarga del .prof"""
+        self.client.login(username='admin', password='admin123')
+        nombre = self.client.get(reverse('lista_salas'), {'perfilar': '1'})['X-Perfil']
+        
+        response = self.client.get(reverse('admin_perfiles'))
+        self.assertContains(response, nombre)
+        
+        response = self.client.get(reverse('admin_perfil', args=[nombre]))
+        self.assertContains(response, 'cumulative')
+        
+        response = self.client.get(reverse('admin_perfil', args=[nombre]), {'descargar': '1'})
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{nombre}.prof"')
+        self.assertTrue(b''.join(response.streaming_content))
+        
+        # Nombres que no son de un perfil no llegan al disco
+        response = self.client.get(reverse('admin_perfil', args=['..%2Fmanage.py']))
+        self.assertEqual(response.status_code, 404)
+        
+        # Usuarios que no son staff no ven los perfiles
+        self.client.login(username='usuario', password='usuario123')
+        response = self.client.get(reverse('admin_perfiles'))
+        self.assertEqual(response.status_code, 302)
+
+
+class ConsultasLentasTestCase(TestCase):
+    """Tests para el registro de consultas lentas con EXPLAIN"""
+    
+    def setUp(self):
+        cache.clear()
+        self.sala = Sala.objects.create(nombre='Sala Lenta', capacidad=4)
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+    
+    def test_normalizar_agrupa_parametros(self):
+        """Test para verificar que la huella no depende de los valores"""
+        self.assertEqual(
+            normalizar('SELECT * FROM t WHERE id IN (%s, %s, %s) AND n = 5 LIMIT 21'),
+            normalizar('SELECT  *  FROM t WHERE id IN (%s) AND n = 7 LIMIT 1'),
+        )
+    
+    def test_registra_origen_y_plan(self):
+        """Test para verificar vista, frames de salas y plan de la consulta"""
+        # Con la sala ocupada el mapa de bits no basta y se hace la consulta exacta
+        ahora = timezone.now()
+        Reserva.objects.create(
+            sala=self.sala,
+            rut='11111111-1',
+            nombre_reservante='Test User',
+            fecha_hora_inicio=ahora - timedelta(minutes=30),
+            fecha_hora_fin=ahora + timedelta(hours=1),
+        )
+        
+        # Umbral 0: toda consulta cuenta como lenta
+        with registrando_consultas(0, 'prueba'), self.assertLogs('salas.consultas_lentas', 'WARNING'):
+            self.sala.libre_entre(ahora, ahora)
+            self.sala.libre_entre(ahora, ahora)
+        
+        consultas = listar_consultas()
+        exacta = next(c for c in consultas if 'salas_reserva' in c['sql'])
+        self.assertEqual(exacta['veces'], 2)
+        self.assertEqual(exacta['vistas'], ['prueba'])
+        self.assertIn('tiene_reservas_entre', exacta['origenes'][0])
+        self.assertIn('libre_entre', exacta['origenes'][0])
+        self.assertTrue(exacta['plan'])
+        
+        # Las consultas del propio EXPLAIN no se registran
+        self.assertFalse(any('EXPLAIN' in c['sql'] for c in consultas))
+    
+    def test_middleware_y_vista_staff(self):
+        """Test para verificar el registro por petición y la página de staff"""
+        self.client.login(username='admin', password='admin123')
+        with self.settings(CONSULTAS_LENTAS_MS=0), self.assertLogs('salas.consultas_lentas', 'WARNING'):
+            Client().get(reverse('lista_salas'))
+            self.assertIn('lista_salas', {v for c in listar_consultas() for v in c['vistas']})
+            
+            response = self.client.get(reverse('admin_consultas_lentas'))
+            self.assertContains(response, 'lista_salas')
+            
+            response = self.client.post(reverse('admin_consultas_lentas'))
+            self.assertRedirects(response, reverse('admin_consultas_lentas'))
+        
+        # Sin umbral el middleware no se instala
+        cache.clear()
+        Client().get(reverse('lista_salas'))
+        self.assertEqual(listar_consultas(), [])
+
+
+class InstantaneasTestCase(TestCase):
+    """Tests para las instantáneas mensuales de reservas"""
+    
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.destino = directorio.name
+        
+        self.sala = Sala.objects.create(nombre='Sala Test', capacidad=4)
+        self.otra = Sala.objects.create(nombre='Sala Otra', capacidad=6)
+        self.enero = Reserva.objects.create(
+            sala=self.sala, rut='12345678-5', nombre_reservante='Juan Pérez',
+            fecha_hora_inicio=timezone.make_aware(datetime(2025, 1, 15, 10)), estado='finalizada'
+        )
+        Reserva.objects.create(
+            sala=self.otra, rut='11111111-1', nombre_reservante='Ana Soto',
+            fecha_hora_inicio=timezone.make_aware(datetime(2025, 2, 10, 10)), estado='finalizada'
+        )
+    
+    def leer(self, mes):
+        with gzip.open(os.path.join(self.destino, f'reservas-{mes}.ndjson.gz'), 'rt', encoding='utf-8') as archivo:
+            return [json.loads(linea) for linea in archivo]
+    
+    def test_primera_vez_escribe_todos_los_meses(self):
+        """Test para verificar los archivos por mes y el índice"""
+        salida = StringIO()
+        call_command('instantanea_reservas', self.destino, stdout=salida)
+        self.assertIn('2 de 2 meses', salida.getvalue())
+        
+        with open(os.path.join(self.destino, 'indice.json')) as archivo:
+            indice = json.load(archivo)
+        self.assertEqual(list(indice['meses']), ['2025-01', '2025-02'])
+        self.assertEqual(indice['cursor'], EventoCambio.objects.latest('id').pk)
+        
+        filas = self.leer('2025-01')
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['id'], self.enero.pk)
+        self.assertEqual(filas[0]['sala'], 'Sala Test')
+        self.assertNotIn('nombre_reservante', filas[0])
+    
+    def test_solo_reescribe_meses_modificados(self):
+        """Test para verificar la actualización incremental por eventos"""
+        actualizar(self.destino)
+        meses, _ = actualizar(self.destino)
+        self.assertEqual(meses, [])
+        
+        # Mover la reserva de enero a marzo reescribe ambos meses
+        self.enero.fecha_hora_inicio = timezone.make_aware(datetime(2025, 3, 5, 10))
+        self.enero.fecha_hora_fin = self.enero.fecha_hora_inicio + timedelta(hours=2)
+        self.enero.save()
+        meses, indice = actualizar(self.destino)
+        self.assertEqual(meses, ['2025-01', '2025-03'])
+        self.assertEqual(list(indice['meses']), ['2025-02', '2025-03'])
+        self.assertFalse(os.path.exists(os.path.join(self.destino, 'reservas-2025-01.ndjson.gz')))
+        
+        # Editar una sala reescribe los meses de sus reservas
+        self.otra.nombre = 'Sala Renombrada'
+        self.otra.save()
+        meses, _ = actualizar(self.destino)
+        self.assertEqual(meses, ['2025-02'])
+        self.assertEqual(self.leer('2025-02')[0]['sala'], 'Sala Renombrada')
+
+
+class ReservaGrupoTestCase(TestCase):
+    """Tests para la reserva de varias salas en una sola transacción"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.salas = [Sala.objects.create(nombre=f'Sala {i}', capacidad=4) for i in range(3)]
+        self.inicio = timezone.now() + timedelta(hours=1)
+        self.fin = self.inicio + timedelta(hours=2)
+    
+    def reservar(self, salas, rut='12345678-5'):
+        return Reserva.objects.reservar_grupo(
+            [sala.pk for sala in salas], self.inicio, self.fin, rut=rut, nombre_reservante='Juan Pérez'
+        )
+    
+    def test_reserva_todas_las_salas(self):
+        """Test para verificar las reservas, sus eventos y los mapas de bits"""
+        reservas = self.reservar(self.salas)
+        self.assertEqual(len(reservas), 3)
+        self.assertEqual(len({reserva.grupo for reserva in reservas}), 1)
+        self.assertEqual(Reserva.objects.filter(grupo=reservas[0].grupo).count(), 3)
+        self.assertEqual(EventoCambio.objects.filter(modelo='reserva', accion='creada').count(), 3)
+        for sala in self.salas:
+            self.assertFalse(DisponibilidadDiaria.objects.libre(sala.pk, self.inicio, self.fin))
+            self.assertFalse(sala.libre_entre(self.inicio, self.fin))
+        
+        # El grupo cuenta como la única reserva activa del RUT...
+        otra = Sala.objects.create(nombre='Sala Otra', capacidad=4)
+        with self.assertRaises(ValidationError):
+            Reserva.objects.create(sala=otra, rut='12345678-5', nombre_reservante='Juan Pérez')
+        # ...pero cada reserva del grupo se puede editar
+        reservas[0].nombre_reservante = 'Juan A. Pérez'
+        reservas[0].save()
+    
+    def test_todo_o_nada(self):
+        """Test para verificar que una sala ocupada impide reservar el grupo"""
+        Reserva.objects.create(
+            sala=self.salas[2], rut='11111111-1', nombre_reservante='Ana Soto',
+            fecha_hora_inicio=self.inicio + timedelta(minutes=30),
+        )
+        eventos = EventoCambio.objects.count()
+        
+        with self.assertRaisesMessage(ValidationError, 'Sala 2'):
+            self.reservar(self.salas)
+        self.assertEqual(Reserva.objects.count(), 1)
+        self.assertEqual(EventoCambio.objects.count(), eventos)
+        self.assertTrue(self.salas[0].libre_entre(self.inicio, self.fin))
+        
+        # Salas deshabilitadas tampoco se pueden reservar
+        self.salas[1].habilitada = False
+        self.salas[1].save()
+        with self.assertRaises(ValidationError):
+            self.reservar(self.salas[:2])
+    
+    def test_vista_reservar_grupo(self):
+        """Test para verificar el formulario de reserva grupal"""
+        local = timezone.localtime(self.inicio)
+        datos = {
+            'salas': [self.salas[0].pk, self.salas[1].pk],
+            'rut': '12.345.678-5',
+            'nombre_reservante': 'Juan Pérez',
+            'fecha': local.date().isoformat(),
+            'hora': local.strftime('%H:%M'),
+            'duracion': 120,
+        }
+        response = self.client.post(reverse('reservar_grupo'), datos, follow=True)
+        self.assertContains(response, 'Reserva grupal creada exitosamente')
+        self.assertEqual(Reserva.objects.filter(rut='12345678-5').count(), 2)
+        
+        # Una sola sala no es una reserva grupal
+        datos['salas'] = [self.salas[2].pk]
+        response = self.client.post(reverse('reservar_grupo'), datos)
+        self.assertContains(response, 'Seleccione entre 2 y 4 salas')
+
+
+class EstresReservasTestCase(TestCase):
+    """Tests para la prueba de estrés del flujo de reservas"""
+    
+    def test_ejecuta_y_verifica_reglas(self):
+        """Test para verificar el reporte, las reglas y la limpieza"""
+        salida = StringIO()
+        call_command('estres_reservas', hilos=1, operaciones=30, salas=2, ruts=3, forzar=True, stdout=salida)
+        texto = salida.getvalue()
+        self.assertIn('📊 crear', texto)
+        self.assertIn('p95', texto)
+        self.assertIn('Ningún RUT tiene más de una reserva activa', texto)
+        self.assertIn('✅', texto)
+        self.assertFalse(Sala.todas.filter(nombre__startswith='Estrés').exists())
+    
+    def test_detecta_traslapes(self):
+        """Test para verificar que las reglas detectan reservas inválidas"""
+        from .management.commands.estres_reservas import ruts_repetidos, traslapes
+        sala = Sala.objects.create(nombre='Sala Test', capacidad=4)
+        primera = Reserva.objects.create(sala=sala, rut='12345678-5', nombre_reservante='Juan Pérez')
+        # Una segunda reserva que se saltó las validaciones
+        segunda = Reserva.objects.create(sala=sala, rut='11111111-1', nombre_reservante='Ana Soto', estado='cancelada')
+        Reserva.objects.filter(pk=segunda.pk).update(estado='activa', rut=primera.rut)
+        
+        self.assertEqual(traslapes([sala]), {'Sala Test': 1})
+        self.assertEqual(ruts_repetidos([sala]), {'12345678-5': 2})
+    
+    def test_transacciones_inmediatas_en_sqlite(self):
+        """Test para verificar que la prueba usa BEGIN IMMEDIATE en SQLite y luego restaura las opciones"""
+        from .management.commands.estres_reservas import ESPERA_SQLITE, transacciones_inmediatas
+        opciones = dict(connection.settings_dict.get('OPTIONS', {}))
+        with transacciones_inmediatas(connection.alias):
+            self.assertEqual(connection.settings_dict['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+            self.assertEqual(connection.settings_dict['OPTIONS']['timeout'], ESPERA_SQLITE)
+        self.assertEqual(connection.settings_dict['OPTIONS'], opciones)
+
+
+class ReservaPorPuestosTestCase(TestCase):
+    """Tests para las salas que se reservan por puestos"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.sala = Sala.objects.create(nombre='Sala D - Conferencias', capacidad=3, por_puestos=True)
+        self.ruts = ['12345678-5', '11111111-1', '22222222-2', '33333333-3']
+    
+    def reservar(self, rut, **datos):
+        return Reserva.objects.create(sala=self.sala, rut=rut, nombre_reservante='Juan Pérez', **datos)
+    
+    def test_reserva_hasta_completar_capacidad(self):
+        """Test para verificar el contador de puestos sin contar reservas"""
+        copia = Sala.objects.get(pk=self.sala.pk)
+        with CaptureQueriesContext(connection) as consultas:
+            reservas = [self.reservar(rut) for rut in self.ruts[:3]]
+        self.assertFalse(any('COUNT(' in consulta['sql'].upper() for consulta in consultas.captured_queries))
+        self.assertTrue(all(reserva.ocupa_puesto for reserva in reservas))
+        
+        self.sala.refresh_from_db()
+        self.assertEqual(self.sala.puestos_ocupados, 3)
+        self.assertFalse(self.sala.esta_disponible())
+        # Las reservas por puesto no ocupan casillas en los mapas de bits
+        ahora = timezone.now()
+        self.assertTrue(DisponibilidadDiaria.objects.libre(self.sala.pk, ahora, ahora))
+        
+        with self.assertRaisesMessage(ValidationError, 'No quedan puestos'):
+            self.reservar(self.ruts[3])
+        self.assertEqual(Reserva.objects.count(), 3)
+        
+        # Guardar una copia vieja de la sala no pisa el contador
+        copia.descripcion = 'Proyector y pizarra'
+        copia.save()
+        self.sala.refresh_from_db()
+        self.assertEqual(self.sala.puestos_ocupados, 3)
+    
+    def test_cancelar_finalizar_y_eliminar_devuelven_el_puesto(self):
+        """Test para verificar que cada salida de una reserva devuelve su puesto"""
+        primera, segunda, tercera = [self.reservar(rut) for rut in self.ruts[:3]]
+        primera.cancelar()
+        with self.assertRaises(ConflictoReserva):
+            Reserva.objects.get(pk=primera.pk).cancelar(version=0)
+        Reserva.objects.filter(pk=segunda.pk).finalizar()
+        tercera.delete()
+        
+        self.sala.refresh_from_db()
+        self.assertEqual(self.sala.puestos_ocupados, 0)
+        self.assertFalse(Reserva.objects.filter(ocupa_puesto=True).exists())
+        
+        # Reactivar una reserva desde el admin vuelve a tomar un puesto
+        primera.refresh_from_db()
+        primera.estado = 'activa'
+        primera.save()
+        self.sala.refresh_from_db()
+        self.assertEqual(self.sala.puestos_ocupados, 1)
+    
+    def test_libera_puestos_de_reservas_terminadas(self):
+        """Test para verificar la liberación al llenarse y el comando de mantención"""
+        reservas = [self.reservar(rut) for rut in self.ruts[:3]]
+        # La primera reserva ya terminó, pero sigue contando en el contador
+        Reserva.objects.filter(pk=reservas[0].pk).update(
+            fecha_hora_inicio=timezone.now() - timedelta(hours=3),
+            fecha_hora_fin=timezone.now() - timedelta(hours=1),
+        )
+        self.reservar(self.ruts[3])
+        self.sala.refresh_from_db()
+        self.assertEqual(self.sala.puestos_ocupados, 3)
+        self.assertFalse(Reserva.objects.get(pk=reservas[0].pk).ocupa_puesto)
+        
+        # Un contador descuadrado se repara con --recalcular
+        Sala.objects.filter(pk=self.sala.pk).update(puestos_ocupados=1)
+        salida = StringIO()
+        call_command('liberar_puestos', recalcular=True, stdout=salida)
+        self.assertIn('1 → 3', salida.getvalue())
+        self.sala.refresh_from_db()
+        self.assertEqual(self.sala.puestos_ocupados, 3)
+    
+    def test_vistas(self):
+        """Test para verificar las vistas con una sala por puestos"""
+        for rut in self.ruts[:2]:
+            response = self.client.post(
+                reverse('crear_reserva', args=[self.sala.pk]),
+                {'sala': self.sala.pk, 'rut': rut, 'nombre_reservante': 'Juan Pérez'},
+                follow=True,
+            )
+            self.assertContains(response, 'Tiene un puesto en la sala')
+        self.assertContains(self.client.get(reverse('lista_salas')), 'Puestos libres:</strong> 1 de 3')
+        
+        # No se ofrece en la búsqueda de salas para grupos
+        ahora = timezone.now()
+        self.assertEqual(buscar_salas_libres(2, ahora, ahora + timedelta(hours=1), timedelta(hours=1)), [])
+        
+        # El modo no se puede cambiar con reservas vigentes
+        User.objects.create_superuser(username='admin', password='admin123', email='admin@test.com')
+        self.client.login(username='admin', password='admin123')
+        response = self.client.post(
+            reverse('admin_editar_sala', args=[self.sala.pk]),
+            {'nombre': self.sala.nombre, 'capacidad': 3, 'habilitada': 'on'},
+            follow=True,
+        )
+        self.assertContains(response, 'No se puede cambiar el modo de reserva')
+        self.sala.refresh_from_db()
+        self.assertTrue(self.sala.por_puestos)
+
+
+class TrabajosTestCase(TestCase):
+    """Tests para la cola de trabajos en segundo plano"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_superuser(username='admin', password='admin123', email='admin@test.com')
+        self.client.login(username='admin', password='admin123')
+        self.sala = Sala.objects.create(nombre='Sala Test', capacidad=4)
+    
+    def registrar_tarea(self, nombre, funcion, **opciones):
+        from .trabajos import TAREAS, tarea
+        tarea(nombre, 'Tarea de prueba', **opciones)(funcion)
+        self.addCleanup(TAREAS.pop, nombre)
+    
+    def test_accion_masiva_en_segundo_plano(self):
+        """Test para verificar encolar desde el panel, procesar e informar el avance"""
+        for i, rut in enumerate(['12345678-5', '11111111-1', '22222222-2']):
+            Reserva.objects.create(
+                sala=self.sala, rut=rut, nombre_reservante=f'Ana {i}',
+                fecha_hora_inicio=timezone.now() + timedelta(hours=3 * i),
+            )
+        response = self.client.post(
+            reverse('admin_reservas_masivo'),
+            {'accion': 'cancelar', 'alcance': 'busqueda', 'q': 'Ana', 'desde': '', 'hasta': ''},
+        )
+        self.assertRedirects(response, reverse('admin_trabajos'))
+        trabajo = Trabajo.objects.get()
+        self.assertEqual((trabajo.tarea, trabajo.estado, trabajo.usuario), ('accion_masiva', 'pendiente', 'admin'))
+        # Las reservas no cambian hasta que corre el trabajador
+        self.assertEqual(Reserva.objects.filter(estado='activa').count(), 3)
+        
+        salida = StringIO()
+        call_command('procesar_trabajos', hilos=1, stdout=salida)
+        self.assertIn('1 completado', salida.getvalue())
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'completado')
+        self.assertEqual(trabajo.progreso, 100)
+        self.assertEqual(trabajo.resultado, {'seleccionadas': 3, 'modificadas': 3})
+        self.assertEqual(Reserva.objects.filter(estado='cancelada').count(), 3)
+        self.assertContains(self.client.get(reverse('admin_trabajos')), 'Acción masiva sobre reservas')
+        
+        # Sin búsqueda no se encola una acción sobre todas las reservas
+        response = self.client.post(
+            reverse('admin_reservas_masivo'), {'accion': 'cancelar', 'alcance': 'busqueda'}, follow=True
+        )
+        self.assertContains(response, 'Indique una búsqueda válida')
+        self.assertEqual(Trabajo.objects.count(), 1)
+    
+    def test_reintentos_con_espera(self):
+        """Test para verificar los reintentos y el fallo definitivo"""
+        def fallar(trabajo):
+            raise RuntimeError('sin conexión')
+        self.registrar_tarea('prueba_falla', fallar, max_intentos=2)
+        trabajo = encolar('prueba_falla')
+        
+        with self.assertLogs('salas.trabajos', level='ERROR'):
+            call_command('procesar_trabajos', hilos=1, stdout=StringIO())
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('pendiente', 1))
+        self.assertIn('RuntimeError: sin conexión', trabajo.error)
+        self.assertGreater(trabajo.disponible_desde, timezone.now())
+        # Durante la espera nadie lo reclama
+        self.assertEqual(Trabajo.objects.reclamar('otro', 5), [])
+        
+        Trabajo.objects.update(disponible_desde=timezone.now())
+        with self.assertLogs('salas.trabajos', level='ERROR'):
+            call_command('procesar_trabajos', hilos=1, stdout=StringIO())
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('fallido', 2))
+    
+    def test_reclamo_vencimiento_y_cancelacion(self):
+        """Test para verificar que cada trabajo lo toma un solo intento"""
+        self.registrar_tarea('prueba', lambda trabajo: None, limite_segundos=60)
+        primero, segundo = encolar('prueba'), encolar('prueba')
+        
+        reclamados = Trabajo.objects.reclamar('a', 1)
+        self.assertEqual([trabajo.pk for trabajo in reclamados], [primero.pk])
+        self.assertEqual([trabajo.pk for trabajo in Trabajo.objects.reclamar('b', 5)], [segundo.pk])
+        self.assertEqual(Trabajo.objects.reclamar('c', 5), [])
+        
+        # El primero supera su tiempo límite: vuelve a la cola y el intento
+        # anterior ya no puede informar avance ni completarse
+        Trabajo.objects.filter(pk=primero.pk).update(vence=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(Trabajo.objects.vencer(), 1)
+        with self.assertRaises(TrabajoInterrumpido):
+            reclamados[0].avanzar(50)
+        self.assertFalse(reclamados[0].completar())
+        primero.refresh_from_db()
+        self.assertEqual(primero.estado, 'pendiente')
+        self.assertIn('Tiempo agotado', primero.error)
+        
+        # Cancelar desde el panel
+        self.client.post(reverse('admin_trabajos'), {'cancelar': primero.pk})
+        primero.refresh_from_db()
+        self.assertEqual(primero.estado, 'cancelado')
+        self.assertEqual(Trabajo.objects.reclamar('d', 5), [])
+    
+    def test_comando_de_mantencion(self):
+        """Test para verificar encolar un comando desde el panel y guardar su salida"""
+        response = self.client.post(reverse('admin_trabajos'), {'comando': 'verificar_disponibilidad'}, follow=True)
+        self.assertContains(response, 'encolado')
+        self.client.post(reverse('admin_trabajos'), {'comando': 'migrate'})
+        self.assertEqual(Trabajo.objects.count(), 1)
+        
+        call_command('procesar_trabajos', hilos=1, stdout=StringIO())
+        trabajo = Trabajo.objects.get()
+        self.assertEqual(trabajo.estado, 'completado')
+        self.assertIn('Verificando mapas', trabajo.resultado['salida'])
+    
+    def test_comando_vencido_se_detiene(self):
+        """Test para verificar que un comando encolado que venció no sigue corriendo"""
+        from .trabajos import SalidaComando
+        Reserva.objects.create(sala=self.sala, rut='12345678-5', nombre_reservante='Juan Pérez')
+        self.sala.eliminar()
+        encolar('comando', comando='purgar_salas')
+        trabajo, = Trabajo.objects.reclamar('a', 1)
+        
+        salida = SalidaComando(trabajo)
+        salida.write('Preparando...\n')
+        self.assertEqual(Trabajo.objects.get(pk=trabajo.pk).mensaje, 'Preparando...')
+        
+        # Vence mientras corre: se detiene en la siguiente línea de salida,
+        # antes de borrar el primer lote
+        Trabajo.objects.filter(pk=trabajo.pk).update(vence=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(Trabajo.objects.vencer(), 1)
+        with self.assertRaises(TrabajoInterrumpido):
+            call_command('purgar_salas', stdout=salida)
+        self.assertTrue(Sala.todas.filter(pk=self.sala.pk).exists())
+        self.assertEqual(Reserva.objects.filter(sala=self.sala).count(), 1)
+    
+    def test_mapa_ocupacion_vencido_se_detiene(self):
+        """Test para verificar que el mapa de ocupación informa su avance y se detiene si venció"""
+        from .trabajos import recalcular_ocupacion
+        desde = timezone.now() - timedelta(days=30)
+        periodo = {'desde': desde.isoformat(), 'hasta': timezone.now().isoformat()}
+        encolar('mapa_ocupacion', **periodo)
+        trabajo, = Trabajo.objects.reclamar('a', 1)
+        Trabajo.objects.filter(pk=trabajo.pk).update(vence=timezone.now() - timedelta(seconds=1))
+        Trabajo.objects.vencer()
+        with self.assertRaises(TrabajoInterrumpido):
+            recalcular_ocupacion(trabajo, **periodo)
+        
+        # El reintento informa el avance por tramos y termina
+        Trabajo.objects.filter(pk=trabajo.pk).update(disponible_desde=timezone.now())
+        call_command('procesar_trabajos', hilos=1, stdout=StringIO())
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'completado')
+        self.assertEqual(trabajo.mensaje, 'Leyendo reservas')
+
+
+class CatalogoSalasTestCase(TestCase):
+    """Tests para el catálogo de salas con filtros, orden y paginación"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.chica = Sala.objects.create(nombre='Sala A - Chica', capacidad=2)
+        self.mediana = Sala.objects.create(nombre='Sala B - Mediana', capacidad=6)
+        self.grande = Sala.objects.create(nombre='Sala C - Grande', capacidad=12)
+        self.conferencias = Sala.objects.create(nombre='Sala D - Conferencias', capacidad=1, por_puestos=True)
+        self.cerrada = Sala.objects.create(nombre='Sala E - Cerrada', capacidad=8, habilitada=False)
+        Reserva.objects.create(sala=self.mediana, rut='12345678-5', nombre_reservante='Juan Pérez')
+        Reserva.objects.create(sala=self.conferencias, rut='11111111-1', nombre_reservante='Ana Soto')
+    
+    def nombres(self, response):
+        return [sala.nombre for sala in response.context['salas']]
+    
+    def test_disponibilidad_anotada_coincide_con_esta_disponible(self):
+        """Test para verificar la anotación contra esta_disponible() en todas las salas"""
+        salas = Sala.objects.con_disponibilidad()
+        self.assertEqual(
+            {sala.pk: sala.disponible for sala in salas},
+            {sala.pk: sala.esta_disponible() for sala in Sala.objects.all()},
+        )
+        self.assertEqual(
+            set(salas.filter(disponible=True).values_list('pk', flat=True)), {self.chica.pk, self.grande.pk}
+        )
+        
+        # Una sala por puestos llena de reservas ya terminadas se puede volver a reservar
+        Reserva.objects.filter(sala=self.conferencias).update(
+            fecha_hora_inicio=timezone.now() - timedelta(hours=3),
+            fecha_hora_fin=timezone.now() - timedelta(hours=1),
+        )
+        self.assertTrue(Sala.objects.con_disponibilidad().get(pk=self.conferencias.pk).disponible)
+    
+    def test_filtros_y_orden(self):
+        """Test para verificar los filtros por nombre, capacidad y disponibilidad y el orden"""
+        url = reverse('lista_salas')
+        self.assertEqual(len(self.nombres(self.client.get(url))), 4)
+        self.assertEqual(self.nombres(self.client.get(url, {'nombre': 'grande'})), ['Sala C - Grande'])
+        self.assertEqual(
+            self.nombres(self.client.get(url, {'capacidad_min': 2, 'capacidad_max': 6, 'orden': '-capacidad'})),
+            ['Sala B - Mediana', 'Sala A - Chica'],
+        )
+        self.assertEqual(
+            self.nombres(self.client.get(url, {'disponibles': 'on'})), ['Sala A - Chica', 'Sala C - Grande']
+        )
+        self.assertEqual(
+            self.nombres(self.client.get(url, {'orden': 'disponible'}))[:2], ['Sala A - Chica', 'Sala C - Grande']
+        )
+        
+        # Un rango inválido muestra el error y el catálogo sin filtrar
+        response = self.client.get(url, {'capacidad_min': 10, 'capacidad_max': 2})
+        self.assertContains(response, 'La capacidad máxima debe ser igual o mayor que la mínima.')
+        self.assertEqual(len(self.nombres(response)), 4)
+    
+    def test_paginacion_con_consultas_acotadas(self):
+        """Test para verificar que las consultas no crecen con la cantidad de salas"""
+        url = reverse('lista_salas')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as pocas:
+            self.client.get(url)
+        
+        sede = obtener_sede()
+        Sala.objects.bulk_create([Sala(nombre=f'Sala Extra {i:03}', capacidad=4, sede=sede) for i in range(60)])
+        with CaptureQueriesContext(connection) as muchas:
+            response = self.client.get(url, {'page': 2})
+        self.assertEqual(len(muchas), len(pocas))
+        self.assertEqual(response.context['page_obj'].paginator.count, 64)
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertContains(response, 'Página 2 de 3')
+        self.assertTrue(all(hasattr(sala, 'disponible') for sala in response.context['salas']))
+    
+    def test_admin_salas(self):
+        """Test para verificar los filtros del panel, que también muestra las deshabilitadas"""
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.client.login(username='admin', password='admin123')
+        url = reverse('admin_salas')
+        self.assertEqual(len(self.nombres(self.client.get(url))), 5)
+        response = self.client.get(url, {'capacidad_min': 7, 'orden': 'capacidad'})
+        self.assertEqual(self.nombres(response), ['Sala E - Cerrada', 'Sala C - Grande'])
+        self.assertContains(response, 'Limpiar')
+
+
+class OcupacionSalaTestCase(TestCase):
+    """Tests para la ocupación guardada en la sala, mantenida en cada cambio de reservas"""
+    
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.sala = Sala.objects.create(nombre='Sala A - Silenciosa', capacidad=4)
+        self.otra = Sala.objects.create(nombre='Sala B - Grupal', capacidad=6)
+    
+    def crear(self, sala=None, rut='12345678-5'):
+        self.client.post(
+            reverse('crear_reserva', args=[(sala or self.sala).pk]),
+            {'sala': (sala or self.sala).pk, 'rut': rut, 'nombre_reservante': 'Juan Pérez'},
+        )
+        return Reserva.objects.get(rut=rut, estado='activa')
+    
+    def ocupacion(self, sala=None):
+        sala = Sala.objects.get(pk=(sala or self.sala).pk)
+        return sala.reserva_actual_id, sala.ocupada_desde, sala.ocupada_hasta
+    
+    def assertLibre(self, sala=None):
+        self.assertEqual(self.ocupacion(sala), (None, None, None))
+        self.assertTrue(Sala.objects.get(pk=(sala or self.sala).pk).esta_disponible())
+    
+    def test_crear_reserva(self):
+        """Test para verificar la vista crear_reserva y esta_disponible sin consultas"""
+        reserva = self.crear()
+        self.assertEqual(self.ocupacion(), (reserva.pk, reserva.fecha_hora_inicio, reserva.fecha_hora_fin))
+        sala = Sala.objects.get(pk=self.sala.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(sala.esta_disponible())
+        self.assertContains(self.client.get(reverse('detalle_sala', args=[self.sala.pk])), 'Ocupada')
+    
+    def test_cancelar_reserva(self):
+        """Test para verificar la vista cancelar_reserva"""
+        reserva = self.crear()
+        self.client.post(reverse('cancelar_reserva', args=[reserva.pk]), {'version': reserva.version})
+        self.assertLibre()
+    
+    def test_finalizar_y_eliminar_desde_el_panel(self):
+        """Test para verificar admin_finalizar_reserva y admin_eliminar_reserva"""
+        self.client.login(username='admin', password='admin123')
+        reserva = self.crear()
+        self.client.post(reverse('admin_finalizar_reserva', args=[reserva.pk]), {'version': reserva.version})
+        self.assertLibre()
+        
+        reserva = self.crear(rut='11111111-1')
+        self.client.post(reverse('admin_eliminar_reserva', args=[reserva.pk]))
+        self.assertFalse(Reserva.objects.filter(pk=reserva.pk).exists())
+        self.assertLibre()
+    
+    def test_accion_masiva_y_eliminar_sala(self):
+        """Test para verificar admin_reservas_masivo y admin_eliminar_sala"""
+        self.client.login(username='admin', password='admin123')
+        primera = self.crear()
+        segunda = self.crear(self.otra, rut='11111111-1')
+        self.client.post(reverse('admin_reservas_masivo'), {'accion': 'cancelar', 'reservas': [primera.pk]})
+        self.assertLibre()
+        self.assertEqual(self.ocupacion(self.otra)[0], segunda.pk)
+        
+        self.client.post(reverse('admin_eliminar_sala', args=[self.otra.pk]))
+        self.assertEqual(Sala.todas.get(pk=self.otra.pk).reserva_actual_id, None)
+    
+    def test_reserva_grupal_y_vencimiento(self):
+        """Test para verificar reservar_grupo y que al terminar la reserva actual la sala queda libre hasta la grupal"""
+        actual = self.crear()
+        inicio = timezone.localtime() + timedelta(hours=3)
+        self.client.post(reverse('reservar_grupo'), {
+            'salas': [self.sala.pk, self.otra.pk],
+            'rut': '11111111-1',
+            'nombre_reservante': 'Ana Soto',
+            'fecha': inicio.date().isoformat(),
+            'hora': inicio.strftime('%H:%M'),
+            'duracion': 60,
+        })
+        grupal = Reserva.objects.get(rut='11111111-1', sala=self.sala)
+        # La sala sigue ocupada por la reserva en curso; la otra queda libre
+        # hasta que empiece la grupal
+        self.assertEqual(self.ocupacion()[0], actual.pk)
+        self.assertEqual(self.ocupacion(self.otra)[0], Reserva.objects.get(rut='11111111-1', sala=self.otra).pk)
+        self.assertTrue(Sala.objects.get(pk=self.otra.pk).esta_disponible())
+        
+        # La reserva en curso termina sin cambios de estado (se simula el paso
+        # del tiempo en la reserva y en la sala): la sala pasa a la grupal
+        terminada = {
+            'fecha_hora_inicio': timezone.now() - timedelta(hours=3),
+            'fecha_hora_fin': timezone.now() - timedelta(hours=1),
+        }
+        Reserva.objects.filter(pk=actual.pk).update(**terminada)
+        Sala.objects.filter(pk=self.sala.pk).update(
+            ocupada_desde=terminada['fecha_hora_inicio'], ocupada_hasta=terminada['fecha_hora_fin']
+        )
+        # La reserva guardada ya terminó: se confirma con la consulta exacta
+        sala = Sala.objects.get(pk=self.sala.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(sala.esta_disponible())
+        self.assertEqual(self.ocupacion()[0], actual.pk)
+        self.assertTrue(Sala.objects.con_disponibilidad().get(pk=self.sala.pk).disponible)
+        
+        # reconciliar_ocupacion la avanza a la grupal
+        call_command('reconciliar_ocupacion', stdout=StringIO())
+        self.assertEqual(self.ocupacion()[0], grupal.pk)
+    
+    def test_reservas_seguidas(self):
+        """Test para verificar que la sala sigue ocupada cuando termina la reserva guardada y empieza la siguiente"""
+        actual = self.crear()
+        siguiente = Reserva.objects.create(
+            sala=self.sala, rut='11111111-1', nombre_reservante='Ana Soto',
+            fecha_hora_inicio=actual.fecha_hora_fin, fecha_hora_fin=actual.fecha_hora_fin + timedelta(hours=1)
+        )
+        self.assertEqual(self.ocupacion()[0], actual.pk)
+        
+        # Pasa el tiempo sin cambios de reservas: la guardada terminó y la
+        # siguiente ya está en curso
+        atraso = actual.fecha_hora_fin - actual.fecha_hora_inicio + timedelta(minutes=30)
+        for reserva in (actual, siguiente):
+            Reserva.objects.filter(pk=reserva.pk).update(
+                fecha_hora_inicio=reserva.fecha_hora_inicio - atraso, fecha_hora_fin=reserva.fecha_hora_fin - atraso
+            )
+        Sala.objects.filter(pk=self.sala.pk).update(
+            ocupada_desde=actual.fecha_hora_inicio - atraso, ocupada_hasta=actual.fecha_hora_fin - atraso
+        )
+        self.assertFalse(Sala.objects.get(pk=self.sala.pk).esta_disponible())
+        self.assertFalse(Sala.objects.con_disponibilidad().get(pk=self.sala.pk).disponible)
+        self.assertTrue(Sala.objects.con_disponibilidad().get(pk=self.otra.pk).disponible)
+    
+    def test_reconciliar_ocupacion(self):
+        """Test para verificar que el comando repara la ocupación descuadrada"""
+        reserva = self.crear()
+        Sala.objects.filter(pk=self.sala.pk).update(reserva_actual=None, ocupada_desde=None, ocupada_hasta=None)
+        Sala.objects.filter(pk=self.otra.pk).update(
+            reserva_actual=reserva.pk, ocupada_desde=timezone.now(), ocupada_hasta=timezone.now() + timedelta(hours=1)
+        )
+        salida = StringIO()
+        call_command('reconciliar_ocupacion', stdout=salida)
+        self.assertIn('2 salas corregidas', salida.getvalue())
+        self.assertEqual(self.ocupacion(), (reserva.pk, reserva.fecha_hora_inicio, reserva.fecha_hora_fin))
+        self.assertLibre(self.otra)
+        
+        salida = StringIO()
+        call_command('reconciliar_ocupacion', stdout=salida)
+        self.assertIn('coincide con las reservas', salida.getvalue())
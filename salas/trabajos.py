@@ -0,0 +1,185 @@
+"""
+Cola de trabajos en segundo plano, sin broker externo: la tabla Trabajo (en
+la base 'default') es la cola, así funciona igual con PostgreSQL o SQLite.
+
+- encolar('accion_masiva', sede, accion='finalizar', ...) agrega un trabajo
+  pendiente. Las tareas se registran con @tarea y reciben el trabajo más
+  sus parámetros (JSON).
+- manage.py procesar_trabajos reclama los pendientes con
+  SELECT ... FOR UPDATE SKIP LOCKED más un UPDATE condicional (ver
+  TrabajoManager.reclamar) y los ejecuta en un pool de hilos, cada uno
+  dentro de usar_sede(trabajo.sede).
+- Un trabajo que falla se reintenta con espera exponencial hasta
+  max_intentos. Uno que supera su tiempo límite se da por vencido y se
+  reintenta; la tarea vencida o cancelada se detiene en su próximo
+  trabajo.avanzar(), que además informa el progreso. Toda tarea lo llama
+  entre lotes (los comandos de mantención, con cada línea de su salida: ver
+  SalidaComando). Como el intento vencido solo se detiene en ese punto, el
+  reintento puede empezar mientras el anterior termina su lote: las tareas
+  deben ser idempotentes (repetir un lote o correr dos a la vez no cambia
+  el resultado).
+- panel-admin/trabajos/ muestra el estado y el avance de cada trabajo.
+"""
+import io
+import logging
+from datetime import date
+
+from django.core.management import call_command
+from django.utils.dateparse import parse_datetime
+
+from .analitica import mapa_ocupacion
+from .busqueda import buscar_reservas
+from .models import Reserva, Trabajo, TrabajoInterrumpido
+from .sedes import obtener_sede, sede_actual, usar_sede
+
+logger = logging.getLogger(__name__)
+
+# Nombre: {'funcion', 'descripcion', 'max_intentos', 'limite_segundos'}
+TAREAS = {}
+
+# Reservas modificadas por UPDATE en accion_masiva (y entre avances)
+LOTE_ACCION_MASIVA = 500
+
+# Acciones masivas de admin_reservas y accion_masiva: acción -> (método del
+# queryset, descripción)
+ACCIONES_MASIVAS = {
+    'finalizar': ('finalizar', 'finalizada(s)'),
+    'cancelar': ('cancelar', 'cancelada(s)'),
+    'eliminar': ('eliminar', 'eliminada(s)'),
+}
+
+# Comandos de mantención que se pueden encolar desde el panel, con sus
+# opciones. Todos corren con --sede de la sede del trabajo.
+COMANDOS = {
+    'purgar_salas': {},
+    'verificar_disponibilidad': {'reparar': True},
+    'liberar_puestos': {'recalcular': True},
+    'reconciliar_ocupacion': {},
+}
+
+
+def tarea(nombre, descripcion, max_intentos=3, limite_segundos=600):
+    """
+    Registra una función como tarea. La función recibe el trabajo y sus
+    parámetros, y lo que retorna (JSON) queda como resultado del trabajo.
+    Debe llamar a trabajo.avanzar() entre lotes y ser idempotente (ver
+    arriba).
+    """
+    def registrar(funcion):
+        TAREAS[nombre] = {
+            'funcion': funcion,
+            'descripcion': descripcion,
+            'max_intentos': max_intentos,
+            'limite_segundos': limite_segundos,
+        }
+        return funcion
+    return registrar
+
+
+def encolar(nombre, sede=None, usuario='', **parametros):
+    """
+    Agrega un trabajo pendiente de la tarea 'nombre' para la sede indicada
+    (por defecto la sede en curso). Retorna el Trabajo.
+    """
+    if nombre not in TAREAS:
+        raise ValueError(f'No existe la tarea "{nombre}".')
+    definicion = TAREAS[nombre]
+    return Trabajo.objects.create(
+        tarea=nombre,
+        sede=sede or sede_actual() or obtener_sede(),
+        usuario=usuario,
+        parametros=parametros,
+        max_intentos=definicion['max_intentos'],
+        limite_segundos=definicion['limite_segundos'],
+    )
+
+
+def ejecutar(trabajo):
+    """
+    Ejecuta un trabajo ya reclamado y registra su resultado o su error.
+    Retorna el estado en que quedó.
+    """
+    definicion = TAREAS.get(trabajo.tarea)
+    try:
+        if definicion is None:
+            raise LookupError(f'No existe la tarea "{trabajo.tarea}".')
+        with usar_sede(trabajo.sede):
+            resultado = definicion['funcion'](trabajo, **trabajo.parametros)
+    except TrabajoInterrumpido:
+        # Cancelado o vencido: otro ya decidió su estado
+        trabajo.refresh_from_db(fields=['estado'])
+    except Exception as error:
+        logger.exception('Falló el trabajo #%s (%s)', trabajo.pk, trabajo.tarea)
+        trabajo.fallar(f'{type(error).__name__}: {error}')
+    else:
+        trabajo.completar(resultado)
+    return trabajo.estado
+
+
+def _fecha(valor):
+    return date.fromisoformat(valor) if valor else None
+
+
+@tarea('accion_masiva', 'Acción masiva sobre reservas')
+def accion_masiva(trabajo, accion, q='', desde=None, hasta=None):
+    """
+    Aplica la acción a todas las reservas de la sede que coinciden con la
+    búsqueda, en lotes. Repetirla es seguro: solo cambian las que aún cumplen
+    las condiciones.
+    """
+    metodo, descripcion = ACCIONES_MASIVAS[accion]
+    reservas = buscar_reservas(Reserva.objects.de_sede(trabajo.sede), q, desde=_fecha(desde), hasta=_fecha(hasta))
+    ids = list(reservas.order_by('pk').values_list('pk', flat=True))
+    modificadas = 0
+    for inicio in range(0, len(ids), LOTE_ACCION_MASIVA):
+        lote = ids[inicio:inicio + LOTE_ACCION_MASIVA]
+        modificadas += getattr(Reserva.objects.filter(pk__in=lote), metodo)()
+        trabajo.avanzar(inicio + len(lote), len(ids), f'{modificadas} reserva(s) {descripcion}')
+    return {'seleccionadas': len(ids), 'modificadas': modificadas}
+
+
+@tarea('mapa_ocupacion', 'Recalcular el mapa de ocupación')
+def recalcular_ocupacion(trabajo, desde, hasta):
+    """
+    Calcula el mapa de ocupación del período y lo deja en la cache, así el
+    panel lo muestra sin calcularlo en la petición
+    """
+    def avance(hechos, total):
+        trabajo.avanzar(hechos, total, 'Leyendo reservas')
+
+    salas = mapa_ocupacion(parse_datetime(desde), parse_datetime(hasta), sede=trabajo.sede, avance=avance)
+    return {'salas': len(salas)}
+
+
+class SalidaComando(io.StringIO):
+    """
+    Salida de un comando encolado: cada línea escrita (una por lote en los
+    comandos de mantención) se informa con trabajo.avanzar(), que lanza
+    TrabajoInterrumpido si el trabajo venció o se canceló y así detiene el
+    comando antes del lote siguiente.
+    """
+
+    def __init__(self, trabajo):
+        super().__init__()
+        self.trabajo = trabajo
+
+    def write(self, texto):
+        escrito = super().write(texto)
+        linea = texto.strip()
+        if linea:
+            self.trabajo.avanzar(None, mensaje=linea)
+        return escrito
+
+
+@tarea('comando', 'Comando de mantención', max_intentos=1, limite_segundos=3600)
+def ejecutar_comando(trabajo, comando):
+    """
+    Ejecuta uno de los COMANDOS de mantención y guarda su salida
+    """
+    if comando not in COMANDOS:
+        raise ValueError(f'El comando "{comando}" no se puede encolar.')
+    opciones = {'sede': trabajo.sede.codigo, **COMANDOS[comando]}
+    trabajo.avanzar(0, mensaje=f'manage.py {comando}')
+    salida = SalidaComando(trabajo)
+    call_command(comando, stdout=salida, **opciones)
+    return {'salida': salida.getvalue()[-5000:]}
@@ -4,22 +4,34 @@ from . import views
 urlpatterns = [
     # URLs públicas
     path('', views.lista_salas, name='lista_salas'),
+    path('buscar-sala/', views.buscar_sala, name='buscar_sala'),
     path('sala/<int:sala_id>/', views.detalle_sala, name='detalle_sala'),
     path('sala/<int:sala_id>/reservar/', views.crear_reserva, name='crear_reserva'),
+    path('reservar-grupo/', views.reservar_grupo, name='reservar_grupo'),
+    path('sala/<int:sala_id>/calendario.ics', views.calendario_sala, name='calendario_sala'),
     path('mis-reservas/', views.mis_reservas, name='mis_reservas'),
+    path('mis-reservas/<str:rut>/calendario.ics', views.calendario_rut, name='calendario_rut'),
     path('cancelar-reserva/<int:reserva_id>/', views.cancelar_reserva, name='cancelar_reserva'),
+    path('api/eventos/', views.api_eventos, name='api_eventos'),
 
     # URLs de autenticación
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    path('sede/<slug:codigo>/', views.cambiar_sede, name='cambiar_sede'),
     
     # URLs del panel de administración personalizado
     path('panel-admin/', views.panel_admin, name='panel_admin'),
+    path('panel-admin/ocupacion/', views.admin_ocupacion, name='admin_ocupacion'),
+    path('panel-admin/perfiles/', views.admin_perfiles, name='admin_perfiles'),
+    path('panel-admin/perfiles/<str:nombre>/', views.admin_perfil, name='admin_perfil'),
+    path('panel-admin/consultas-lentas/', views.admin_consultas_lentas, name='admin_consultas_lentas'),
+    path('panel-admin/trabajos/', views.admin_trabajos, name='admin_trabajos'),
     path('panel-admin/salas/', views.admin_salas, name='admin_salas'),
     path('panel-admin/salas/crear/', views.admin_crear_sala, name='admin_crear_sala'),
     path('panel-admin/salas/<int:sala_id>/editar/', views.admin_editar_sala, name='admin_editar_sala'),
     path('panel-admin/salas/<int:sala_id>/eliminar/', views.admin_eliminar_sala, name='admin_eliminar_sala'),
     path('panel-admin/reservas/', views.admin_reservas, name='admin_reservas'),
+    path('panel-admin/reservas/masivo/', views.admin_reservas_masivo, name='admin_reservas_masivo'),
     path('panel-admin/reservas/<int:reserva_id>/eliminar/', views.admin_eliminar_reserva, name='admin_eliminar_reserva'),
     path('panel-admin/reservas/<int:reserva_id>/finalizar/', views.admin_finalizar_reserva, name='admin_finalizar_reserva'),
 ]
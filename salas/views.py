@@ -1,23 +1,48 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.utils import timezone
-from .models import Sala, Reserva
-from .forms import ReservaForm
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from .models import Sala, Reserva, ConflictoReserva, Trabajo, normalizar_rut, validar_rut
+from .forms import ReservaForm, ReservaGrupoForm, BusquedaReservaForm, PeriodoOcupacionForm, BuscarSalaForm, FiltroSalasForm
+from .busqueda import buscar_reservas, inicio_del_dia
+from .busqueda_salas import buscar_salas_libres, filtrar_salas
+from .analitica import mapa_ocupacion
+from .calendario import feed_sala, feed_rut
+from .eventos import leer_eventos, serializar
+from .cache import obtener_o_calcular
+from .paginacion import PaginadorEstimado
+from .perfilador import listar_perfiles, resumen, ruta_perfil
+from .consultas_lentas import listar_consultas, vaciar_consultas
+from .trabajos import ACCIONES_MASIVAS, COMANDOS, TAREAS, encolar
+from .sedes import CLAVE_SESION, obtener_sede
 from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
+from datetime import timedelta
+import hmac
 
 def lista_salas(request):
     """
-    Vista principal que muestra todas las salas disponibles
+    Vista principal que muestra las salas habilitadas, con filtros por
+    nombre, capacidad y disponibilidad actual, ordenadas y paginadas
     """
-    salas = Sala.objects.filter(habilitada=True)
+    form = FiltroSalasForm(request.GET or None)
+    filtros = form.cleaned_data if form.is_valid() else {}
     
-    # Agregar información de disponibilidad a cada sala
-    for sala in salas:
-        sala.disponible = sala.esta_disponible()
+    # La disponibilidad se anota en la misma consulta de la página (ver
+    # SalaQuerySet.con_disponibilidad): dos consultas sin importar cuántas
+    # salas haya
+    salas = filtrar_salas(Sala.objects.de_sede(request.sede).filter(habilitada=True), **filtros)
+    page_obj = Paginator(salas, SALAS_POR_PAGINA).get_page(request.GET.get('page'))
     
     context = {
-        'salas': salas,
+        'salas': page_obj.object_list,
+        'page_obj': page_obj,
+        'form': form,
         'titulo': 'Salas de Estudio Disponibles',
     }
     return render(request, 'salas/lista_salas.html', context)
@@ -26,7 +51,7 @@ def detalle_sala(request, sala_id):
     """
     Vista para mostrar el detalle de una sala específica
     """
-    sala = get_object_or_404(Sala, id=sala_id)
+    sala = get_object_or_404(Sala, id=sala_id, sede=request.sede)
     
     # Obtener reservas activas y futuras de esta sala
     ahora = timezone.now()
@@ -39,28 +64,68 @@ def detalle_sala(request, sala_id):
     }
     return render(request, 'salas/detalle_sala.html', context)
 
+def buscar_sala(request):
+    """
+    Vista para buscar salas libres según tamaño del grupo, horario y duración
+    """
+    ahora = timezone.localtime()
+    form = BuscarSalaForm(request.GET or None, initial={
+        'fecha': ahora.date(),
+        'desde': ahora.strftime('%H:%M'),
+        'hasta': min(ahora + timedelta(hours=2), ahora.replace(hour=23, minute=59)).strftime('%H:%M'),
+    })
+    
+    resultados = []
+    if form.is_valid():
+        duracion = timedelta(minutes=form.cleaned_data['duracion'])
+        resultados = buscar_salas_libres(
+            form.cleaned_data['personas'],
+            form.cleaned_data['inicio_ventana'],
+            form.cleaned_data['fin_ventana'],
+            duracion,
+            sede=request.sede,
+        )
+        # Las reservas se hacen desde el momento actual y duran 2 horas: solo
+        # se ofrece reservar si el hueco encontrado empieza ahora y alcanza
+        for sala in resultados:
+            sala['libre_ahora'] = (
+                sala['inicio'] <= ahora + timedelta(minutes=5) and duracion >= timedelta(hours=2)
+            )
+    
+    context = {
+        'form': form,
+        'resultados': resultados,
+    }
+    return render(request, 'salas/buscar_sala.html', context)
+
 def crear_reserva(request, sala_id):
     """
     Vista para crear una nueva reserva de sala
     """
-    sala = get_object_or_404(Sala, id=sala_id)
+    sala = get_object_or_404(Sala, id=sala_id, sede=request.sede)
     
     if request.method == 'POST':
-        form = ReservaForm(request.POST)
+        form = ReservaForm(request.POST, sede=request.sede)
         if form.is_valid():
             try:
                 reserva = form.save(commit=False)
                 # Las fechas se asignan automáticamente en el modelo
                 reserva.save()
-                messages.success(request, f'¡Reserva creada exitosamente! La sala {sala.nombre} está reservada por 2 horas.')
+                if reserva.sala.por_puestos:
+                    messages.success(request, f'¡Reserva creada exitosamente! Tiene un puesto en la sala {reserva.sala.nombre} por 2 horas.')
+                else:
+                    messages.success(request, f'¡Reserva creada exitosamente! La sala {sala.nombre} está reservada por 2 horas.')
                 return redirect('lista_salas')
+            except ValidationError as e:
+                # Ej. otra persona tomó el último puesto entretanto
+                messages.error(request, f'Error al crear la reserva: {" ".join(e.messages)}')
             except Exception as e:
                 messages.error(request, f'Error al crear la reserva: {str(e)}')
         else:
             messages.error(request, 'Por favor corrija los errores en el formulario.')
     else:
         # Preseleccionar la sala actual
-        form = ReservaForm(initial={'sala': sala})
+        form = ReservaForm(initial={'sala': sala}, sede=request.sede)
     
     context = {
         'form': form,
@@ -68,59 +133,86 @@ def crear_reserva(request, sala_id):
     }
     return render(request, 'salas/crear_reserva.html', context)
 
-def mis_reservas(request):
+def reservar_grupo(request):
     """
-    Vista para que el usuario consulte sus reservas activas mediante su RUT
+    Vista para reservar varias salas a la vez (todas o ninguna)
     """
-    reservas = None
-    rut_buscado = None
-    
     if request.method == 'POST':
-        rut_buscado = request.POST.get('rut', '').strip()
-        if rut_buscado:
-            # Limpiar el RUT
-            rut_limpio = rut_buscado.replace('.', '').replace(' ', '').upper()
-            if '-' not in rut_limpio and len(rut_limpio) >= 2:
-                rut_limpio = rut_limpio[:-1] + '-' + rut_limpio[-1]
-            
-            # Buscar reservas activas y futuras
-            ahora = timezone.now()
-            reservas = Reserva.objects.filter(
-                rut=rut_limpio,
-                fecha_hora_fin__gte=ahora
-            ).order_by('-fecha_hora_inicio')
-            
-            if not reservas.exists():
-                messages.info(request, 'No se encontraron reservas activas con este RUT.')
+        form = ReservaGrupoForm(request.POST, sede=request.sede)
+        if form.is_valid():
+            datos = form.cleaned_data
+            try:
+                reservas = Reserva.objects.reservar_grupo(
+                    [sala.pk for sala in datos['salas']],
+                    datos['inicio'],
+                    datos['fin'],
+                    rut=datos['rut'],
+                    nombre_reservante=datos['nombre_reservante'],
+                    email=datos['email'],
+                )
+                nombres = ', '.join(reserva.sala.nombre for reserva in reservas)
+                messages.success(request, f'¡Reserva grupal creada exitosamente! Salas reservadas: {nombres}.')
+                return redirect('lista_salas')
+            except ValidationError as e:
+                messages.error(request, ' '.join(e.messages))
+        else:
+            messages.error(request, 'Por favor corrija los errores en el formulario.')
+    else:
+        ahora = timezone.localtime()
+        form = ReservaGrupoForm(sede=request.sede, initial={'fecha': ahora.date(), 'hora': ahora.strftime('%H:%M')})
     
     context = {
-        'reservas': reservas,
-        'rut_buscado': rut_buscado,
+        'form': form,
     }
-    return render(request, 'salas/mis_reservas.html', context)
+    return render(request, 'salas/reservar_grupo.html', context)
+
+# Cantidad de salas por página en el listado público y en el panel
+SALAS_POR_PAGINA = 24
+SALAS_POR_PAGINA_ADMIN = 50
+
+# Cantidad de reservas por página en el panel de administración
+RESERVAS_POR_PAGINA = 50
+
+# Cantidad de reservas por página en el historial de mis_reservas
+HISTORIAL_POR_PAGINA = 20
+
+# Trabajos en segundo plano que se muestran en el panel (los más recientes)
+TRABAJOS_POR_PAGINA = 50
 
 # Verificar si el usuario es staff (administrador)
 def es_administrador(user):
     return user.is_staff
 
+def version_enviada(request):
+    """
+    Versión de la reserva que vio el usuario al abrir el formulario de
+    confirmación (None si no viene, y se usa la versión recién leída)
+    """
+    try:
+        return int(request.POST['version'])
+    except (KeyError, ValueError):
+        return None
+
 @login_required
 @user_passes_test(es_administrador)
 def panel_admin(request):
     """
     Panel de administración personalizado
     """
-    total_salas = Sala.objects.count()
-    salas_habilitadas = Sala.objects.filter(habilitada=True).count()
+    salas = Sala.objects.de_sede(request.sede)
+    total_salas = salas.count()
+    salas_habilitadas = salas.filter(habilitada=True).count()
     salas_deshabilitadas = total_salas - salas_habilitadas
     
     ahora = timezone.now()
-    total_reservas = Reserva.objects.count()
-    reservas_activas = Reserva.objects.filter(fecha_hora_fin__gte=ahora, estado='activa').count()
-    reservas_canceladas = Reserva.objects.filter(estado='cancelada').count()
+    reservas = Reserva.objects.de_sede(request.sede)
+    total_reservas = reservas.count()
+    reservas_activas = reservas.filter(fecha_hora_fin__gte=ahora, estado='activa').count()
+    reservas_canceladas = reservas.filter(estado='cancelada').count()
     reservas_finalizadas = total_reservas - reservas_activas - reservas_canceladas
     
     # Mostrar TODAS las reservas (activas, finalizadas y canceladas)
-    ultimas_reservas = Reserva.objects.all().order_by('-fecha_creacion')[:10]
+    ultimas_reservas = reservas.order_by('-fecha_creacion')[:10]
     
     context = {
         'total_salas': total_salas,
@@ -137,14 +229,144 @@ def panel_admin(request):
 
 @login_required
 @user_passes_test(es_administrador)
-def admin_salas(request):
+def admin_ocupacion(request):
     """
-    Gestión de salas desde el panel personalizado
+    Mapa de calor de ocupación por sala y hora de la semana
     """
-    salas = Sala.objects.all().order_by('nombre')
+    if request.method == 'POST':
+        # Calcular el período en segundo plano: después se muestra desde la cache
+        form = PeriodoOcupacionForm(request.POST)
+        if form.is_valid():
+            trabajo = encolar(
+                'mapa_ocupacion', request.sede, request.user.get_username(),
+                desde=inicio_del_dia(form.cleaned_data['desde']),
+                hasta=inicio_del_dia(form.cleaned_data['hasta'] + timedelta(days=1)),
+            )
+            messages.success(request, f'Trabajo #{trabajo.pk} encolado: el mapa del período quedará listo en la cache.')
+            return redirect('admin_trabajos')
+        messages.error(request, 'El período no es válido.')
+    
+    hoy = timezone.localdate()
+    form = PeriodoOcupacionForm(request.GET or {
+        'desde': hoy - timedelta(days=30),
+        'hasta': hoy,
+    })
+    
+    salas = []
+    if form.is_valid():
+        desde = inicio_del_dia(form.cleaned_data['desde'])
+        hasta = inicio_del_dia(form.cleaned_data['hasta'] + timedelta(days=1))
+        salas = mapa_ocupacion(desde, hasta, sede=request.sede)
     
     context = {
+        'form': form,
         'salas': salas,
+        'horas': range(24),
+    }
+    return render(request, 'admin/admin_ocupacion.html', context)
+
+
+@login_required
+@user_passes_test(es_administrador)
+def admin_perfiles(request):
+    """
+    Lista de perfiles cProfile guardados por PerfiladorMiddleware
+    """
+    context = {
+        'perfiles': listar_perfiles(),
+        'muestreo': settings.PERFILAR_MUESTREO,
+    }
+    return render(request, 'admin/admin_perfiles.html', context)
+
+
+@login_required
+@user_passes_test(es_administrador)
+def admin_perfil(request, nombre):
+    """
+    Resumen de un perfil: funciones ordenadas por tiempo acumulado
+    """
+    ruta = ruta_perfil(nombre)
+    if ruta is None:
+        raise Http404('Perfil no encontrado.')
+    
+    if request.GET.get('descargar'):
+        return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=ruta.name)
+    
+    context = {
+        'nombre': nombre,
+        'resumen': resumen(ruta),
+    }
+    return render(request, 'admin/admin_perfil.html', context)
+
+
+@login_required
+@user_passes_test(es_administrador)
+def admin_consultas_lentas(request):
+    """
+    Consultas lentas agrupadas por huella, con su origen y plan de ejecución
+    """
+    if request.method == 'POST':
+        vaciar_consultas()
+        messages.success(request, 'Registro de consultas lentas vaciado.')
+        return redirect('admin_consultas_lentas')
+    
+    context = {
+        'consultas': listar_consultas(),
+        'umbral': settings.CONSULTAS_LENTAS_MS,
+    }
+    return render(request, 'admin/admin_consultas_lentas.html', context)
+
+
+@login_required
+@user_passes_test(es_administrador)
+def admin_trabajos(request):
+    """
+    Cola de trabajos en segundo plano de la sede: estado y avance de cada uno,
+    encolar comandos de mantención y cancelar trabajos
+    """
+    if request.method == 'POST':
+        if 'cancelar' in request.POST:
+            trabajo = get_object_or_404(Trabajo, pk=request.POST['cancelar'], sede=request.sede)
+            if trabajo.cancelar():
+                messages.success(request, f'Trabajo #{trabajo.pk} cancelado.')
+            else:
+                messages.error(request, f'El trabajo #{trabajo.pk} ya había terminado.')
+        elif request.POST.get('comando') in COMANDOS:
+            trabajo = encolar('comando', request.sede, request.user.get_username(), comando=request.POST['comando'])
+            messages.success(request, f'Trabajo #{trabajo.pk} encolado.')
+        else:
+            messages.error(request, 'Seleccione un comando válido.')
+        return redirect('admin_trabajos')
+    
+    trabajos = list(Trabajo.objects.filter(sede=request.sede)[:TRABAJOS_POR_PAGINA])
+    for trabajo in trabajos:
+        trabajo.descripcion = TAREAS.get(trabajo.tarea, {}).get('descripcion', trabajo.tarea)
+    
+    context = {
+        'trabajos': trabajos,
+        'comandos': COMANDOS,
+        # La página se recarga sola mientras haya trabajos por terminar
+        'recargar': any(trabajo.activo for trabajo in trabajos),
+    }
+    return render(request, 'admin/admin_trabajos.html', context)
+
+
+@login_required
+@user_passes_test(es_administrador)
+def admin_salas(request):
+    """
+    Gestión de salas desde el panel personalizado, con los mismos filtros
+    y orden que el listado público
+    """
+    form = FiltroSalasForm(request.GET or None)
+    filtros = form.cleaned_data if form.is_valid() else {}
+    salas = filtrar_salas(Sala.objects.de_sede(request.sede), **filtros)
+    page_obj = Paginator(salas, SALAS_POR_PAGINA_ADMIN).get_page(request.GET.get('page'))
+    
+    context = {
+        'salas': page_obj.object_list,
+        'page_obj': page_obj,
+        'form': form,
     }
     return render(request, 'admin/admin_salas.html', context)
 
@@ -159,13 +381,16 @@ def admin_crear_sala(request):
         capacidad = request.POST.get('capacidad')
         descripcion = request.POST.get('descripcion', '')
         habilitada = request.POST.get('habilitada') == 'on'
+        por_puestos = request.POST.get('por_puestos') == 'on'
         
         try:
             Sala.objects.create(
+                sede=request.sede,
                 nombre=nombre,
                 capacidad=capacidad,
                 descripcion=descripcion,
-                habilitada=habilitada
+                habilitada=habilitada,
+                por_puestos=por_puestos
             )
             messages.success(request, f'Sala "{nombre}" creada exitosamente.')
             return redirect('admin_salas')
@@ -180,18 +405,22 @@ def admin_editar_sala(request, sala_id):
     """
     Editar una sala existente desde el panel personalizado
     """
-    sala = get_object_or_404(Sala, id=sala_id)
+    sala = get_object_or_404(Sala, id=sala_id, sede=request.sede)
     
     if request.method == 'POST':
         sala.nombre = request.POST.get('nombre')
         sala.capacidad = request.POST.get('capacidad')
         sala.descripcion = request.POST.get('descripcion', '')
         sala.habilitada = request.POST.get('habilitada') == 'on'
+        sala.por_puestos = request.POST.get('por_puestos') == 'on'
         
         try:
+            sala.clean()
             sala.save()
             messages.success(request, f'Sala "{sala.nombre}" actualizada exitosamente.')
             return redirect('admin_salas')
+        except ValidationError as e:
+            messages.error(request, f'Error al actualizar la sala: {" ".join(e.messages)}')
         except Exception as e:
             messages.error(request, f'Error al actualizar la sala: {str(e)}')
     
@@ -204,12 +433,13 @@ def admin_eliminar_sala(request, sala_id):
     """
     Eliminar una sala desde el panel personalizado
     """
-    sala = get_object_or_404(Sala, id=sala_id)
+    sala = get_object_or_404(Sala, id=sala_id, sede=request.sede)
     
     if request.method == 'POST':
-        nombre_sala = sala.nombre
-        sala.delete()
-        messages.success(request, f'Sala "{nombre_sala}" eliminada exitosamente.')
+        # Soft-delete: la sala se oculta de inmediato y su historial se borra
+        # en segundo plano (manage.py purgar_salas)
+        sala.eliminar()
+        messages.success(request, f'Sala "{sala.nombre}" eliminada exitosamente.')
         return redirect('admin_salas')
     
     context = {'sala': sala}
@@ -221,20 +451,76 @@ def admin_reservas(request):
     """
     Gestión de reservas desde el panel personalizado
     """
-    reservas = Reserva.objects.all().order_by('-fecha_creacion')
+    # Orden de creación usando la PK (indexada) en vez de fecha_creacion
+    reservas = Reserva.objects.de_sede(request.sede).select_related('sala').order_by('-pk')
+    
+    # Filtros de búsqueda por RUT/nombre y rango de fechas
+    form = BusquedaReservaForm(request.GET or None)
+    if form.is_valid():
+        reservas = buscar_reservas(
+            reservas,
+            form.cleaned_data['q'],
+            desde=form.cleaned_data['desde'],
+            hasta=form.cleaned_data['hasta'],
+        )
+    
+    paginator = PaginadorEstimado(reservas, RESERVAS_POR_PAGINA)
+    page_obj = paginator.get_page(request.GET.get('page'))
     
     context = {
-        'reservas': reservas,
+        'reservas': page_obj.object_list,
+        'page_obj': page_obj,
+        'form': form,
     }
     return render(request, 'admin/admin_reservas.html', context)
 
+@login_required
+@user_passes_test(es_administrador)
+def admin_reservas_masivo(request):
+    """
+    Aplica una acción (finalizar, cancelar o eliminar) a varias reservas
+    seleccionadas, con una sola consulta por acción
+    """
+    if request.method != 'POST':
+        return redirect('admin_reservas')
+    
+    accion = request.POST.get('accion')
+    ids = [valor for valor in request.POST.getlist('reservas') if valor.isdigit()]
+    
+    if accion in ACCIONES_MASIVAS and request.POST.get('alcance') == 'busqueda':
+        # Todas las reservas de la búsqueda, en segundo plano
+        busqueda = BusquedaReservaForm(request.POST)
+        if busqueda.is_valid() and any(busqueda.cleaned_data.values()):
+            trabajo = encolar(
+                'accion_masiva', request.sede, request.user.get_username(), accion=accion, **busqueda.cleaned_data
+            )
+            messages.success(request, f'Trabajo #{trabajo.pk} encolado: se aplicará a todas las reservas de la búsqueda.')
+            return redirect('admin_trabajos')
+        messages.error(request, 'Indique una búsqueda válida para aplicar la acción a todos sus resultados.')
+    elif accion not in ACCIONES_MASIVAS:
+        messages.error(request, 'Seleccione una acción válida.')
+    elif not ids:
+        messages.error(request, 'No se seleccionó ninguna reserva.')
+    else:
+        reservas = Reserva.objects.de_sede(request.sede).filter(pk__in=ids)
+        metodo, descripcion = ACCIONES_MASIVAS[accion]
+        cantidad = getattr(reservas, metodo)()
+        
+        omitidas = len(ids) - cantidad
+        mensaje = f'{cantidad} reserva(s) {descripcion} exitosamente.'
+        if omitidas:
+            mensaje += f' {omitidas} no cumplían las condiciones y no fueron modificadas.'
+        messages.success(request, mensaje)
+    
+    return redirect('admin_reservas')
+
 @login_required
 @user_passes_test(es_administrador)
 def admin_eliminar_reserva(request, reserva_id):
     """
     Eliminar una reserva desde el panel personalizado
     """
-    reserva = get_object_or_404(Reserva, id=reserva_id)
+    reserva = get_object_or_404(Reserva, id=reserva_id, sala__sede=request.sede)
     
     if request.method == 'POST':
         reserva.delete()
@@ -250,20 +536,15 @@ def admin_finalizar_reserva(request, reserva_id):
     """
     Finalizar una reserva anticipadamente
     """
-    reserva = get_object_or_404(Reserva, id=reserva_id)
+    reserva = get_object_or_404(Reserva, id=reserva_id, sala__sede=request.sede)
     
     if request.method == 'POST':
-        # Finalizar la reserva
-        reserva.fecha_hora_fin = timezone.now()
-        
-        # Si tiene campo estado, marcarlo como finalizada
-        if hasattr(reserva, 'estado'):
-            reserva.estado = 'finalizada'
-            reserva.save(update_fields=['fecha_hora_fin', 'estado'])
+        try:
+            reserva.finalizar(version=version_enviada(request))
+        except ConflictoReserva as e:
+            messages.error(request, str(e))
         else:
-            reserva.save(update_fields=['fecha_hora_fin'])
-        
-        messages.success(request, f'Reserva de {reserva.nombre_reservante} finalizada exitosamente.')
+            messages.success(request, f'Reserva de {reserva.nombre_reservante} finalizada exitosamente.')
         return redirect('admin_reservas')
     
     context = {'reserva': reserva}
@@ -301,31 +582,63 @@ def logout_view(request):
     messages.success(request, 'Has cerrado sesión exitosamente.')
     return redirect('lista_salas')
 
+def cambiar_sede(request, codigo):
+    """
+    Cambia la sede con la que navega el usuario (se guarda en la sesión)
+    """
+    sede = obtener_sede(codigo)
+    if sede is None:
+        raise Http404('Sede no encontrada.')
+    
+    request.session[CLAVE_SESION] = sede.codigo
+    messages.success(request, f'Ahora está viendo las salas de {sede.nombre}.')
+    return redirect('lista_salas')
+
+def historial_rut(rut, numero_pagina, sede):
+    """
+    Retorna una página del historial de reservas de un RUT en una sede.
+    Cada página se cachea por RUT y se invalida cuando ese RUT reserva,
+    cancela o se le finaliza una reserva.
+    """
+    try:
+        numero_pagina = max(int(numero_pagina), 1)
+    except (TypeError, ValueError):
+        numero_pagina = 1
+    
+    def calcular():
+        # Consulta resuelta con el índice (rut, -fecha_hora_inicio)
+        reservas = Reserva.objects.de_sede(sede).filter(rut=rut).select_related('sala').order_by('-fecha_hora_inicio')
+        total = reservas.count()
+        numero = Paginator(range(total), HISTORIAL_POR_PAGINA).get_page(numero_pagina).number
+        inicio = (numero - 1) * HISTORIAL_POR_PAGINA
+        return total, numero, list(reservas[inicio:inicio + HISTORIAL_POR_PAGINA])
+    
+    total, numero, filas = obtener_o_calcular('rut', rut, f'historial:{sede.pk}:{numero_pagina}', calcular)
+    return Page(filas, numero, Paginator(range(total), HISTORIAL_POR_PAGINA))
+
 def mis_reservas(request):
     """
     Vista para consultar reservas mediante RUT
     """
     rut_input = request.GET.get('rut', '').strip()
-    reservas = []
+    page_obj = None
     rut_consultado = ''
     
     if rut_input:
-        # Normalizar el RUT (quitar puntos y espacios, convertir a mayúsculas)
-        rut_normalizado = rut_input.upper().replace(".", "").replace(" ", "")
-        
-        # Si no tiene guión, agregarlo antes del último dígito
-        if '-' not in rut_normalizado and len(rut_normalizado) > 1:
-            rut_normalizado = rut_normalizado[:-1] + '-' + rut_normalizado[-1]
+        # Normalizar el RUT (sin puntos ni espacios, en mayúsculas y con guión)
+        rut_consultado = normalizar_rut(rut_input)
         
-        rut_consultado = rut_normalizado
-        
-        # Mostrar todas las reservas (activas y finalizadas)
-        reservas = Reserva.objects.filter(
-            rut=rut_normalizado
-        ).select_related('sala').order_by('-fecha_hora_inicio')
+        try:
+            validar_rut(rut_consultado)
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+        else:
+            # Mostrar todas las reservas (activas y finalizadas), paginadas
+            page_obj = historial_rut(rut_consultado, request.GET.get('page'), request.sede)
     
     context = {
-        'reservas': reservas,
+        'reservas': page_obj.object_list if page_obj else [],
+        'page_obj': page_obj,
         'rut_consultado': rut_consultado,
     }
     return render(request, 'salas/mis_reservas.html', context)
@@ -335,7 +648,18 @@ def cancelar_reserva(request, reserva_id):
     """
     Vista para que los usuarios cancelen sus propias reservas
     """
-    reserva = get_object_or_404(Reserva, id=reserva_id)
+    reserva = get_object_or_404(Reserva, id=reserva_id, sala__sede=request.sede)
+    
+    if request.method == 'POST':
+        # El estado se verifica en el mismo UPDATE (ver Reserva.cancelar), así
+        # un cambio hecho por otra persona entretanto no se pierde
+        try:
+            reserva.cancelar(version=version_enviada(request))
+        except ConflictoReserva as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, f'Reserva de la sala "{reserva.sala.nombre}" cancelada exitosamente.')
+        return redirect(f'/mis-reservas/?rut={reserva.rut}')
     
     # Verificar que no haya finalizado por tiempo
     ahora = timezone.now()
@@ -344,22 +668,85 @@ def cancelar_reserva(request, reserva_id):
         return redirect('mis_reservas')
     
     # Verificar que no esté ya cancelada
-    if hasattr(reserva, 'estado') and reserva.estado == 'cancelada':
+    if reserva.estado == 'cancelada':
         messages.error(request, 'Esta reserva ya fue cancelada anteriormente.')
         return redirect('mis_reservas')
     
-    if request.method == 'POST':
-        nombre_sala = reserva.sala.nombre
-        rut = reserva.rut
-        
-        # Cambiar estado sin validaciones
-        reserva.estado = 'cancelada'
-        reserva.save(update_fields=['estado'])  # <--- CAMBIO IMPORTANTE: usar update_fields
-        
-        messages.success(request, f'Reserva de la sala "{nombre_sala}" cancelada exitosamente.')
-        return redirect(f'/mis-reservas/?rut={rut}')
-    
     context = {
         'reserva': reserva,
     }
     return render(request, 'salas/cancelar_reserva.html', context)
+
+
+def responder_ics(request, feed, nombre_archivo):
+    """
+    Responde un feed .ics con ETag y Last-Modified. Si el cliente ya tiene
+    la versión vigente se responde 304 sin cuerpo.
+    """
+    if feed is None:
+        raise Http404('Calendario no encontrado.')
+    
+    etag = quote_etag(feed['etag'])
+    modificado = int(feed['modificado'].timestamp())
+    
+    response = get_conditional_response(request, etag=etag, last_modified=modificado)
+    if response is None:
+        response = HttpResponse(feed['ics'], content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = f'inline; filename="{nombre_archivo}"'
+    
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modificado)
+    patch_cache_control(response, max_age=300)
+    return response
+
+def calendario_sala(request, sala_id):
+    """
+    Feed iCalendar con las reservas de una sala
+    """
+    feed = feed_sala(sala_id, request.get_host(), request.sede)
+    return responder_ics(request, feed, f'sala-{sala_id}.ics')
+
+def calendario_rut(request, rut):
+    """
+    Feed iCalendar con las reservas de un RUT
+    """
+    rut = normalizar_rut(rut)
+    try:
+        validar_rut(rut)
+    except ValidationError:
+        raise Http404('RUT inválido.')
+    
+    feed = feed_rut(rut, request.get_host(), request.sede)
+    return responder_ics(request, feed, f'reservas-{rut}.ics')
+
+
+def token_eventos_valido(request):
+    """
+    Indica si la petición trae el token de EVENTOS_TOKEN en el encabezado
+    Authorization: Bearer <token> (para consumidores sin sesión)
+    """
+    esperado = settings.EVENTOS_TOKEN
+    tipo, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(esperado) and tipo.lower() == 'bearer' and hmac.compare_digest(token.strip(), esperado)
+
+def api_eventos(request):
+    """
+    Feed JSON de cambios de salas y reservas de la sede, leído por cursor:
+    GET /api/eventos/?desde=<último id procesado>&limite=<n>
+    """
+    if not (request.user.is_staff or token_eventos_valido(request)):
+        return JsonResponse({'error': 'No autorizado.'}, status=403)
+    
+    try:
+        desde = max(int(request.GET.get('desde', 0)), 0)
+        limite = int(request.GET.get('limite', 100))
+    except ValueError:
+        return JsonResponse({'error': 'Los parámetros desde y limite deben ser números.'}, status=400)
+    
+    eventos, hay_mas = leer_eventos(desde, limite, request.sede)
+    return JsonResponse({
+        'eventos': [serializar(evento) for evento in eventos],
+        # Próximo valor de 'desde' para el consumidor
+        'cursor': eventos[-1].pk if eventos else desde,
+        'hay_mas': hay_mas,
+    })
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import random
+import django
+
+# Agregar el directorio raíz al path (directorio padre del script)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from datetime import timedelta
+from django.db.models import Max, Min
+from salas.disponibilidad import mascaras_por_dia, unir
+from salas.models import Sala, Reserva, DisponibilidadDiaria
+
+# Usa los datos de la base configurada. Para generarlos:
+#   python manage.py generar_datos --salas 100 --reservas 200000 --dias 365
+CONSULTAS = 2000
+
+salas = list(Sala.objects.all())
+rango = Reserva.objects.aggregate(desde=Min('fecha_hora_inicio'), hasta=Max('fecha_hora_fin'))
+if not salas or rango['desde'] is None:
+    print("❌ No hay datos. Ejecute primero: python manage.py generar_datos")
+    sys.exit(1)
+
+print("⏱️  Benchmark de disponibilidad (consulta a Reserva vs. mapas de bits)")
+print(f"   • {len(salas)} salas, {Reserva.objects.count()} reservas, {CONSULTAS} consultas\n")
+
+# Intervalos de 2 horas al azar, reproducibles
+rng = random.Random(2025)
+segundos = int((rango['hasta'] - rango['desde']).total_seconds())
+consultas = []
+for _ in range(CONSULTAS):
+    inicio = rango['desde'] + timedelta(minutes=rng.randrange(0, segundos // 60, 15))
+    consultas.append((rng.choice(salas), inicio, inicio + timedelta(hours=2)))
+
+inicio = time.perf_counter()
+por_consulta = [not sala.tiene_reservas_entre(desde, hasta) for sala, desde, hasta in consultas]
+tiempo_consulta = time.perf_counter() - inicio
+print(f"✓ Consulta a Reserva:          {tiempo_consulta / CONSULTAS * 1000:.3f} ms por consulta")
+
+inicio = time.perf_counter()
+por_mapa = [sala.libre_entre(desde, hasta) for sala, desde, hasta in consultas]
+tiempo_mapa = time.perf_counter() - inicio
+print(f"✓ Mapa de bits (base de datos): {tiempo_mapa / CONSULTAS * 1000:.3f} ms por consulta")
+
+# Mapas cargados en memoria (por ejemplo, todos los de un día en una sola consulta)
+inicio = time.perf_counter()
+mapas = {
+    (sala_id, fecha): unir(manana, tarde)
+    for sala_id, fecha, manana, tarde in DisponibilidadDiaria.objects.values_list('sala_id', 'fecha', 'manana', 'tarde')
+}
+tiempo_carga = time.perf_counter() - inicio
+
+inicio = time.perf_counter()
+seguras = 0
+for sala, desde, hasta in consultas:
+    libre = all(
+        not mapas.get((sala.pk, fecha), 0) & mascara
+        for fecha, mascara in mascaras_por_dia(desde, hasta).items()
+    )
+    seguras += libre
+tiempo_memoria = time.perf_counter() - inicio
+print(f"✓ Mapa de bits (en memoria):    {tiempo_memoria / CONSULTAS * 1000:.4f} ms por consulta "
+      f"(+ {tiempo_carga * 1000:.0f} ms de carga de {len(mapas)} días)")
+
+print(f"\n📊 Con el mapa en memoria, {seguras} de {CONSULTAS} consultas se responden sin ir a la base de datos")
+if por_consulta == por_mapa:
+    print("✅ Ambos métodos entregan el mismo resultado")
+else:
+    print("❌ Los resultados no coinciden: ejecute python manage.py verificar_disponibilidad")
@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import django
+
+# Agregar el directorio raíz al path (directorio padre del script)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+import numpy as np
+from salas.analitica import ocupacion_por_hora, ocupacion_por_hora_ingenua
+
+# Parámetros: un año académico con 50 salas y ~30 reservas diarias por sala
+NUM_SALAS = 50
+DIAS = 300
+RESERVAS = NUM_SALAS * DIAS * 30 // 4
+
+print("⏱️  Benchmark del mapa de ocupación (vectorizado vs. bucle ingenuo)")
+print(f"   • {NUM_SALAS} salas, {DIAS} días, {RESERVAS} reservas\n")
+
+# Datos sintéticos reproducibles (no se usa la base de datos)
+rng = np.random.default_rng(2025)
+desde = 1_700_000_000.0
+hasta = desde + DIAS * 86400
+salas_idx = rng.integers(0, NUM_SALAS, RESERVAS)
+inicios = desde + rng.uniform(-7200, DIAS * 86400, RESERVAS)
+fines = inicios + 7200
+
+inicio = time.perf_counter()
+vectorizado = ocupacion_por_hora(salas_idx, inicios, fines, NUM_SALAS, desde, hasta)
+tiempo_vectorizado = time.perf_counter() - inicio
+print(f"✓ Vectorizado (NumPy): {tiempo_vectorizado * 1000:.1f} ms")
+
+inicio = time.perf_counter()
+ingenuo = ocupacion_por_hora_ingenua(salas_idx, inicios, fines, NUM_SALAS, desde, hasta)
+tiempo_ingenuo = time.perf_counter() - inicio
+print(f"✓ Bucle ingenuo:       {tiempo_ingenuo * 1000:.1f} ms")
+
+if np.allclose(vectorizado, ingenuo):
+    print(f"\n✅ Resultados idénticos. Aceleración: {tiempo_ingenuo / tiempo_vectorizado:.1f}x")
+else:
+    print("\n❌ Los resultados no coinciden")
+    sys.exit(1)